@@ -0,0 +1,81 @@
+"""
+🪙 Microbenchmark: analytics sums on Decimal vs int64 cents, over 1M rows.
+
+Builds per-category totals and percentages both ways (Decimal sum + round_decimal
++ calculate_percent, and cents sum + from_cents + percent_of), checks that the
+results are identical and prints the timings.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_cents [--rows N]
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from decimal import Decimal
+
+from src.utils.analytics_helper import calculate_percent, round_decimal
+from src.utils.money import from_cents, percent_of, quantize_cents, to_cents
+
+CATEGORIES = ["Food", "Rent", "Transport", "Fun", "Health", "Shopping", "Bills", "Travel"]
+
+
+def make_rows(count: int) -> list[tuple[str, Decimal]]:
+    rng = random.Random(42)
+    # Sub-cent inputs are rounded on validation, like stored amounts
+    return [
+        (rng.choice(CATEGORIES), quantize_cents(Decimal(rng.randint(1, 500_000)) / 1000))
+        for _ in range(count)
+    ]
+
+
+def with_decimal(rows: list[tuple[str, Decimal]]) -> dict[str, tuple[Decimal, Decimal]]:
+    totals: defaultdict[str, Decimal] = defaultdict(Decimal)
+    for category, amount in rows:
+        totals[category] += amount
+    grand = sum(totals.values(), Decimal("0"))
+    return {
+        category: (round_decimal(total), calculate_percent(total, grand))
+        for category, total in totals.items()
+    }
+
+
+def with_cents(rows: list[tuple[str, int]]) -> dict[str, tuple[Decimal, Decimal]]:
+    totals: defaultdict[str, int] = defaultdict(int)
+    for category, cents in rows:
+        totals[category] += cents
+    grand = sum(totals.values())
+    return {
+        category: (from_cents(total), percent_of(total, grand))
+        for category, total in totals.items()
+    }
+
+
+def timed[T](label: str, run: Callable[[], T]) -> T:
+    start = time.perf_counter()
+    result = run()
+    print(f"{label:<32} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_cents")
+    _ = parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    # Cents are what rollups and the $group stages hold; converted once per row
+    cent_rows = timed("to_cents (once per row)", lambda: [(c, to_cents(a)) for c, a in rows])
+    decimal_result = timed("Decimal sum + round/percent", lambda: with_decimal(rows))
+    cents_result = timed("int cents sum + percent", lambda: with_cents(cent_rows))
+
+    assert decimal_result == cents_result, "cents totals differ from round_decimal output"
+    print(
+        f"✅ {args.rows} rows: identical totals and percentages for {len(cents_result)} categories"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+⚖️ Benchmark: balance recalculation with the `ledger_total` pipeline vs the old
+Python loop that loaded every transaction of the user into the app.
+
+Seeds a throwaway user with manual and bank transactions in the database of
+MONGODB_URI, computes the ledger total both ways, checks that they agree, prints
+the timings and deletes the seeded data.
+
+Usage (from the backend directory, with MongoDB running):
+    python -m benchmarks.bench_ledger [--manual N] [--bank N] [--runs N]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+
+from src.database import init_db
+from src.models import BankTransaction, Transaction, TransactionType, User
+from src.utils.recalculate_user_balance import ledger_total, trim_balance
+
+SEED_BATCH_SIZE = 10_000
+
+
+async def seed(user_id: PydanticObjectId, manual: int, bank: int) -> None:
+    rng = random.Random(42)
+    account_id = PydanticObjectId()
+    start = datetime(2023, 1, 1, tzinfo=UTC)
+
+    def when() -> datetime:
+        return start + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+
+    def day() -> datetime:
+        return start + timedelta(days=rng.randint(0, 2 * 365))  # Bank dates have no time
+
+    manual_docs = [
+        {
+            "user_id": user_id,
+            "amount": Decimal128(Decimal(rng.randint(1, 500_000)) / 100),
+            "source": "manual",
+            "type": rng.choice([TransactionType.INCOME, TransactionType.EXPENSE]).value,
+            "date": when(),
+        }
+        for _ in range(manual)
+    ]
+    bank_docs = [
+        {
+            "user_id": user_id,
+            "bank_account_id": account_id,
+            "transaction_id": f"bench-{user_id}-{i}",
+            "name": "Benchmark",
+            "amount": rng.randint(-500_000, 500_000) / 100,
+            "date": day(),
+            "source": "plaid",
+        }
+        for i in range(bank)
+    ]
+    for model, docs in ((Transaction, manual_docs), (BankTransaction, bank_docs)):
+        collection = model.get_motor_collection()
+        for i in range(0, len(docs), SEED_BATCH_SIZE):
+            _ = await collection.insert_many(docs[i : i + SEED_BATCH_SIZE], ordered=False)
+
+
+async def python_loop(user_id: PydanticObjectId) -> Decimal:
+    """The balance recalculation before the pipeline: every row is loaded and summed here"""
+    balance = Decimal("0")
+    for txn in await Transaction.find(Transaction.user_id == user_id).to_list():
+        if txn.type == "income":
+            balance += txn.amount
+        else:
+            balance -= txn.amount
+    for bank_txn in await BankTransaction.find(BankTransaction.user_id == user_id).to_list():
+        balance -= Decimal(str(bank_txn.amount))  # Plaid income is negative by amount
+    return balance
+
+
+async def timed(label: str, runs: int, run: Callable[[], Awaitable[Decimal]]) -> Decimal:
+    timings: list[float] = []
+    result = Decimal("0")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await run()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<28} best {min(timings):8.3f}s  mean {sum(timings) / runs:8.3f}s")
+    return result
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_ledger")
+    _ = parser.add_argument("--manual", type=int, default=50_000)
+    _ = parser.add_argument("--bank", type=int, default=50_000)
+    _ = parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    await init_db()
+    user = User(
+        email="ledger-benchmark@example.com",
+        first_name="Ledger",
+        last_name="Benchmark",
+        opening_balance=Decimal("0.00"),
+    )
+    _ = await user.insert()
+    user_id = PydanticObjectId(user.id)
+    try:
+        print(f"🌱 Seeding {args.manual} manual and {args.bank} bank transactions...")
+        await seed(user_id, args.manual, args.bank)
+
+        loop_total = await timed("Python loop (old)", args.runs, lambda: python_loop(user_id))
+        pipeline_total = await timed(
+            "ledger_total pipeline", args.runs, lambda: ledger_total(user_id)
+        )
+
+        assert trim_balance(loop_total) == trim_balance(pipeline_total), (
+            f"totals differ: loop {loop_total} vs pipeline {pipeline_total}"
+        )
+        print(f"✅ Identical ledger totals: {trim_balance(pipeline_total)}")
+    finally:
+        _ = await Transaction.find(Transaction.user_id == user_id).delete()
+        _ = await BankTransaction.find(BankTransaction.user_id == user_id).delete()
+        _ = await user.delete()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,7 @@ from fastapi import FastAPI
 from fastapi.encoders import jsonable_encoder
 
 from src.database import init_db
+from src.integrations.plaid import plaid_client
 from src.routers import (
     account,
     ai,
@@ -15,6 +16,7 @@ from src.routers import (
     auth,
     budget,
     categories,
+    imports,
     payment_methods,
     plaid,
     transactions,
@@ -27,6 +29,7 @@ _ = load_dotenv()
 async def lifespan(_app: FastAPI) -> AsyncGenerator[Any]:
     await init_db()
     yield
+    plaid_client.close()
 
 
 def custom_encoder(obj: Any) -> Any:
@@ -51,6 +54,7 @@ app.include_router(auth.router)  # Аутентификация и автори
 app.include_router(account.router)  # Управление аккаунтом
 app.include_router(categories.router)  # Категории расходов
 app.include_router(transactions.router)  # Транзакции
+app.include_router(imports.router)  # Импорт выписок
 app.include_router(budget.router)  # Бюджеты
 app.include_router(ai.router)  # AI
 app.include_router(analytics.router)  # Аналитика
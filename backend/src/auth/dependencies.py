@@ -11,11 +11,14 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 
 # Import functions for error handling
-from src.auth.exceptions import raise_unauthorized_error
+from src.auth.exceptions import raise_forbidden_error, raise_unauthorized_error
 
 # Import our function for token verification
 from src.auth.jwt import verify_access_token
 
+# Import application settings
+from src.config import config
+
 # Import user model from database (Beanie model)
 from src.models import User
 
@@ -51,6 +54,14 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
         return user
 
 
+# Internal endpoints: only users listed in ADMIN_EMAILS may call them
+async def get_admin_user(current_user: Annotated[User, Depends(get_current_user)]) -> User:
+    admins = {email.strip().lower() for email in config.ADMIN_EMAILS}
+    if current_user.email.lower() not in admins:
+        raise_forbidden_error("Admin access required")
+    return current_user
+
+
 def validate_google_names(given_name: str | None, family_name: str | None) -> None:
     """Checks if first and last name are present in Google profile."""
     if not given_name or not family_name:
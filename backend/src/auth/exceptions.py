@@ -65,3 +65,11 @@ def raise_missing_field_error(field_name: str) -> NoReturn:
         status_code=status.HTTP_400_BAD_REQUEST,
         detail=f"{field_name} is required",
     )
+
+
+def raise_bad_request_error(detail: str) -> NoReturn:
+    """Raise HTTP 400 Bad Request error for invalid request parameters."""
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=detail,
+    )
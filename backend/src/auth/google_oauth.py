@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from fastapi import HTTPException, status
 from google.auth.transport import requests as google_requests
 from google.oauth2 import id_token
@@ -55,8 +57,7 @@ async def handle_google_login(id_token_str: str) -> TokenResponse:
                     )
                 else:
                     # 🔧 Update google_id if it wasn't set
-                    user.google_id = google_sub
-                    _ = await user.save()
+                    _ = await user.set({User.google_id: google_sub})
             else:
                 # 🆕 New user
                 given_name = id_info.get("given_name")
@@ -70,6 +71,7 @@ async def handle_google_login(id_token_str: str) -> TokenResponse:
                     first_name=given_name,
                     last_name=family_name,
                     birth_date=id_info.get("birthdate"),
+                    opening_balance=Decimal("0.00"),
                 )
                 _ = await user.insert()
 
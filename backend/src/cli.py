@@ -0,0 +1,198 @@
+"""
+Maintenance commands for the Expense Tracker API.
+
+Usage (from the backend directory):
+    python -m src.cli rebuild-rollups [--user USER_ID]
+    python -m src.cli rebuild-balance-checkpoints [--user USER_ID]
+    python -m src.cli dedupe-bank-transactions
+    python -m src.cli backfill-name-keys
+    python -m src.cli round-amounts
+    python -m src.cli backfill-opening-balances [--batch-size N] [--concurrency N]
+    python -m src.cli reconcile-balances [--batch-size N] [--concurrency N] [--rate N]
+                                         [--interval SECONDS]
+    (run backfill-opening-balances once before reconcile-balances: users registered
+    before the opening balance was stored are skipped by balance recomputes until then)
+    python -m src.cli sync-worker [--workers N] [--no-schedule]
+"""
+
+import argparse
+import asyncio
+
+from beanie import PydanticObjectId
+
+from src.config import RECONCILE_BATCH_SIZE, RECONCILE_CONCURRENCY, RECONCILE_RATE, config
+from src.database import get_database, init_db
+from src.models import BankTransaction, Category, PaymentMethod, Transaction
+from src.utils.analytics_cache import bump_data_version
+from src.utils.balance_history import rebuild_all_checkpoints, rebuild_user_checkpoints
+from src.utils.balance_reconcile import backfill_opening_balances, reconcile_all_balances
+from src.utils.money import backfill_cent_amounts
+from src.utils.names import backfill_name_keys
+from src.utils.plaid_sync import remove_duplicate_bank_transactions
+from src.utils.recalculate_user_balance import recalculate_user_balance
+from src.utils.rollups import rebuild_all_rollups, rebuild_user_rollups
+from src.utils.sync_queue import run_worker
+
+
+async def rebuild_rollups(user_id: str | None) -> None:
+    """📅 Recompute analytics rollups from raw transactions"""
+    if user_id:
+        if await rebuild_user_rollups(PydanticObjectId(user_id)):
+            print(f"✅ Rollups rebuilt for user {user_id}")
+        return
+    processed = await rebuild_all_rollups()
+    print(f"✅ Rollups rebuilt for {processed} users")
+
+
+async def rebuild_balance_checkpoints(user_id: str | None) -> None:
+    """⚖️ Recompute balance history checkpoints from raw transactions"""
+    if user_id:
+        if await rebuild_user_checkpoints(PydanticObjectId(user_id)):
+            print(f"✅ Balance checkpoints rebuilt for user {user_id}")
+        return
+    processed = await rebuild_all_checkpoints()
+    print(f"✅ Balance checkpoints rebuilt for {processed} users")
+
+
+async def dedupe_bank_transactions() -> None:
+    """🧹 Remove duplicate Plaid transactions before the unique index is built"""
+    # Runs before init_db: building the unique index fails while duplicates exist
+    users = await remove_duplicate_bank_transactions(get_database())
+    await init_db()
+    await refresh_derived_data(users)
+    print(f"✅ Duplicate bank transactions removed for {len(users)} users")
+
+
+async def refresh_derived_data(users: set[PydanticObjectId]) -> None:
+    """Recomputes rollups, checkpoints and balance of users whose transactions were rewritten"""
+    for user_id in users:
+        _ = await rebuild_user_rollups(user_id)
+        _ = await rebuild_user_checkpoints(user_id)
+        if await recalculate_user_balance(user_id) is None:
+            print(f"⚠️ User {user_id}: no opening balance, run backfill-opening-balances")
+        await bump_data_version(user_id, rewritten=True)
+
+
+async def round_amounts() -> None:
+    """🪙 Round stored amounts with sub-cent digits to whole cents"""
+    users: set[PydanticObjectId] = set()
+    for model in (Transaction, BankTransaction):
+        users |= await backfill_cent_amounts(model)
+    await refresh_derived_data(users)
+    print(f"✅ Amounts rounded to cents for {len(users)} users")
+
+
+async def backfill_user_opening_balances(batch_size: int, concurrency: int) -> None:
+    """🏦 Store the opening balance of users registered before it was kept"""
+    # Safest with writes paused; users written to during their check are skipped
+    stored, skipped = await backfill_opening_balances(batch_size, concurrency)
+    print(f"✅ Opening balances set for {stored} users, {skipped} skipped (run again)")
+
+
+async def backfill_category_name_keys() -> None:
+    """🔤 Store normalized names on categories and payment methods created before name_key"""
+    for model in (Category, PaymentMethod):
+        updated, duplicates = await backfill_name_keys(model)
+        print(f"✅ {model.__name__}: {updated} name keys set, {duplicates} duplicate names skipped")
+
+
+async def reconcile_balances(
+    batch_size: int, concurrency: int, rate: float, interval: float | None
+) -> None:
+    """🧮 Find and repair drift between stored balances and the transactions"""
+    while True:
+        stats = await reconcile_all_balances(batch_size, concurrency, rate)
+        print(f"✅ Balances reconciled: {stats.summary()}")
+        if stats.no_opening:
+            print(f"⚠️ {stats.no_opening} users without an opening balance were not checked")
+            print("   Run `python -m src.cli backfill-opening-balances` to include them")
+        if interval is None:
+            return
+        await asyncio.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollups = commands.add_parser("rebuild-rollups", help="Recompute analytics rollups")
+    _ = rollups.add_argument("--user", help="Only rebuild rollups of this user ID")
+
+    checkpoints = commands.add_parser(
+        "rebuild-balance-checkpoints", help="Recompute balance history checkpoints"
+    )
+    _ = checkpoints.add_argument("--user", help="Only rebuild checkpoints of this user ID")
+
+    _ = commands.add_parser("dedupe-bank-transactions", help="Remove duplicate Plaid transactions")
+
+    _ = commands.add_parser(
+        "backfill-name-keys", help="Set normalized names on categories and payment methods"
+    )
+
+    _ = commands.add_parser("round-amounts", help="Round stored amounts to whole cents")
+
+    opening = commands.add_parser(
+        "backfill-opening-balances",
+        help="Set the opening balance of users registered before it was stored",
+    )
+    _ = opening.add_argument(
+        "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="Users read per batch"
+    )
+    _ = opening.add_argument(
+        "--concurrency", type=int, default=RECONCILE_CONCURRENCY, help="Users checked at once"
+    )
+
+    reconcile = commands.add_parser(
+        "reconcile-balances", help="Repair drift between stored balances and transactions"
+    )
+    _ = reconcile.add_argument(
+        "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="Users read per batch"
+    )
+    _ = reconcile.add_argument(
+        "--concurrency", type=int, default=RECONCILE_CONCURRENCY, help="Users checked at once"
+    )
+    _ = reconcile.add_argument(
+        "--rate", type=float, default=RECONCILE_RATE, help="Max users checked per second"
+    )
+    _ = reconcile.add_argument(
+        "--interval", type=float, help="Keep running, sleeping this many seconds between sweeps"
+    )
+
+    worker = commands.add_parser("sync-worker", help="Run queued and scheduled Plaid syncs")
+    _ = worker.add_argument(
+        "--workers", type=int, default=config.PLAID_SYNC_WORKERS, help="Jobs run at once"
+    )
+    _ = worker.add_argument(
+        "--no-schedule",
+        dest="schedule",
+        action="store_false",
+        help="Only run queued jobs; another worker schedules the periodic syncs",
+    )
+
+    args = parser.parse_args()
+
+    async def run() -> None:
+        if args.command == "dedupe-bank-transactions":
+            await dedupe_bank_transactions()
+            return
+        await init_db()
+        if args.command == "rebuild-rollups":
+            await rebuild_rollups(args.user)
+        elif args.command == "rebuild-balance-checkpoints":
+            await rebuild_balance_checkpoints(args.user)
+        elif args.command == "backfill-name-keys":
+            await backfill_category_name_keys()
+        elif args.command == "round-amounts":
+            await round_amounts()
+        elif args.command == "backfill-opening-balances":
+            await backfill_user_opening_balances(args.batch_size, args.concurrency)
+        elif args.command == "reconcile-balances":
+            await reconcile_balances(args.batch_size, args.concurrency, args.rate, args.interval)
+        elif args.command == "sync-worker":
+            await run_worker(args.workers, args.schedule)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Final
+from typing import Final, Literal
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -14,6 +14,8 @@ class Config(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Users allowed to read internal endpoints, e.g. ADMIN_EMAILS='["ops@example.com"]'
+    ADMIN_EMAILS: list[str] = []
 
     # Google OAuth
     GOOGLE_CLIENT_ID: str | None = None
@@ -29,6 +31,25 @@ class Config(BaseSettings):
     PLAID_CLIENT_ID: str
     PLAID_SECRET: str
     PLAID_ENV: str  # 'sandbox', 'development', 'production'
+    PLAID_TIMEOUT_SECONDS: float = 30.0  # Per-request timeout of Plaid API calls
+    PLAID_MAX_WORKERS: int = 16  # Threads running blocking Plaid SDK calls
+    PLAID_SYNC_CONCURRENCY: int = 8  # Bank connections synced at the same time
+    PLAID_INSTITUTION_CONCURRENCY: int = 2  # ...of which at most this many per institution
+    PLAID_SYNC_WORKERS: int = 4  # Jobs run at the same time by one sync worker process
+    PLAID_SYNC_INTERVAL_SECONDS: int = 6 * 60 * 60  # Scheduled sync of every connection
+    PLAID_HISTORY_DAYS: int = 730  # History requested from Plaid for a newly linked bank (max 730)
+    PLAID_WEBHOOK_URL: str | None = None  # Public URL of POST /plaid/webhook, sent to Plaid Link
+    PLAID_WEBHOOK_VERIFY: bool = True  # Check the Plaid-Verification signature of webhooks
+    PLAID_WEBHOOK_DEBOUNCE_SECONDS: int = 30  # Webhooks of an item within this window: one sync
+
+    # Analytics cache
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300
+    ANALYTICS_CACHE_MAX_SIZE: int = 10_000
+
+    # Analytics backend: "rollups" (MongoDB daily rollups) or "numpy" (in-memory
+    # per-user snapshots, needs the optional `analytics` dependencies)
+    ANALYTICS_BACKEND: Literal["rollups", "numpy"] = "rollups"
+    ANALYTICS_SNAPSHOT_MAX_USERS: int = 100
 
 
 def get_config() -> Config:
@@ -45,6 +66,43 @@ TIME_FRAMES: Final[dict[str, int]] = {
     "month": 30,
     "year": 365,
 }
+# Upper bound on points in one line chart
+MAX_LINE_POINTS: Final[int] = 1000
+# Upper bound on points in one balance history
+MAX_BALANCE_HISTORY_POINTS: Final[int] = 1000
+
+
+# ────────────── 💸 Transaction constants ──────────────
+# Max items in one bulk create / update / delete request
+MAX_BULK_TRANSACTIONS: Final[int] = 1000
+# Statement imports: max upload size and rows written per insert_many
+MAX_IMPORT_BYTES: Final[int] = 100 * 1024 * 1024
+IMPORT_CHUNK_SIZE: Final[int] = 1000
+# Row errors kept on an import job
+MAX_IMPORT_ERRORS: Final[int] = 20
+
+
+# ────────────── 🔄 Plaid sync queue constants ──────────────
+SYNC_JOB_LEASE_SECONDS: Final[int] = 300  # A running job not renewed for this long is requeued
+SYNC_JOB_MAX_ATTEMPTS: Final[int] = 5
+# Retry backoff: base * 2^(attempt - 1), capped
+SYNC_RETRY_BASE_SECONDS: Final[int] = 30
+SYNC_RETRY_MAX_SECONDS: Final[int] = 60 * 60
+SYNC_POLL_SECONDS: Final[float] = 2.0  # Idle worker wait before looking for jobs again
+SYNC_SCHEDULER_TICK_SECONDS: Final[int] = 60
+# Until Plaid has pulled the full history of a new item, sync again this soon
+SYNC_HISTORY_POLL_SECONDS: Final[int] = 15 * 60
+# Deleting a connection waits this long for a sync page being written to finish
+SYNC_PAGE_WAIT_SECONDS: Final[float] = 10.0
+
+
+# ────────────── ⚖️ Balance reconciliation constants ──────────────
+# Defaults of `python -m src.cli reconcile-balances`
+RECONCILE_BATCH_SIZE: Final[int] = 500  # Users read per batch
+RECONCILE_CONCURRENCY: Final[int] = 4  # Users checked at the same time
+RECONCILE_RATE: Final[float] = 50.0  # Max users checked per second
+# Pause before re-checking a drifted user (lets in-flight writes apply their $inc)
+RECONCILE_CONFIRM_DELAY: Final[float] = 1.0
 
 
 # ────────────── 🤖 AI constants ──────────────
@@ -1,23 +1,47 @@
 from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 from src.config import config
 from src.models import (
+    BalanceCheckpoint,
     BankAccount,
     BankConnection,
     BankTransaction,
     Budget,
     Category,
+    DailyRollup,
+    ImportJob,
     PaymentMethod,
     RefreshToken,
+    SyncJob,
     Transaction,
     User,
 )
+from src.utils.error_messages import BANK_TRANSACTION_DUPLICATES
 
 
-async def init_db() -> None:
+def get_database() -> AsyncIOMotorDatabase:
     client = AsyncIOMotorClient(config.MONGODB_URI)
-    db = client.get_default_database()
+    return client.get_default_database()
+
+
+async def _check_bank_transaction_duplicates(db: AsyncIOMotorDatabase) -> None:
+    """Fails with instructions instead of an index error while duplicate Plaid rows exist"""
+    collection = db[BankTransaction.Settings.name]
+    if "plaid_transaction_id" in await collection.index_information():
+        return  # The unique index already keeps duplicates out
+    pipeline = [
+        {"$group": {"_id": "$transaction_id", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    if await collection.aggregate(pipeline, allowDiskUse=True).to_list(1):
+        raise RuntimeError(BANK_TRANSACTION_DUPLICATES)
+
+
+async def init_db() -> None:
+    db = get_database()
+    await _check_bank_transaction_duplicates(db)
     await init_beanie(
         database=db,
         document_models=[
@@ -30,6 +54,10 @@ async def init_db() -> None:
             BankConnection,
             BankAccount,
             BankTransaction,
+            DailyRollup,
+            ImportJob,
+            BalanceCheckpoint,
+            SyncJob,
         ],
     )
     print("✅ MongoDB successfully connected to database:", db.name)
@@ -1,5 +1,12 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+
+import urllib3
 from plaid.api.plaid_api import PlaidApi
-from plaid.api_client import ApiClient
+from plaid.api_client import ApiClient, ApiException
 from plaid.configuration import Configuration
 
 from src.config import config
@@ -15,4 +22,53 @@ configuration = Configuration(
 )
 
 api_client: ApiClient = ApiClient(configuration)
-plaid_client: PlaidApi = PlaidApi(api_client)
+plaid_api: PlaidApi = PlaidApi(api_client)
+
+
+class AsyncPlaidClient:
+    """
+    🔌 Async gateway to the Plaid SDK, whose calls are blocking HTTP requests.
+    Each call runs in a bounded thread pool, so a slow Plaid response only holds a
+    pool thread and never the event loop, and is limited by a timeout. Network
+    failures and timeouts are raised as `ApiException`, like Plaid API errors.
+    """
+
+    def __init__(self, api: PlaidApi, max_workers: int, timeout: float) -> None:
+        self._api = api
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plaid")
+
+    async def _call(self, method: Callable[..., Any], request: Any) -> Any:
+        call = partial(method, request, _request_timeout=self._timeout)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, call)
+        try:
+            # Waiting for a free pool thread counts against the timeout too
+            return await asyncio.wait_for(future, self._timeout * 2)
+        except TimeoutError as e:
+            raise ApiException(status=0, reason="Plaid request timed out") from e
+        except urllib3.exceptions.HTTPError as e:
+            raise ApiException(status=0, reason=f"{type(e).__name__}\n{e!s}") from e
+
+    async def link_token_create(self, request: Any) -> Any:
+        return await self._call(self._api.link_token_create, request)
+
+    async def item_public_token_exchange(self, request: Any) -> Any:
+        return await self._call(self._api.item_public_token_exchange, request)
+
+    async def institutions_get_by_id(self, request: Any) -> Any:
+        return await self._call(self._api.institutions_get_by_id, request)
+
+    async def accounts_get(self, request: Any) -> Any:
+        return await self._call(self._api.accounts_get, request)
+
+    async def transactions_sync(self, request: Any) -> Any:
+        return await self._call(self._api.transactions_sync, request)
+
+    async def webhook_verification_key_get(self, request: Any) -> Any:
+        return await self._call(self._api.webhook_verification_key_get, request)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+plaid_client = AsyncPlaidClient(plaid_api, config.PLAID_MAX_WORKERS, config.PLAID_TIMEOUT_SECONDS)
@@ -5,15 +5,22 @@ from typing import Any, ClassVar, Literal, override
 
 from beanie import (  # Document — model for MongoDB, PydanticObjectId — ID
     Document,
+    Insert,
     PydanticObjectId,
+    Replace,
+    Save,
+    before_event,
 )
 from pydantic import (  # EmailStr — email validation, Field — for setting default values
     EmailStr,
     Field,
     field_validator,
 )
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
+from src.utils.money import quantize_cents
 from src.utils.mongo_types import convert_decimal128
+from src.utils.names import normalize_name
 
 
 class User(Document):
@@ -30,10 +37,15 @@ class User(Document):
     )  # 🕓 Automatic registration time
 
     balance: Decimal = Field(default=Decimal("0.00"))
+    # Initial balance at registration; None for users registered before it was stored,
+    # until `python -m src.cli backfill-opening-balances` has run
+    opening_balance: Decimal | None = None
+    data_version: int = 0  # Bumped on every data change, invalidates cached analytics
+    ledger_epoch: int = 0  # Bumped when stored transactions are changed or deleted
 
-    @field_validator("balance", mode="before")
+    @field_validator("balance", "opening_balance", mode="before")
     @classmethod
-    def validate_balance(cls, v: Any) -> Decimal:
+    def validate_balance(cls, v: Any) -> Decimal | None:
         return convert_decimal128(v)
 
     @override
@@ -41,6 +53,8 @@ class User(Document):
         data = super().model_dump(*args, **kwargs)
         if "balance" in data:
             data["balance"] = float(data["balance"])
+        if data.get("opening_balance") is not None:
+            data["opening_balance"] = float(data["opening_balance"])
         return data
 
     class Settings:
@@ -74,7 +88,8 @@ class Transaction(Document):
     @field_validator("amount", mode="before")
     @classmethod
     def validate_amount(cls, v: Any) -> Decimal:
-        return convert_decimal128(v)
+        # Whole cents, so analytics sums on cents match the Decimal sums
+        return quantize_cents(convert_decimal128(v))
 
     @field_validator("date", mode="before")
     @classmethod
@@ -150,6 +165,11 @@ class Category(Document):
     )  # Category color (optional)
     user_id: PydanticObjectId | None = None  # If None — default, otherwise custom
     is_default: bool = False  # Used for global categories
+    name_key: str | None = None  # Normalized name (see normalize_name), unique per user
+
+    @before_event(Insert, Replace, Save)
+    def set_name_key(self) -> None:
+        self.name_key = normalize_name(self.name)
 
     @override
     def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
@@ -160,9 +180,16 @@ class Category(Document):
 
     class Settings:
         name = "categories"
-        indexes: ClassVar[list[str | tuple[str, str]]] = [
+        indexes: ClassVar[list[str | tuple[str, str] | IndexModel]] = [
             "user_id",
             ("name", "user_id"),
+            # Partial: documents not yet backfilled have no key
+            IndexModel(
+                [("user_id", ASCENDING), ("name_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"name_key": {"$type": "string"}},
+                name="category_name_key",
+            ),
         ]
         json_encoders: ClassVar[dict[type, Any]] = {
             PydanticObjectId: str,
@@ -182,6 +209,11 @@ class PaymentMethod(Document):
     last4: str | None = Field(default=None, min_length=4, max_length=4)  # Last 4 digits
     icon: str | None = None  # 🎨 Emoji or icon: 🏦 💳
     user_id: PydanticObjectId  # Link to user
+    name_key: str | None = None  # Normalized name (see normalize_name), unique per user
+
+    @before_event(Insert, Replace, Save)
+    def set_name_key(self) -> None:
+        self.name_key = normalize_name(self.name)
 
     @override
     def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
@@ -192,10 +224,17 @@ class PaymentMethod(Document):
 
     class Settings:
         name = "payment_methods"
-        indexes: ClassVar[list[str | tuple[str, ...]]] = [
+        indexes: ClassVar[list[str | tuple[str, ...] | IndexModel]] = [
             "user_id",
             ("user_id", "card_type"),
             ("user_id", "bank"),
+            # Partial: documents not yet backfilled have no key
+            IndexModel(
+                [("user_id", ASCENDING), ("name_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"name_key": {"$type": "string"}},
+                name="payment_method_name_key",
+            ),
         ]
         json_encoders: ClassVar[dict[type, Any]] = {
             PydanticObjectId: str,
@@ -246,6 +285,13 @@ class BankConnection(Document):
     item_id: str
     institution_id: str | None = Field(default=None)
     institution_name: str | None = Field(default=None)
+    sync_cursor: str | None = None  # Plaid /transactions/sync cursor of the last synced page
+    # Set while a sync page is written; still set on the next sync = that write was cut off
+    sync_page_pending: bool = False
+    # Plaid transactions_update_status: "HISTORICAL_UPDATE_COMPLETE" once all history is pulled
+    history_status: str | None = None
+    last_synced_at: datetime | None = None  # End of the last successful sync
+    next_sync_at: datetime | None = None  # When the scheduler queues the next sync
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
     @override
@@ -261,6 +307,11 @@ class BankConnection(Document):
             PydanticObjectId: str,
             datetime: str,
         }
+        indexes: ClassVar[list[str]] = [
+            "user_id",
+            "item_id",  # Plaid webhooks name the item
+            "next_sync_at",
+        ]
 
 
 class BankAccount(Document):
@@ -309,6 +360,11 @@ class BankTransaction(Document):
     pending: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
+    @field_validator("amount", mode="before")
+    @classmethod
+    def validate_amount(cls, v: Any) -> float:
+        return float(quantize_cents(v))
+
     @override
     def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
         data = super().model_dump(*args, **kwargs)
@@ -325,3 +381,140 @@ class BankTransaction(Document):
             datetime: str,
             date: str,
         }
+        indexes: ClassVar[list[IndexModel]] = [
+            # One row per Plaid transaction: dedupes concurrent syncs
+            IndexModel([("transaction_id", ASCENDING)], unique=True, name="plaid_transaction_id"),
+            IndexModel([("user_id", ASCENDING), ("date", ASCENDING)]),
+            IndexModel([("bank_account_id", ASCENDING)]),  # Deleting a bank connection
+        ]
+
+
+class DailyRollup(Document):
+    """
+    📅 Per-day totals of user transactions (manual and bank) for analytics.
+    Maintained incrementally with $inc on every transaction write.
+    """
+
+    user_id: PydanticObjectId
+    day: datetime  # UTC midnight of the transaction date
+    category: str | None = None
+    type: TransactionType
+    source: Literal["manual", "plaid"]
+    payment_method: str | None = None
+    total_cents: int = 0  # Sum of amounts as shown in analytics, in cents (int64)
+    transactions_count: int = 0  # Number of transactions in the bucket
+
+    class Settings:
+        name = "daily_rollups"
+        indexes: ClassVar[list[IndexModel]] = [
+            # One document per bucket, also serves (user_id, day) range scans
+            IndexModel(
+                [
+                    ("user_id", ASCENDING),
+                    ("day", ASCENDING),
+                    ("category", ASCENDING),
+                    ("type", ASCENDING),
+                    ("source", ASCENDING),
+                    ("payment_method", ASCENDING),
+                ],
+                unique=True,
+                name="rollup_bucket",
+            ),
+            IndexModel([("user_id", ASCENDING), ("type", ASCENDING), ("day", ASCENDING)]),
+        ]
+
+
+class BalanceCheckpoint(Document):
+    """
+    ⚖️ Net balance change of a user over one day or one calendar month, in cents.
+    Maintained with $inc alongside `User.balance`; the balance at the end of a day is
+    the opening balance plus all month totals before its month plus the day totals of
+    its month up to that day.
+    """
+
+    user_id: PydanticObjectId
+    period: Literal["day", "month"]
+    start: datetime  # UTC midnight of the day / of the first day of the month
+    delta_cents: int = 0  # Signed balance change (int64)
+
+    class Settings:
+        name = "balance_checkpoints"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel(
+                [("user_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)],
+                unique=True,
+                name="balance_checkpoint",
+            ),
+        ]
+
+
+class SyncJob(Document):
+    """
+    🔄 Queued Plaid sync of one bank connection, run by the sync worker process
+    (`python -m src.cli sync-worker`)
+    """
+
+    user_id: PydanticObjectId
+    connection_id: PydanticObjectId
+    trigger: Literal["manual", "webhook", "schedule"] = "manual"
+    priority: int = 0  # Higher runs first
+    status: Literal["queued", "running", "completed", "failed", "superseded", "cancelled"] = (
+        "queued"
+    )
+    attempts: int = 0
+    run_at: datetime = Field(default_factory=lambda: datetime.now(UTC))  # Not before (backoff)
+    locked_until: datetime | None = None  # Lease of the worker running the job
+    worker: str | None = None  # host:pid of the worker that claimed it last
+    # Progress, updated after every synced page
+    pages: int = 0
+    added: int = 0
+    modified: int = 0
+    removed: int = 0
+    history_status: str | None = None  # Of the connection, see BankConnection
+    error: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Settings:
+        name = "sync_jobs"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel(
+                [("status", ASCENDING), ("priority", DESCENDING), ("run_at", ASCENDING)],
+                name="sync_job_claim",
+            ),
+            # Single flight: at most one queued job per connection
+            IndexModel(
+                [("connection_id", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"status": "queued"},
+                name="sync_job_queued_connection",
+            ),
+            IndexModel([("connection_id", ASCENDING), ("status", ASCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
+
+
+class ImportJob(Document):
+    """
+    📥 Background import of a bank statement file (CSV / OFX / QFX) into manual transactions
+    """
+
+    user_id: PydanticObjectId
+    file_format: Literal["csv", "ofx", "qfx"]
+    status: Literal["pending", "running", "completed", "failed"] = "pending"
+    bytes_total: int = 0  # Size of the uploaded file
+    bytes_processed: int = 0  # How far the parser got, for progress reporting
+    rows_parsed: int = 0
+    rows_imported: int = 0
+    rows_duplicate: int = 0  # Already stored (same date, amount and description)
+    rows_invalid: int = 0
+    errors: list[str] = Field(default_factory=list)  # First few row errors
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    finished_at: datetime | None = None
+
+    class Settings:
+        name = "import_jobs"
+        indexes: ClassVar[list[str | tuple[str, ...]]] = [
+            ("user_id", "created_at"),
+        ]
@@ -1,11 +1,21 @@
+from datetime import UTC, date, datetime, timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from passlib.context import CryptContext
 
 from src.auth.dependencies import get_current_user
 from src.models import User
-from src.schemas.base import PasswordUpdateRequest, PasswordUpdateResponse
+from src.schemas.base import (
+    BalanceHistoryPoint,
+    BalanceHistoryResponse,
+    BalanceHistoryStep,
+    PasswordUpdateRequest,
+    PasswordUpdateResponse,
+)
+from src.utils.analytics_helper import start_of_day
+from src.utils.balance_history import balance_history, rebuild_user_checkpoints
+from src.utils.recalculate_user_balance import recalculate_user_balance
 
 router = APIRouter(prefix="/account", tags=["Account"])
 
@@ -60,9 +70,8 @@ async def update_password(
             detail="Old password is incorrect",
         )
 
-    # 🔐 Hash and save the new password
-    user.hashed_password = pwd_context.hash(data.new_password)
-    _ = await user.save()
+    # 🔐 Hash and save the new password ($set only this field, not the whole user)
+    _ = await user.set({User.hashed_password: pwd_context.hash(data.new_password)})
 
     # ✅ Return confirmation
     return PasswordUpdateResponse()
@@ -76,3 +85,48 @@ async def get_balance(
     💰 Get current user balance
     """
     return {"balance": float(current_user.balance)}
+
+
+@router.post("/balance/reconcile")
+async def reconcile_balance(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> dict[str, float]:
+    """
+    🧮 Recompute the balance and the balance history checkpoints from all transactions
+    (manual and bank) and store them.
+    Balance changes are normally applied incrementally; this fixes any drift.
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
+    if current_user.opening_balance is None:
+        # Registered before the opening balance was stored: recomputing would drop it
+        raise HTTPException(
+            status_code=409, detail="Opening balance is not known yet, try again later"
+        )
+
+    balance = await recalculate_user_balance(current_user.id)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    _ = await rebuild_user_checkpoints(current_user.id)
+
+    return {"previous_balance": float(current_user.balance), "balance": float(balance)}
+
+
+@router.get("/balance/history")
+async def get_balance_history(
+    current_user: Annotated[User, Depends(get_current_user)],
+    date_from: Annotated[date | None, Query(alias="from")] = None,
+    date_to: Annotated[date | None, Query(alias="to")] = None,
+    step: BalanceHistoryStep = "day",
+) -> BalanceHistoryResponse:
+    """
+    📉 Balance at the end of each day from `from` to `to` (default: the last 30 days),
+    one point per `step`. Read from balance checkpoints, not from the transactions.
+    """
+    end = start_of_day(date_to or datetime.now(UTC))
+    start = start_of_day(date_from) if date_from else end - timedelta(days=30)
+    points = await balance_history(current_user, start, end, step)
+    return BalanceHistoryResponse(
+        step=step,
+        points=[BalanceHistoryPoint(date=day.date(), balance=balance) for day, balance in points],
+    )
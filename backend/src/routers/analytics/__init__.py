@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from src.routers.analytics.cache import router as cache_router
+from src.routers.analytics.dashboard import router as dashboard_router
 from src.routers.analytics.transactions import router as transactions_router
 
 # Создаем основной роутер для аналитики
@@ -7,3 +9,5 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 # Подключаем роутер для транзакций
 router.include_router(transactions_router)
+router.include_router(dashboard_router)
+router.include_router(cache_router)
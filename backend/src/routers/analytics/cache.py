@@ -0,0 +1,19 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from src.auth.dependencies import get_admin_user
+from src.models import User
+from src.utils.analytics_cache import analytics_cache
+
+router = APIRouter(prefix="/cache", tags=["Analytics Cache"])
+
+
+@router.get("/stats")
+async def get_cache_stats(
+    _admin: Annotated[User, Depends(get_admin_user)],
+) -> dict[str, int | float]:
+    """
+    📦 Hit/miss counters of the analytics cache (for this worker process), admins only
+    """
+    return analytics_cache.stats()
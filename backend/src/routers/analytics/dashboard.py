@@ -0,0 +1,140 @@
+import asyncio
+from datetime import UTC, datetime
+from typing import Annotated, Any
+
+from beanie import PydanticObjectId
+from fastapi import APIRouter, Depends, HTTPException
+
+from src.auth.dependencies import get_current_user
+from src.models import Budget, TransactionType, User
+from src.schemas.analytics_schemas import (
+    DashboardRequest,
+    DashboardResponse,
+    DashboardWidget,
+    DashboardWidgetResult,
+    LineChartResponse,
+)
+from src.utils.analytics_cache import analytics_cache
+from src.utils.analytics_pipeline import aggregate_line
+from src.utils.analytics_snapshot import load_rows, load_summary
+from src.utils.analytics_widgets import (
+    build_bucketed_line,
+    build_budget_overview,
+    build_compare,
+    build_compare_types,
+    build_pie,
+    build_summary,
+    line_buckets,
+    month_starts,
+    select_rows,
+    timeframe_start,
+)
+
+router = APIRouter(tags=["Analytics Dashboard"])
+
+
+def _window_start(widget: DashboardWidget, now: datetime) -> datetime | None:
+    """Earliest day of the shared rollup rows a widget needs (None = it runs its own query)"""
+    start_of_month, start_of_prev_month = month_starts(now)
+    match widget.name:
+        case "summary" | "line":
+            return None
+        case "pie" | "budget-analysis":
+            return start_of_month
+        case "compare":
+            return start_of_prev_month
+        case "compare-types":
+            return timeframe_start(widget.timeframe, now)
+
+
+async def _line(user: User, widget: DashboardWidget, now: datetime) -> LineChartResponse:
+    """Same buckets as /analytics/transactions/line for the widget's timeframe"""
+    bucket_from, bucket_to = line_buckets(
+        timeframe_start(widget.timeframe, now), now, widget.granularity
+    )
+    rows = await aggregate_line(
+        PydanticObjectId(user.id),
+        widget.granularity,
+        bucket_from,
+        bucket_to,
+        widget.transaction_type,
+    )
+    return build_bucketed_line(rows, widget.timeframe, widget.granularity)
+
+
+async def _build_widget(
+    widget: DashboardWidget,
+    user: User,
+    rows: list[dict[str, Any]],
+    budgets: list[Budget],
+    now: datetime,
+) -> DashboardWidgetResult:
+    start = _window_start(widget, now)
+    try:
+        match widget.name:
+            case "summary":
+                data = build_summary(await load_summary(user, widget.transaction_type))
+            case "pie":
+                data = build_pie(select_rows(rows, widget.transaction_type, start))
+            case "line":
+                data = await _line(user, widget, now)
+            case "compare":
+                data = build_compare(select_rows(rows, widget.transaction_type, start), now)
+            case "compare-types":
+                if widget.timeframe == "day":
+                    return DashboardWidgetResult(
+                        widget=widget, error="compare-types supports week, month or year"
+                    )
+                data = build_compare_types(select_rows(rows, None, start), widget.timeframe)
+            case "budget-analysis":
+                expenses = select_rows(rows, TransactionType.EXPENSE, start)
+                data = build_budget_overview(expenses, budgets)
+    except HTTPException as e:
+        return DashboardWidgetResult(widget=widget, error=str(e.detail))
+    return DashboardWidgetResult(widget=widget, data=data)
+
+
+@router.post("/dashboard")
+async def get_dashboard(
+    request: DashboardRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> DashboardResponse:
+    """
+    🧩 Several analytics widgets in one request:
+    - summary, pie, line (with timeframe and granularity), compare, compare-types,
+      budget-analysis
+    - Summary and line are aggregated server-side like their endpoints; the other
+      widgets share a single read of the rollups they need
+    - A widget without data returns an error instead of failing the whole request
+    """
+    user_id = current_user.id
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="User ID is missing")
+
+    async def compute() -> DashboardResponse:
+        now = datetime.now(UTC)
+        starts = [start for widget in request.widgets if (start := _window_start(widget, now))]
+
+        # One pass: every rollup bucket the row-based widgets need
+        rows: list[dict[str, Any]] = []
+        if starts:
+            rows = await load_rows(
+                current_user,
+                ["day", "category", "type", "source", "payment_method"],
+                date_from=min(starts),
+            )
+        budgets: list[Budget] = []
+        if any(widget.name == "budget-analysis" for widget in request.widgets):
+            budgets = await Budget.find(Budget.user_id == user_id).to_list()
+
+        results = await asyncio.gather(
+            *(_build_widget(widget, current_user, rows, budgets, now) for widget in request.widgets)
+        )
+        return DashboardResponse(widgets=list(results))
+
+    return await analytics_cache.get_or_compute(
+        current_user,
+        "dashboard",
+        {"widgets": tuple(widget.model_dump_json() for widget in request.widgets)},
+        compute,
+    )
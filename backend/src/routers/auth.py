@@ -61,6 +61,7 @@ async def register(
         last_name=user_in.last_name,
         birth_date=user_in.birth_date,
         balance=user_in.initial_balance,  # Set initial balance
+        opening_balance=user_in.initial_balance,  # Kept for balance recalculation
     )
     _ = await user.insert()
 
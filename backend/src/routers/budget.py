@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status  # 🚀 FastAPI to
 from src.auth.dependencies import get_current_user  # 🔐 Get current user
 from src.models import Budget, User  # 🧠 Budget and user models
 from src.schemas.budget import BudgetCreate, BudgetPublic, BudgetUpdate  # 📦 Schemas for work
+from src.utils.analytics_cache import bump_data_version  # ♻️ Invalidate cached analytics
 
 # ⚙️ Router with prefix /budgets
 router = APIRouter(prefix="/budgets", tags=["Budgets"])
@@ -41,6 +42,7 @@ async def create_budget(
 
     # 💾 Save to database
     _ = await budget.insert()
+    await bump_data_version(current_user.id)
 
     # 📤 Return public schema to client
     return BudgetPublic(**budget.model_dump())
@@ -95,6 +97,7 @@ async def update_budget(
 
     # 💾 Save
     _ =await budget.save()
+    await bump_data_version(current_user.id)
 
     # 📤 Return
     return BudgetPublic(**budget.model_dump())
@@ -125,3 +128,4 @@ async def delete_budget(
 
     # 🧹 Delete
     _ = await budget.delete()
+    await bump_data_version(current_user.id)
@@ -1,12 +1,15 @@
-import re
 from typing import Annotated
 
 from beanie import PydanticObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
+from pymongo.errors import DuplicateKeyError
 
 from src.auth.dependencies import get_current_user
 from src.models import Category, Transaction, User
 from src.schemas.category_schemas import CategoryCreate, CategoryPublic, CategoryUpdate
+from src.utils.analytics_cache import bump_data_version
+from src.utils.names import normalize_name
+from src.utils.rollups import move_manual_rollups
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
@@ -37,12 +40,9 @@ async def create_category(
     # 🧼 Remove spaces around name
     clean_name = category_in.name.strip()
 
-    # ⛔ Check for duplicates (case-insensitive and considering spaces)
+    # ⛔ Check for duplicates by normalized name (index point lookup)
     existing = await Category.find_one(
-        {
-            "user_id": current_user.id,
-            "name": {"$regex": f"^{re.escape(clean_name)}$", "$options": "i"},
-        }
+        {"user_id": current_user.id, "name_key": normalize_name(clean_name)}
     )
 
     if existing:
@@ -56,7 +56,13 @@ async def create_category(
         color=category_in.color,
         is_default=False,
     )
-    _ = await category.insert()
+    try:
+        _ = await category.insert()
+    except DuplicateKeyError:
+        # Created concurrently: the unique (user_id, name_key) index keeps one
+        raise HTTPException(
+            status_code=400, detail="Category with this name already exists."
+        ) from None
 
     return CategoryPublic.model_validate(category.model_dump())
 
@@ -79,9 +85,13 @@ async def delete_category(
         )
 
     # 👇 Update all transactions where this category was used
+    await move_manual_rollups(
+        PydanticObjectId(current_user.id), "category", category.name, "Uncategorized"
+    )
     _ = await Transaction.find(
         Transaction.user_id == current_user.id, Transaction.category == category.name
     ).update_many({"$set": {"category": "Uncategorized"}})
+    await bump_data_version(PydanticObjectId(current_user.id), rewritten=True)
 
     # 🗑 Delete category
     _ = await category.delete()
@@ -115,7 +125,12 @@ async def update_category(
     if category_in.icon is not None:
         category.icon = category_in.icon
 
-    _ = await category.save()
+    try:
+        _ = await category.save()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=400, detail="Category with this name already exists."
+        ) from None
 
     return CategoryPublic.model_validate(category.model_dump())
 
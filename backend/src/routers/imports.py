@@ -0,0 +1,102 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Annotated, Literal
+
+from beanie import PydanticObjectId
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+
+from src.auth.dependencies import get_current_user
+from src.config import MAX_IMPORT_BYTES
+from src.models import ImportJob, User
+from src.schemas.import_schemas import ImportJobPublic
+from src.utils.statement_import import run_import
+
+router = APIRouter(prefix="/transactions/import", tags=["Transaction Import"])
+
+
+def _to_public(job: ImportJob) -> ImportJobPublic:
+    return ImportJobPublic(
+        id=PydanticObjectId(job.id),
+        file_format=job.file_format,
+        status=job.status,
+        progress=round(job.bytes_processed / job.bytes_total, 4) if job.bytes_total else 0.0,
+        rows_parsed=job.rows_parsed,
+        rows_imported=job.rows_imported,
+        rows_duplicate=job.rows_duplicate,
+        rows_invalid=job.rows_invalid,
+        errors=job.errors,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is larger than {MAX_IMPORT_BYTES // (1024 * 1024)} MB",
+    )
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def import_statement(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Annotated[User, Depends(get_current_user)],
+    file_format: Annotated[Literal["csv", "ofx", "qfx"], Query()],
+) -> ImportJobPublic:
+    """
+    📥 Import a bank statement file as manual transactions:
+    - The raw file is the request body (CSV, OFX or QFX)
+    - The body is streamed to a temporary file, never held in memory
+    - Parsing, deduplication and inserts run in the background; poll the returned job
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_IMPORT_BYTES:
+        raise _too_large()
+
+    fd, name = tempfile.mkstemp(prefix="statement-", suffix=f".{file_format}")
+    path = Path(name)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > MAX_IMPORT_BYTES:
+                    raise _too_large()
+                _ = file.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="The file is empty")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    job = ImportJob(
+        user_id=PydanticObjectId(current_user.id), file_format=file_format, bytes_total=size
+    )
+    _ = await job.insert()
+    background_tasks.add_task(run_import, job, path)
+
+    return _to_public(job)
+
+
+@router.get("/{job_id}")
+async def get_import_job(
+    job_id: PydanticObjectId,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> ImportJobPublic:
+    """
+    📊 Status and progress of a statement import
+    """
+    job = await ImportJob.get(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    if job.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this import job")
+
+    return _to_public(job)
@@ -1,8 +1,8 @@
-import re
 from typing import Annotated
 
 from beanie import PydanticObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
+from pymongo.errors import DuplicateKeyError
 
 from src.auth.dependencies import get_current_user
 from src.models import PaymentMethod, Transaction, User
@@ -11,6 +11,9 @@ from src.schemas.payment_method_schemas import (
     PaymentMethodPublic,
     PaymentMethodUpdate,
 )
+from src.utils.analytics_cache import bump_data_version
+from src.utils.names import normalize_name
+from src.utils.rollups import move_manual_rollups
 
 router = APIRouter(prefix="/payment-methods", tags=["Payment Methods"])
 
@@ -42,12 +45,9 @@ async def create_payment_method(
     # 🧼 Clean name from spaces
     clean_name = method_in.name.strip()
 
-    # ⛔ Check for duplicates
+    # ⛔ Check for duplicates by normalized name (index point lookup)
     existing = await PaymentMethod.find_one(
-        {
-            "user_id": current_user.id,
-            "name": {"$regex": f"^{re.escape(clean_name)}$", "$options": "i"},
-        }
+        {"user_id": current_user.id, "name_key": normalize_name(clean_name)}
     )
 
     if existing:
@@ -64,7 +64,13 @@ async def create_payment_method(
         icon=method_in.icon,
         user_id=PydanticObjectId(current_user.id),
     )
-    _ = await method.insert()
+    try:
+        _ = await method.insert()
+    except DuplicateKeyError:
+        # Created concurrently: the unique (user_id, name_key) index keeps one
+        raise HTTPException(
+            status_code=400, detail="Payment method with this name already exists."
+        ) from None
 
     return PaymentMethodPublic.model_validate(method.model_dump())
 
@@ -83,9 +89,13 @@ async def delete_payment_method(
         raise HTTPException(status_code=403, detail="Forbidden")
 
     # 🔁 Update transactions using this method
+    await move_manual_rollups(
+        PydanticObjectId(current_user.id), "payment_method", method.name, "Undefined"
+    )
     _ = await Transaction.find(
         Transaction.user_id == current_user.id, Transaction.payment_method == method.name
     ).update_many({"$set": {"payment_method": "Undefined"}})
+    await bump_data_version(PydanticObjectId(current_user.id), rewritten=True)
 
     # 🗑 Delete method
     _ = await method.delete()
@@ -121,7 +131,12 @@ async def update_payment_method(
     if method_in.icon is not None:
         method.icon = method_in.icon
 
-    _ = await method.save()
+    try:
+        _ = await method.save()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=400, detail="Payment method with this name already exists."
+        ) from None
 
     return PaymentMethodPublic.model_validate(method.model_dump())
 
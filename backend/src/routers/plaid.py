@@ -1,8 +1,5 @@
-# Import regular expression module for pattern matching
-import re
-
-# Import time-related modules for date and time operations
-from datetime import UTC, date, datetime, timedelta
+# Import JSON parsing for webhook bodies
+import json
 
 # Import type checking related modules
 from typing import TYPE_CHECKING, Annotated, Any, cast
@@ -11,7 +8,7 @@ from typing import TYPE_CHECKING, Annotated, Any, cast
 from beanie import PydanticObjectId
 
 # Import FastAPI related modules for routing and request handling
-from fastapi import APIRouter, Depends, Path, Query
+from fastapi import APIRouter, Depends, Header, Path, Query, Request, status
 
 # Import Plaid API related modules
 from plaid.api_client import ApiException
@@ -21,31 +18,47 @@ from plaid.model.institutions_get_by_id_request import InstitutionsGetByIdReques
 from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
 from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+from plaid.model.link_token_transactions import LinkTokenTransactions
 from plaid.model.products import Products
-from plaid.model.transactions_get_request import TransactionsGetRequest
-from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
 
 # Import authentication dependencies
 from src.auth.dependencies import get_current_user
 from src.auth.exceptions import (
+    raise_bad_request_error,
     raise_forbidden_error,
     raise_invalid_data_error,
     raise_missing_field_error,
     raise_not_found_error,
     raise_plaid_api_error,
+    raise_unauthorized_error,
 )
 
-# Import Plaid client configuration
+# Import application settings
+from src.config import config
+
+# Import async Plaid gateway
 from src.integrations.plaid import plaid_client
 
 # Import database models
-from src.models import BankAccount, BankConnection, BankTransaction, Category, User
+from src.models import BankAccount, BankConnection, BankTransaction, SyncJob, User
 
 # Import Plaid related schemas
-from src.schemas.plaid import ExchangeTokenRequest
+from src.schemas.plaid import ExchangeTokenRequest, SyncJobPublic
+
+# Import incremental balance updates
+from src.utils.balance import apply_balance_change, bank_transactions_change
+
+# Import Plaid account mapping
+from src.utils.plaid_sync import bank_account_from_plaid, delete_idle_connection
+
+# Import Plaid webhook handling
+from src.utils.plaid_webhook import WebhookVerificationError, handle_webhook, verify_webhook
+
+# Import analytics rollup maintenance
+from src.utils.rollups import remove_bank_rollups
 
-# Import utility function for balance recalculation
-from src.utils.recalculate_user_balance import recalculate_user_balance
+# Import the Plaid sync job queue
+from src.utils.sync_queue import PRIORITY_MANUAL, cancel_connection_jobs, enqueue_sync
 
 # Type checking imports for better type hints
 if TYPE_CHECKING:
@@ -55,6 +68,37 @@ if TYPE_CHECKING:
 router = APIRouter(prefix="/plaid", tags=["Plaid"])
 
 
+def _to_public(job: SyncJob) -> SyncJobPublic:
+    return SyncJobPublic(
+        id=PydanticObjectId(job.id),
+        connection_id=job.connection_id,
+        trigger=job.trigger,
+        status=job.status,
+        attempts=job.attempts,
+        run_at=job.run_at,
+        pages=job.pages,
+        added=job.added,
+        modified=job.modified,
+        removed=job.removed,
+        history_status=job.history_status,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+async def _enqueue_user_syncs(user: User) -> list[SyncJobPublic]:
+    """Queues an on-demand sync of every bank connection of the user"""
+    connections = await BankConnection.find(BankConnection.user_id == user.id).to_list()
+    if not connections:
+        raise_not_found_error("No bank connections found")
+    return [
+        _to_public(await enqueue_sync(connection, "manual", PRIORITY_MANUAL))
+        for connection in connections
+    ]
+
+
 @router.post("/link-token")
 async def create_link_token(
     # Get the current authenticated user
@@ -73,9 +117,14 @@ async def create_link_token(
             country_codes=[CountryCode("US"), CountryCode("CA")],
             # Set the language
             language="en",
+            # Ask for up to 24 months of history, pulled by the first sync
+            transactions=LinkTokenTransactions(days_requested=config.PLAID_HISTORY_DAYS),
         )
+        # Let Plaid notify new transactions instead of waiting for the scheduled sync
+        if config.PLAID_WEBHOOK_URL:
+            request.webhook = config.PLAID_WEBHOOK_URL
         # Make API call to Plaid to create link token
-        response = plaid_client.link_token_create(request)
+        response = await plaid_client.link_token_create(request)
         # Return the generated link token
         return {"link_token": response["link_token"]}
     except ApiException as e:
@@ -102,7 +151,8 @@ async def exchange_public_token(
     try:
         # Make API call to Plaid to exchange the token
         response = cast(
-            "ItemPublicTokenExchangeResponse", plaid_client.item_public_token_exchange(request)
+            "ItemPublicTokenExchangeResponse",
+            await plaid_client.item_public_token_exchange(request),
         )
     except ApiException as e:
         # Handle Plaid API errors
@@ -122,7 +172,7 @@ async def exchange_public_token(
     if institution_id:
         try:
             # Make API call to get institution details
-            inst_response = plaid_client.institutions_get_by_id(
+            inst_response = await plaid_client.institutions_get_by_id(
                 InstitutionsGetByIdRequest(
                     institution_id=institution_id,
                     country_codes=[CountryCode("US"), CountryCode("CA")],
@@ -151,6 +201,8 @@ async def exchange_public_token(
     )
     # Save bank connection to database
     _ = await bank_connection.insert()
+    # Queue the first sync (the history backfill) right away instead of waiting for the scheduler
+    _ = await enqueue_sync(bank_connection, "manual", PRIORITY_MANUAL)
 
     # Return success response
     return {
@@ -182,7 +234,7 @@ async def get_and_save_bank_accounts(
             # Create request to get accounts
             request = AccountsGetRequest(access_token=conn.access_token)
             # Make API call to Plaid
-            response = plaid_client.accounts_get(request)
+            response = await plaid_client.accounts_get(request)
             # Process each account
             for acc in response.accounts:
                 # Check if account already exists
@@ -199,19 +251,7 @@ async def get_and_save_bank_accounts(
                     raise_missing_field_error("Connection ID")
 
                 # Create new bank account record
-                account = BankAccount(
-                    user_id=current_user.id,
-                    bank_connection_id=conn.id,
-                    account_id=cast("str", acc.account_id),
-                    name=cast("str", acc.name),
-                    official_name=cast("str | None", acc.official_name),
-                    type=cast("str", acc.type.value),
-                    subtype=cast("str | None", acc.subtype.value if acc.subtype else None),
-                    mask=cast("str | None", acc.mask),
-                    current_balance=cast("float | None", acc.balances.current),
-                    available_balance=cast("float | None", acc.balances.available),
-                    iso_currency_code=cast("str | None", acc.balances.iso_currency_code),
-                )
+                account = bank_account_from_plaid(acc, current_user.id, conn.id)
                 # Save account to database
                 _ = await account.insert()
                 # Add account to saved accounts list
@@ -230,12 +270,18 @@ async def get_and_save_bank_accounts(
 
 
 @router.get("/transactions")
-async def sync_and_get_transactions(
+async def get_bank_transactions(
     # Get the current authenticated user
     current_user: Annotated[User, Depends(get_current_user)],
     # Optional account type filter
     account_type: Annotated[str | None, Query] = None,
+    # Max number of transactions returned
+    limit: Annotated[int, Query(ge=1, le=1000)] = 500,
 ) -> list[dict[str, Any]]:
+    """
+    Return synced bank transactions, newest first. Syncing runs in the sync worker
+    (see POST /plaid/sync), so this only reads what is already stored.
+    """
     # Build query for bank accounts
     account_query = BankAccount.find(BankAccount.user_id == current_user.id)
     if account_type:
@@ -246,111 +292,97 @@ async def sync_and_get_transactions(
     if not accounts:
         raise_not_found_error("No bank accounts found")
 
-    # List to store transactions to return
-    transactions_to_return: list[dict[str, Any]] = []
+    # Read stored transactions of the matching accounts
+    transactions = (
+        await BankTransaction.find(
+            BankTransaction.user_id == current_user.id,
+            {"bank_account_id": {"$in": [account.id for account in accounts]}},
+        )
+        .sort(-BankTransaction.date)
+        .limit(limit)
+        .to_list()
+    )
+    return [txn.model_dump() for txn in transactions]
 
-    # Process each account
-    for account in accounts:
-        # Get associated bank connection
-        connection = await BankConnection.get(account.bank_connection_id)
-        if not connection or not connection.access_token:
-            raise_missing_field_error(
-                "Invalid bank connection or missing access token. Please reconnect."
-            )
 
-        try:
-            # Set date range for transaction sync
-            start_date = (datetime.now(UTC) - timedelta(days=30)).date()
-            end_date = datetime.now(UTC).date()
-
-            # Create request to get transactions
-            request = TransactionsGetRequest(
-                access_token=connection.access_token,
-                start_date=start_date,
-                end_date=end_date,
-                options=TransactionsGetRequestOptions(account_ids=[account.account_id]),
-            )
+@router.post("/sync", status_code=status.HTTP_202_ACCEPTED)
+async def sync_bank_connections(
+    # Get the current authenticated user
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> list[SyncJobPublic]:
+    """
+    Queue a sync of every bank connection; poll the returned jobs for the result
+    """
+    return await _enqueue_user_syncs(current_user)
 
-            # Make API call to Plaid
-            response = plaid_client.transactions_get(request)
 
-            # Process each transaction
-            for txn in response.transactions:
-                # Check if transaction already exists
-                exists = await BankTransaction.find_one(
-                    BankTransaction.transaction_id == cast("str", txn.transaction_id)
-                )
-                if exists:
-                    continue
+@router.get("/sync/jobs")
+async def list_sync_jobs(
+    # Get the current authenticated user
+    current_user: Annotated[User, Depends(get_current_user)],
+    # Max number of jobs returned
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+) -> list[SyncJobPublic]:
+    """
+    Latest sync jobs of the user, newest first
+    """
+    jobs = (
+        await SyncJob.find(SyncJob.user_id == current_user.id)
+        .sort(-SyncJob.created_at)
+        .limit(limit)
+        .to_list()
+    )
+    return [_to_public(job) for job in jobs]
 
-                # Get Plaid category
-                plaid_category = txn.category[0] if txn.category else "Uncategorized"
-                plaid_category_str = cast("str", plaid_category)
 
-                # Find or create category
-                category = await Category.find_one(
-                    {
-                        "user_id": current_user.id,
-                        "name": {"$regex": f"^{re.escape(plaid_category_str)}$", "$options": "i"},
-                    }
-                )
+@router.get("/sync/jobs/{job_id}")
+async def get_sync_job(
+    # Get the current authenticated user
+    current_user: Annotated[User, Depends(get_current_user)],
+    # Get job ID from path
+    job_id: Annotated[PydanticObjectId, Path(description="Sync job ID")],
+) -> SyncJobPublic:
+    """
+    Status and result of one sync job
+    """
+    job = await SyncJob.get(job_id)
+    if not job:
+        raise_not_found_error("Sync job not found")
 
-                if not category:
-                    # Create new category if it doesn't exist
-                    category = Category(
-                        name=cast("str", plaid_category).strip(),
-                        user_id=current_user.id,
-                        icon="📦",
-                        color="#9CA3AF",
-                        is_default=False,
-                    )
-                    _ = await category.insert()
-
-                # Map payment channels to payment methods
-                channel_map = {
-                    "online": "Plaid - Online",
-                    "in store": "Plaid - Card",
-                    "other": "Plaid - Other",
-                }
-                payment_method = channel_map.get(
-                    cast("str", txn.payment_channel), "Plaid - Unknown"
-                )
+    # Verify user owns the job
+    if job.user_id != current_user.id:
+        raise_forbidden_error("Not authorized to access this sync job")
 
-                # Create new transaction record
-                transaction = BankTransaction(
-                    user_id=cast("PydanticObjectId", current_user.id),
-                    bank_account_id=cast("PydanticObjectId", account.id),
-                    transaction_id=cast("str", txn.transaction_id),
-                    name=cast("str", txn.name),
-                    amount=cast("float", txn.amount),
-                    date=cast("date", txn.date),
-                    category=[category.name],
-                    payment_channel=cast("str | None", txn.payment_channel),
-                    payment_method=payment_method,
-                    iso_currency_code=cast("str | None", txn.iso_currency_code),
-                    pending=cast("bool", txn.pending),
-                    source="plaid",
-                )
-                # Save transaction to database
-                _ = await transaction.insert()
-                # Add transaction to return list
-                transactions_to_return.append(transaction.model_dump())
+    return _to_public(job)
 
-        except ApiException as e:
-            # Log Plaid API errors
-            print(f"❌ Plaid API error: {e}")
-            continue
-        except ValueError as e:
-            # Log invalid data errors
-            print(f"❌ Invalid data from Plaid: {e}")
-            continue
 
-    # Recalculate user balance if user ID exists
-    if current_user.id:
-        await recalculate_user_balance(current_user.id)
+@router.post("/webhook")
+async def plaid_webhook(
+    # Raw request, the signature covers the exact body
+    request: Request,
+    # Signed JWT sent by Plaid with every webhook
+    plaid_verification: Annotated[str | None, Header()] = None,
+) -> dict[str, Any]:
+    """
+    Receive Plaid webhooks: transactions updates queue a debounced sync of the item
+    """
+    body = await request.body()
+    if config.PLAID_WEBHOOK_VERIFY:
+        try:
+            await verify_webhook(body, plaid_verification)
+        except WebhookVerificationError as e:
+            raise_unauthorized_error(str(e))
 
-    # Return sorted transactions
-    return sorted(transactions_to_return, key=lambda x: x["date"], reverse=True)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise_bad_request_error("Webhook body is not JSON")
+    if not isinstance(payload, dict):
+        raise_bad_request_error("Webhook body is not a JSON object")
+
+    # Events of the same item within the debounce window join one queued job
+    queued = await handle_webhook(cast("dict[str, Any]", payload))
+    return {"status": "queued" if queued else "ignored", "jobs": queued}
 
 
 @router.delete("/connection/{connection_id}")
@@ -372,19 +404,25 @@ async def delete_bank_connection(
     if connection.user_id != current_user.id:
         raise_forbidden_error("Not authorized to access this bank connection")
 
+    # Stop its syncs and delete the connection first, so no sync stores rows after the cleanup
+    await cancel_connection_jobs(PydanticObjectId(connection.id))
+    await delete_idle_connection(connection)
+
     # Get all associated bank accounts
     accounts = await BankAccount.find(BankAccount.bank_connection_id == connection.id).to_list()
+    # Balance change that takes out the transactions about to be deleted
+    removed_change = await bank_transactions_change(
+        {"bank_account_id": {"$in": [acc.id for acc in accounts]}}, sign=-1
+    )
     # Delete all transactions and accounts
     for acc in accounts:
+        await remove_bank_rollups({"bank_account_id": acc.id})
         _ = await BankTransaction.find(BankTransaction.bank_account_id == acc.id).delete()
         _ = await acc.delete()
 
-    # Delete the connection
-    _ = await connection.delete()
-
-    # Recalculate user balance
+    # Take the deleted transactions out of the balance
     if current_user.id:
-        await recalculate_user_balance(current_user.id)
+        await apply_balance_change(current_user.id, removed_change, rewritten=True)
 
     # Return success message
     return {"message": "Bank connection and related data deleted"}
@@ -396,80 +434,10 @@ async def sync_latest_transactions(
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> dict[str, Any]:
     """
-    Sync latest transactions from Plaid (without duplicates)
+    Queue a sync of the latest transactions from Plaid (same as POST /plaid/sync)
     """
-    # Get all user's bank accounts
-    accounts = await BankAccount.find(BankAccount.user_id == current_user.id).to_list()
-    if not accounts:
-        raise_not_found_error("No bank accounts found")
-
-    # Counter for imported transactions
-    imported = 0
-
-    # Process each account
-    for account in accounts:
-        # Get associated bank connection
-        connection = await BankConnection.get(account.bank_connection_id)
-        if not connection:
-            continue
-
-        try:
-            # Set date range for transaction sync (last 3 days)
-            start_date = (datetime.now(UTC) - timedelta(days=3)).date()
-            end_date = datetime.now(UTC).date()
-
-            # Create request to get transactions
-            request = TransactionsGetRequest(
-                access_token=connection.access_token,
-                start_date=start_date,
-                end_date=end_date,
-                options=TransactionsGetRequestOptions(account_ids=[account.account_id]),
-            )
-
-            # Make API call to Plaid
-            response = plaid_client.transactions_get(request)
-
-            # Process each transaction
-            for txn in response.transactions:
-                # Check if transaction already exists
-                exists = await BankTransaction.find_one(
-                    BankTransaction.transaction_id == cast("str", txn.transaction_id)
-                )
-                if exists:
-                    continue
-
-                # Verify required IDs exist
-                if not current_user.id:
-                    raise_missing_field_error("User ID")
-                if not account.id:
-                    raise_missing_field_error("Account ID")
-
-                # Create new transaction record
-                transaction = BankTransaction(
-                    user_id=current_user.id,
-                    bank_account_id=account.id,
-                    transaction_id=cast("str", txn.transaction_id),
-                    name=cast("str", txn.name),
-                    amount=cast("float", txn.amount),
-                    date=cast("date", txn.date),
-                    category=cast("list[str] | None", txn.category),
-                    payment_channel=cast("str | None", txn.payment_channel),
-                    iso_currency_code=cast("str | None", txn.iso_currency_code),
-                    pending=cast("bool", txn.pending),
-                )
-                # Save transaction to database
-                _ = await transaction.insert()
-                # Increment imported counter
-                imported += 1
-
-        except ApiException as e:
-            # Log Plaid API errors
-            print(f"❌ Plaid API error: {e}")
-            continue
-
-    # Recalculate user balance
-    if current_user.id:
-        await recalculate_user_balance(current_user.id)
+    # Queue the syncs; the sync worker transfers only changes since the previous sync
+    jobs = await _enqueue_user_syncs(current_user)
 
-    # Return success response with import count
-    return {"status": "success", "imported": imported}
+    # Return the queued jobs
+    return {"status": "queued", "jobs": jobs}
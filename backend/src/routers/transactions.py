@@ -1,12 +1,34 @@
+from datetime import datetime
 from typing import Annotated, Any, Literal
 
 from beanie import PydanticObjectId
+from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import ValidationError
 
 from src.auth.dependencies import get_current_user
 from src.models import Transaction, TransactionType, User
-from src.schemas.base import PaginatedTransactionsResponse, TransactionCreate, TransactionPublic
-from src.utils.analytics_helper import get_paginated_transactions_for_user
+from src.schemas.base import (
+    BulkItemResult,
+    BulkTransactionsResponse,
+    PaginatedTransactionsResponse,
+    TransactionBulkCreate,
+    TransactionBulkDelete,
+    TransactionBulkUpdate,
+    TransactionBulkUpdateItem,
+    TransactionCreate,
+    TransactionPublic,
+)
+from src.utils.analytics_helper import decode_cursor, get_paginated_transactions_for_user
+from src.utils.balance import BalanceChange, apply_balance_change
+from src.utils.rollups import apply_rollup_updates, manual_rollup_update
+from src.utils.transaction_writes import (
+    delete_owned_transaction,
+    delete_transactions,
+    insert_transactions,
+    update_owned_transaction,
+    update_transactions,
+)
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
@@ -28,18 +50,171 @@ async def create_transaction(
     )
 
     _ = await transaction.insert()  # Save to MongoDB
+    await apply_rollup_updates([manual_rollup_update(transaction)])
 
-    # Update user balance
-    if transaction.type == TransactionType.EXPENSE:
-        current_user.balance -= transaction.amount
-    else:  # income
-        current_user.balance += transaction.amount
-
-    _ = await current_user.save()
+    # Update user balance (atomic $inc, no read-modify-save of the user)
+    change = BalanceChange()
+    change.add_manual(transaction)
+    await apply_balance_change(transaction.user_id, change)
 
     return TransactionPublic(**transaction.model_dump())
 
 
+# ────────────── 📦 Bulk operations ──────────────
+
+
+def _validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+def _bulk_response(results: list[BulkItemResult]) -> BulkTransactionsResponse:
+    results.sort(key=lambda r: r.index)
+    failed = sum(1 for r in results if r.status == "error")
+    return BulkTransactionsResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+async def _find_owned(
+    user_id: PydanticObjectId,
+    requested: list[tuple[int, PydanticObjectId]],
+    results: list[BulkItemResult],
+) -> list[tuple[int, Transaction]]:
+    """
+    Loads the requested transactions with one query. Missing, foreign and repeated
+    IDs are reported as errors in `results`; the rest is returned with their index.
+    """
+    found = {
+        t.id: t
+        for t in await Transaction.find({"_id": {"$in": [oid for _, oid in requested]}}).to_list()
+    }
+    owned: list[tuple[int, Transaction]] = []
+    seen: set[PydanticObjectId] = set()
+    for index, oid in requested:
+        transaction = found.get(oid)
+        if oid in seen:
+            error = "Duplicate transaction ID in request"
+        elif not transaction:
+            error = "Transaction not found"
+        elif transaction.user_id != user_id:
+            error = "Not authorized to access this transaction"
+        else:
+            seen.add(oid)
+            owned.append((index, transaction))
+            continue
+        results.append(BulkItemResult(index=index, id=oid, status="error", error=error))
+    return owned
+
+
+def _written(
+    index: int,
+    transaction_id: PydanticObjectId | None,
+    status: Literal["updated", "deleted"],
+    written: set[PydanticObjectId | None],
+) -> BulkItemResult:
+    """Result of an item that passed the checks: written, or deleted by someone meanwhile"""
+    if transaction_id in written:
+        return BulkItemResult(index=index, id=transaction_id, status=status)
+    return BulkItemResult(
+        index=index, id=transaction_id, status="error", error="Transaction not found"
+    )
+
+
+@router.post("/bulk")
+async def create_transactions_bulk(
+    request: TransactionBulkCreate,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> BulkTransactionsResponse:
+    """
+    📦 Create many transactions at once:
+    - Every item is validated on its own, invalid items are reported and skipped
+    - Valid items are saved with one insert_many and one balance update
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is required")
+    user_id = PydanticObjectId(current_user.id)
+
+    results: list[BulkItemResult] = []
+    valid: list[tuple[int, Transaction]] = []
+    for index, item in enumerate(request.items):
+        try:
+            transaction_in = TransactionCreate.model_validate(item)
+            valid.append((index, Transaction(**transaction_in.model_dump(), user_id=user_id)))
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, status="error", error=_validation_error(e)))
+
+    _ = await insert_transactions(user_id, [transaction for _, transaction in valid])
+    results += [
+        BulkItemResult(index=index, id=transaction.id, status="created")
+        for index, transaction in valid
+    ]
+    return _bulk_response(results)
+
+
+@router.put("/bulk")
+async def update_transactions_bulk(
+    request: TransactionBulkUpdate,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> BulkTransactionsResponse:
+    """
+    📦 Update many transactions at once (each item: `id` plus the new values)
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
+    user_id = PydanticObjectId(current_user.id)
+
+    results: list[BulkItemResult] = []
+    items: dict[int, TransactionBulkUpdateItem] = {}
+    for index, item in enumerate(request.items):
+        try:
+            items[index] = TransactionBulkUpdateItem.model_validate(item)
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, status="error", error=_validation_error(e)))
+
+    owned = await _find_owned(user_id, [(index, item.id) for index, item in items.items()], results)
+    updated = {
+        transaction.id
+        for transaction in await update_transactions(
+            user_id, [(transaction.id, items[index]) for index, transaction in owned]
+        )
+    }
+    results += [_written(index, transaction.id, "updated", updated) for index, transaction in owned]
+    return _bulk_response(results)
+
+
+@router.post("/bulk/delete")
+async def delete_transactions_bulk(
+    request: TransactionBulkDelete,
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> BulkTransactionsResponse:
+    """
+    📦 Delete many transactions at once by ID
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
+    user_id = PydanticObjectId(current_user.id)
+
+    results: list[BulkItemResult] = []
+    requested: list[tuple[int, PydanticObjectId]] = []
+    for index, raw_id in enumerate(request.ids):
+        if ObjectId.is_valid(raw_id):
+            requested.append((index, PydanticObjectId(raw_id)))
+        else:
+            results.append(
+                BulkItemResult(index=index, status="error", error="Invalid transaction ID")
+            )
+
+    owned = await _find_owned(user_id, requested, results)
+    deleted = {
+        transaction.id
+        for transaction in await delete_transactions(
+            user_id, [transaction.id for _, transaction in owned]
+        )
+    }
+    results += [_written(index, transaction.id, "deleted", deleted) for index, transaction in owned]
+    return _bulk_response(results)
+
+
 @router.get(
     "/all",
 )
@@ -49,21 +224,39 @@ async def get_all_transactions(
     transaction_type: Annotated[TransactionType | None, Query] = None,
     limit: Annotated[int, Query] = 20,
     offset: Annotated[int, Query] = 0,
+    date_from: Annotated[datetime | None, Query] = None,
+    date_to: Annotated[datetime | None, Query] = None,
+    cursor: Annotated[str | None, Query] = None,
+    include_total: Annotated[bool | None, Query] = None,
 ) -> PaginatedTransactionsResponse:
     """
     🔄 Get all transactions (manual and bank) with pagination and filters:
     - by source (manual / plaid)
     - by transaction type (income / expense)
+    - by date range (inclusive)
+
+    Pass `next_cursor` from the previous page as `cursor` to page without offsets.
+    `total` is counted for the first page only, unless `include_total` is set.
     """
     if not current_user.id:
         raise HTTPException(status_code=400, detail="User ID is missing")
 
+    if cursor:
+        try:
+            _ = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
     result = await get_paginated_transactions_for_user(
         user_id=current_user.id,
         source_filter=source_filter,
         transaction_type=transaction_type,
         limit=limit,
         offset=offset,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        include_total=include_total,
     )
     return PaginatedTransactionsResponse(**result)
 
@@ -87,6 +280,13 @@ async def get_transaction_by_id(
     return TransactionPublic(**transaction.model_dump())
 
 
+async def _missing_transaction(transaction_id: PydanticObjectId, action: str) -> HTTPException:
+    """The error for a write that matched nothing: gone, or someone else's"""
+    if await Transaction.get(transaction_id) is None:
+        return HTTPException(status_code=404, detail="Transaction not found")
+    return HTTPException(status_code=403, detail=f"Not authorized to {action} this transaction")
+
+
 @router.put("/{transaction_id}")
 async def update_transaction(
     transaction_id: PydanticObjectId,
@@ -96,39 +296,16 @@ async def update_transaction(
     """
     Update transaction
     """
-    transaction = await Transaction.get(transaction_id)
-
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    if transaction.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this transaction")
-
-    # Update user balance
-    if transaction.type == TransactionType.EXPENSE:
-        current_user.balance += transaction.amount  # Return old amount
-    else:  # income
-        current_user.balance -= transaction.amount  # Return old amount
-
-    # Apply new amount
-    if transaction_in.type == TransactionType.EXPENSE:
-        current_user.balance -= transaction_in.amount
-    else:  # income
-        current_user.balance += transaction_in.amount
-
-    _ = await current_user.save()
-
-    # Update transaction fields
-    transaction.type = transaction_in.type
-    transaction.amount = transaction_in.amount
-    transaction.category = transaction_in.category
-    transaction.payment_method = transaction_in.payment_method
-    transaction.description = transaction_in.description
-
-    if transaction_in.date:
-        transaction.date = transaction_in.date
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
 
-    _ = await transaction.save()
+    # One find-and-modify on (id, user): the balance and rollups move from the exact
+    # document it replaced, so concurrent updates and deletes never count twice
+    updated = await update_owned_transaction(
+        PydanticObjectId(current_user.id), transaction_id, transaction_in
+    )
+    if updated is None:
+        raise await _missing_transaction(transaction_id, "update")
 
     return {"message": "Transaction updated successfully"}
 
@@ -141,23 +318,12 @@ async def delete_transaction(
     """
     Delete transaction
     """
-    transaction = await Transaction.get(transaction_id)
-
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    if transaction.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this transaction")
-
-    # Update user balance
-    if transaction.type == TransactionType.EXPENSE:
-        current_user.balance += transaction.amount  # Return expense amount
-    else:  # income
-        current_user.balance -= transaction.amount  # Return income amount
-
-    _ = await current_user.save()
+    if not current_user.id:
+        raise HTTPException(status_code=400, detail="User ID is missing")
 
-    # Delete transaction
-    _ = await transaction.delete()
+    # Only the request that actually deleted the document returns its amount
+    deleted = await delete_owned_transaction(PydanticObjectId(current_user.id), transaction_id)
+    if deleted is None:
+        raise await _missing_transaction(transaction_id, "delete")
 
     return {"message": "Transaction deleted successfully"}
@@ -1,11 +1,19 @@
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Literal
 
 from pydantic import BaseModel
 
+from src.models import TransactionType
+
 # ────────────── 📦 Types ──────────────
 
+type LineGranularity = Literal["hour", "day", "week", "month", "quarter"]
+
+type DashboardWidgetName = Literal[
+    "summary", "pie", "line", "compare", "compare-types", "budget-analysis"
+]
+
 # ────────────── 📦 Base summary ──────────────
 
 
@@ -66,9 +74,10 @@ class PieChartResponse(BaseModel):
 class LinePoint(BaseModel):
     """
     📈 Point on the chart (date → amount)
+    Start of the bucket: a datetime for hourly charts, a date otherwise.
     """
 
-    date: date
+    date: datetime | date
     amount: Decimal
 
 
@@ -77,7 +86,8 @@ class LineChartResponse(BaseModel):
     📈 Response for /analytics/line
     """
 
-    timeframe: Literal["day", "week", "month", "year"]
+    timeframe: Literal["day", "week", "month", "year"] | None  # None for a custom start/end
+    granularity: LineGranularity = "day"
     data: List[LinePoint]
 
 
@@ -129,3 +139,51 @@ class IncomeExpenseComparison(BaseModel):
     expense_percent: Decimal  # Percentage of expenses from total
     top_income_categories: List[CategoryStat]  # Top income categories
     top_expense_categories: List[CategoryStat]  # Top expense categories
+
+
+# ────────────── 🧩 Dashboard ──────────────
+
+
+class DashboardWidget(BaseModel):
+    """
+    🧩 One widget requested from /analytics/dashboard
+    """
+
+    name: DashboardWidgetName
+    transaction_type: TransactionType | None = None  # summary, pie, line, compare
+    timeframe: Literal["day", "week", "month", "year"] = "month"  # line, compare-types
+    granularity: LineGranularity = "day"  # line
+
+
+class DashboardRequest(BaseModel):
+    """
+    🧩 Widgets to compute in one request
+    """
+
+    widgets: List[DashboardWidget]
+
+
+class DashboardWidgetResult(BaseModel):
+    """
+    🧩 Result of one widget: either data or an error (e.g. no transactions)
+    """
+
+    widget: DashboardWidget
+    data: (
+        SummaryResponse
+        | PieChartResponse
+        | LineChartResponse
+        | MonthComparison
+        | IncomeExpenseComparison
+        | BudgetOverview
+        | None
+    ) = None
+    error: str | None = None
+
+
+class DashboardResponse(BaseModel):
+    """
+    🧩 Response for /analytics/dashboard, results follow the order of the request
+    """
+
+    widgets: List[DashboardWidgetResult]
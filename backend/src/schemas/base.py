@@ -1,12 +1,15 @@
 # Import base model from Pydantic - it's used for validation and serialization of data
 # Import ObjectId type which Beanie uses for MongoDB documents
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal  # Add Decimal import
+from typing import Any, Literal
 
 from beanie import PydanticObjectId
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
+from src.config import MAX_BULK_TRANSACTIONS
 from src.models import TransactionType
+from src.utils.money import quantize_cents
 
 
 class BaseModelWithConfig(BaseModel):
@@ -96,10 +99,15 @@ class TransactionCreate(BaseModelWithDecimalAsFloat):
     type: TransactionType  # Use enum instead of string
     category: str | None = None
     payment_method: str | None = None
-    source: str | None = None  # For income
+    source: Literal["manual", "plaid"] = "manual"
     date: datetime | None = None
     description: str | None = None
 
+    @field_validator("amount")
+    @classmethod
+    def validate_amount(cls, v: Decimal) -> Decimal:
+        return quantize_cents(v)  # Stored in whole cents
+
 
 # Model for returning transaction to client
 class TransactionPublic(BaseModelWithDecimalAsFloat):
@@ -115,12 +123,47 @@ class TransactionPublic(BaseModelWithDecimalAsFloat):
     model_config = ConfigDict(json_encoders={PydanticObjectId: str})
 
 
+# Update item of a bulk update: transaction ID plus the new values
+class TransactionBulkUpdateItem(TransactionCreate):
+    id: PydanticObjectId
+
+
+# Bulk requests: items are validated one by one, so one bad item does not fail the batch
+class TransactionBulkCreate(BaseModel):
+    items: list[dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BULK_TRANSACTIONS)
+
+
+class TransactionBulkUpdate(BaseModel):
+    items: list[dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BULK_TRANSACTIONS)
+
+
+class TransactionBulkDelete(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=MAX_BULK_TRANSACTIONS)
+
+
+# Result for one item of a bulk request (index = position in the request)
+class BulkItemResult(BaseModel):
+    index: int
+    id: PydanticObjectId | None = None
+    status: Literal["created", "updated", "deleted", "error"]
+    error: str | None = None
+
+    model_config = ConfigDict(json_encoders={PydanticObjectId: str})
+
+
+class BulkTransactionsResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[BulkItemResult]
+
+
 class PaginatedTransactionsResponse(BaseModel):
     items: list[TransactionPublic]
-    total: int
+    total: int | None = None  # Counted on the first page, or when include_total is set
     limit: int
     offset: int
     has_next: bool
+    next_cursor: str | None = None  # Pass as `cursor` to get the next page
 
     model_config = ConfigDict(json_encoders={PydanticObjectId: str})
 
@@ -147,3 +190,19 @@ class PasswordUpdateRequest(BaseModel):
 # Model for password update response
 class PasswordUpdateResponse(BaseModel):
     detail: str = "Password updated successfully."
+
+
+# Spacing of the points of a balance history
+type BalanceHistoryStep = Literal["day", "week", "month"]
+
+
+# Balance at the end of a day
+class BalanceHistoryPoint(BaseModelWithDecimalAsFloat):
+    date: date
+    balance: Decimal
+
+
+# Model for balance history response
+class BalanceHistoryResponse(BaseModel):
+    step: BalanceHistoryStep
+    points: list[BalanceHistoryPoint]
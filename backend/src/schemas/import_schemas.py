@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel
+
+
+class ImportJobPublic(BaseModel):
+    id: PydanticObjectId
+    file_format: str
+    status: str
+    progress: float  # Share of the file processed, 0..1
+    rows_parsed: int
+    rows_imported: int
+    rows_duplicate: int
+    rows_invalid: int
+    errors: list[str]
+    created_at: datetime
+    finished_at: datetime | None = None
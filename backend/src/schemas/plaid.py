@@ -1,5 +1,26 @@
+from datetime import datetime
+
+from beanie import PydanticObjectId
 from pydantic import BaseModel
 
 
 class ExchangeTokenRequest(BaseModel):
     public_token: str
+
+
+class SyncJobPublic(BaseModel):
+    id: PydanticObjectId
+    connection_id: PydanticObjectId
+    trigger: str
+    status: str  # queued, running, completed, failed, superseded or cancelled
+    attempts: int
+    run_at: datetime  # Not before this time (retry backoff)
+    pages: int  # Progress: pages synced so far
+    added: int
+    modified: int
+    removed: int
+    history_status: str | None = None  # HISTORICAL_UPDATE_COMPLETE once all history is in
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
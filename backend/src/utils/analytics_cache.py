@@ -0,0 +1,85 @@
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from beanie import PydanticObjectId
+from cachetools import TTLCache
+
+from src.config import config
+from src.models import User
+
+
+class AnalyticsCache:
+    """
+    In-process cache of analytics responses with TTL and LRU eviction.
+
+    Entries are keyed by user, the user's `data_version`, endpoint and parameters.
+    Every write that changes a user's data bumps `data_version`, so stale entries are
+    never hit again and simply age out.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._entries: TTLCache[tuple[Any, ...], Any] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_compute[T](
+        self,
+        user: User,
+        endpoint: str,
+        params: dict[str, Any],
+        compute: Callable[[], Awaitable[T]],
+    ) -> T:
+        # The date is part of the key: "current month" answers change at midnight
+        key = (
+            user.id,
+            user.data_version,
+            endpoint,
+            datetime.now(UTC).date(),
+            tuple(sorted(params.items())),
+        )
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        result = await compute()
+        self._entries[key] = result
+        return result
+
+    def stats(self) -> dict[str, int | float]:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "size": len(self._entries),
+        }
+
+
+analytics_cache = AnalyticsCache(
+    maxsize=config.ANALYTICS_CACHE_MAX_SIZE,
+    ttl=config.ANALYTICS_CACHE_TTL_SECONDS,
+)
+
+
+def data_version_inc(rewritten: bool = False) -> dict[str, int]:
+    """
+    `$inc` fields that invalidate cached analytics of a user. With `rewritten=True`
+    (existing transactions were changed or deleted rather than only added) analytics
+    snapshots are reloaded instead of appended to.
+    """
+    return {"data_version": 1, "ledger_epoch": 1} if rewritten else {"data_version": 1}
+
+
+async def read_data_version(user_id: PydanticObjectId) -> int | None:
+    """The user's current `data_version` (None if the user does not exist)"""
+    doc = await User.get_motor_collection().find_one({"_id": user_id}, {"data_version": 1})
+    return None if doc is None else doc.get("data_version", 0)
+
+
+async def bump_data_version(user_id: PydanticObjectId, rewritten: bool = False) -> None:
+    """Invalidates cached analytics of a user (call after every write to their data)"""
+    _ = await User.get_motor_collection().update_one(
+        {"_id": user_id}, {"$inc": data_version_inc(rewritten)}
+    )
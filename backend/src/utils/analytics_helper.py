@@ -1,8 +1,15 @@
-from datetime import UTC, date, datetime
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+from datetime import UTC, date, datetime, timedelta
 from decimal import ROUND_HALF_UP, Decimal
 from typing import Any, Literal
 
-from beanie import PydanticObjectId
+from beanie import Document, PydanticObjectId
+from beanie.odm.queries.find import FindMany
+from bson.errors import InvalidId
 
 from src.models import BankTransaction, Transaction, TransactionType
 from src.schemas.base import TransactionPublic
@@ -20,14 +27,6 @@ def calculate_percent(amount: Decimal, total: Decimal) -> Decimal:
     return round_decimal((amount / total) * Decimal("100"))
 
 
-def to_decimal(value: Any) -> Decimal:
-    return Decimal(str(value))
-
-
-def sum_amounts(transactions: list[dict[str, Any]]) -> Decimal:
-    return sum((to_decimal(t["amount"]) for t in transactions), start=Decimal("0"))
-
-
 def to_datetime(d: date | datetime) -> datetime:
     """Converts date to datetime if needed"""
     if isinstance(d, date) and not isinstance(d, datetime):
@@ -35,114 +34,209 @@ def to_datetime(d: date | datetime) -> datetime:
     return d
 
 
+def start_of_day(d: date | datetime) -> datetime:
+    """Truncates a date or datetime to UTC midnight"""
+    dt = to_datetime(d)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(UTC)
+    return datetime(dt.year, dt.month, dt.day, tzinfo=UTC)
+
+
+def _manual_query(
+    user_id: PydanticObjectId,
+    transaction_type: TransactionType | None,
+    date_from: datetime | None,
+    date_to: datetime | None,
+) -> FindMany[Transaction]:
+    """Builds the manual transactions query; type and dates hit the (user_id, type, date) index"""
+    query = Transaction.find(Transaction.user_id == user_id)
+    if transaction_type:
+        query = query.find(Transaction.type == transaction_type)
+    if date_from:
+        query = query.find(Transaction.date >= date_from)
+    if date_to:
+        query = query.find(Transaction.date <= date_to)
+    return query
+
+
+def _plaid_query(
+    user_id: PydanticObjectId,
+    transaction_type: TransactionType | None,
+    date_from: datetime | None,
+    date_to: datetime | None,
+) -> FindMany[BankTransaction]:
+    """Builds the bank transactions query; Plaid income is stored with a negative amount"""
+    query = BankTransaction.find(BankTransaction.user_id == user_id)
+    if transaction_type == TransactionType.INCOME:
+        query = query.find(BankTransaction.amount < 0)
+    elif transaction_type == TransactionType.EXPENSE:
+        query = query.find(BankTransaction.amount >= 0)
+    if date_from:
+        query = query.find(BankTransaction.date >= date_from)
+    if date_to:
+        query = query.find(BankTransaction.date <= date_to)
+    return query
+
+
+def _manual_to_public(txn: Transaction) -> dict[str, Any]:
+    return TransactionPublic(**txn.model_dump(exclude_none=True)).model_dump() | {
+        "source": "manual"
+    }
+
+
+def _plaid_to_public(txn: BankTransaction) -> dict[str, Any]:
+    return TransactionPublic(
+        id=txn.id if txn.id else PydanticObjectId(),
+        user_id=txn.user_id,
+        amount=Decimal(str(txn.amount)),
+        type=TransactionType.INCOME if txn.amount < 0 else TransactionType.EXPENSE,
+        category=", ".join(txn.category) if txn.category else None,
+        payment_method=txn.payment_method,
+        date=datetime.combine(txn.date, datetime.min.time(), tzinfo=UTC),
+        description=txn.name,
+        source="plaid",
+    ).model_dump()
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# Merge key: newest date first, then the highest ObjectId first
+_SortKey = tuple[int, int]
+
+
+def _as_utc(d: date | datetime) -> datetime:
+    dt = to_datetime(d)
+    return dt if dt.tzinfo else dt.replace(tzinfo=UTC)
+
+
+def _sort_key(d: date | datetime, object_id: PydanticObjectId | None) -> _SortKey:
+    micros = (_as_utc(d) - _EPOCH) // timedelta(microseconds=1)
+    return -micros, -int.from_bytes(object_id.binary) if object_id else 0
+
+
+def encode_cursor(d: date | datetime, object_id: PydanticObjectId) -> str:
+    """Packs the (date, _id) position of the last returned item into an opaque string"""
+    millis = (_as_utc(d) - _EPOCH) // timedelta(milliseconds=1)
+    return urlsafe_b64encode(f"{millis}:{object_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, PydanticObjectId]:
+    """Unpacks a cursor created by `encode_cursor`, raises ValueError if it is malformed"""
+    try:
+        millis, object_id = urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return _EPOCH + timedelta(milliseconds=int(millis)), PydanticObjectId(object_id)
+    except (BinasciiError, UnicodeDecodeError, InvalidId, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _after_cursor[T: Document](
+    query: FindMany[T], after: tuple[datetime, PydanticObjectId] | None
+) -> FindMany[T]:
+    """Keyset condition: strictly older than the cursor position in (date, _id) order"""
+    if after is None:
+        return query
+    after_date, after_id = after
+    return query.find(
+        {"$or": [{"date": {"$lt": after_date}}, {"date": after_date, "_id": {"$lt": after_id}}]}
+    )
+
+
+async def _stream[T: Transaction | BankTransaction](
+    query: FindMany[T], to_public: Callable[[T], dict[str, Any]]
+) -> AsyncIterator[tuple[_SortKey, dict[str, Any]]]:
+    async for txn in query:
+        yield _sort_key(txn.date, txn.id), to_public(txn)
+
+
+async def merge_newest_first(
+    *streams: AsyncIterator[tuple[_SortKey, dict[str, Any]]],
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    k-way merge of already sorted streams using a heap.
+    Only one pending item per stream is kept in memory.
+    """
+    heap: list[tuple[_SortKey, int, dict[str, Any]]] = []
+    for index, stream in enumerate(streams):
+        first = await anext(stream, None)
+        if first is not None:
+            heapq.heappush(heap, (first[0], index, first[1]))
+
+    while heap:
+        _, index, item = heapq.heappop(heap)
+        yield item
+        following = await anext(streams[index], None)
+        if following is not None:
+            heapq.heappush(heap, (following[0], index, following[1]))
+
+
 async def get_paginated_transactions_for_user(
     user_id: PydanticObjectId,
     source_filter: Literal["manual", "plaid"] | None = None,
     transaction_type: TransactionType | None = None,
     limit: int = 20,
     offset: int = 0,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    cursor: str | None = None,
+    include_total: bool | None = None,
 ) -> dict[str, Any]:
-    manual_data: list[dict[str, Any]] = []
-    plaid_data: list[dict[str, Any]] = []
-
-    if source_filter == "manual":
-        base_query = Transaction.find(Transaction.user_id == user_id)
-        if transaction_type:
-            base_query = base_query.find(Transaction.type == transaction_type)
-
-        total = await base_query.count()
-        manual = await base_query.sort("-date").skip(offset).limit(limit).to_list()
-        manual_data = [
-            TransactionPublic(**txn.model_dump(exclude_none=True)).model_dump()
-            | {"source": "manual"}
-            for txn in manual
-        ]
-
-        return {
-            "items": manual_data,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-            "has_next": offset + len(manual_data) < total,
-        }
-
-    if source_filter == "plaid":
-        base_query = BankTransaction.find(BankTransaction.user_id == user_id)
-        plaid_all = await base_query.sort("-date").to_list()
-
-        plaid_data_filtered = [
-            TransactionPublic(
-                id=txn.id if txn.id else PydanticObjectId(),
-                user_id=txn.user_id,
-                amount=Decimal(str(txn.amount)),
-                type=TransactionType.INCOME if txn.amount < 0 else TransactionType.EXPENSE,
-                category=", ".join(txn.category) if txn.category else None,
-                payment_method=txn.payment_method,
-                date=datetime.combine(txn.date, datetime.min.time(), tzinfo=UTC),
-                description=txn.name,
-                source="plaid",
-            ).model_dump()
-            for txn in plaid_all
-            if transaction_type is None
-            or ("income" if txn.amount < 0 else "expense") == transaction_type
-        ]
-
-        total = len(plaid_data_filtered)
-        paginated = plaid_data_filtered[offset : offset + limit]
-
-        return {
-            "items": paginated,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-            "has_next": offset + len(paginated) < total,
-        }
-
-    # If no source filter or both sources
-    manual = await Transaction.find(Transaction.user_id == user_id).to_list()
-    plaid = await BankTransaction.find(BankTransaction.user_id == user_id).to_list()
-
-    manual_data = [
-        TransactionPublic(**txn.model_dump(exclude_none=True)).model_dump() | {"source": "manual"}
-        for txn in manual
-        if transaction_type is None or txn.type == transaction_type
-    ]
-
-    plaid_data = [
-        TransactionPublic(
-            id=txn.id if txn.id else PydanticObjectId(),
-            user_id=txn.user_id,
-            amount=Decimal(str(txn.amount)),
-            type=TransactionType.INCOME if txn.amount < 0 else TransactionType.EXPENSE,
-            category=", ".join(txn.category) if txn.category else None,
-            payment_method=txn.payment_method,
-            date=datetime.combine(txn.date, datetime.min.time(), tzinfo=UTC),
-            description=txn.name,
-            source="plaid",
-        ).model_dump()
-        for txn in plaid
-        if transaction_type is None
-        or ("income" if txn.amount < 0 else "expense") == transaction_type
-    ]
-
-    all_txns = manual_data + plaid_data
-    # Convert all dates to datetime before sorting
-    all_txns.sort(key=lambda x: to_datetime(x["date"]), reverse=True)
-    total = len(all_txns)
-    paginated = all_txns[offset : offset + limit]
+    """
+    Returns user transactions (manual and bank) sorted by date, newest first.
+    Type and date range (both bounds inclusive) are pushed down into MongoDB.
+
+    Pagination is keyset-based when `cursor` (the `next_cursor` of the previous
+    page) is given, otherwise `offset` is used. Both sources are streamed in
+    (date, _id) order and merged, so at most `limit + 1` items are built per page.
+    `has_next` comes from that extra item. `total` needs a count over the whole
+    filtered history, so by default it is only computed for the first page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    manual_query = _manual_query(user_id, transaction_type, date_from, date_to)
+    plaid_query = _plaid_query(user_id, transaction_type, date_from, date_to)
+    if include_total is None:
+        include_total = after is None
+    total: int | None = None
+    if include_total:
+        total = 0
+        if source_filter != "plaid":
+            total += await manual_query.count()
+        if source_filter != "manual":
+            total += await plaid_query.count()
+
+    # With a single source the offset is skipped by MongoDB, otherwise in the merge
+    skip = 0 if after else offset
+    server_skip = skip if source_filter else 0
+    merge_skip = skip - server_skip
+    window = merge_skip + limit + 1
+
+    streams: list[AsyncIterator[tuple[_SortKey, dict[str, Any]]]] = []
+    if source_filter != "plaid":
+        query = _after_cursor(manual_query, after).sort("-date", "-_id")
+        streams.append(_stream(query.skip(server_skip).limit(window), _manual_to_public))
+    if source_filter != "manual":
+        query = _after_cursor(plaid_query, after).sort("-date", "-_id")
+        streams.append(_stream(query.skip(server_skip).limit(window), _plaid_to_public))
+
+    items: list[dict[str, Any]] = []
+    async with aclosing(merge_newest_first(*streams)) as merged:
+        async for item in merged:
+            if merge_skip:
+                merge_skip -= 1
+                continue
+            items.append(item)
+            if len(items) > limit:
+                break
+
+    has_next = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]["date"], items[-1]["id"]) if has_next else None
 
     return {
-        "items": paginated,
+        "items": items,
         "total": total,
         "limit": limit,
         "offset": offset,
-        "has_next": offset + len(paginated) < total,
+        "has_next": has_next,
+        "next_cursor": next_cursor,
     }
-
-
-async def get_all_transactions_for_user(user_id: PydanticObjectId) -> list[dict[str, Any]]:
-    """
-    Returns all user transactions without pagination (needed for analytics).
-    """
-    result = await get_paginated_transactions_for_user(user_id=user_id, limit=10_000_000)
-    return result["items"]
@@ -0,0 +1,341 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any, Literal
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+
+from src.models import BankTransaction, DailyRollup, Transaction, TransactionType
+from src.schemas.analytics_schemas import LineGranularity
+from src.utils.analytics_helper import start_of_day
+from src.utils.money import Cents
+
+TOP_CATEGORIES_LIMIT = 5
+
+type RollupField = Literal["day", "category", "type", "source", "payment_method"]
+
+
+def period_starts(now: datetime) -> dict[str, datetime]:
+    """Returns the start of the current week, month and year (UTC midnight)"""
+    today = start_of_day(now)
+    return {
+        "week": today - timedelta(days=now.weekday()),
+        "month": datetime(now.year, now.month, 1, tzinfo=UTC),
+        "year": datetime(now.year, 1, 1, tzinfo=UTC),
+    }
+
+
+# ────────────── 🧾 Raw transactions ──────────────
+
+
+def manual_projection() -> dict[str, Any]:
+    """`$project` stage that brings a `transactions` document to the normalized shape"""
+    return {
+        "$project": {
+            "user_id": 1,
+            "date": 1,
+            "amount": 1,
+            "type": 1,
+            "category": 1,
+            "payment_method": 1,
+            "source": {"$literal": "manual"},
+        }
+    }
+
+
+def plaid_projection() -> dict[str, Any]:
+    """
+    `$project` stage that brings a `bank_transactions` document to the normalized shape.
+    Plaid rows keep the signed amount and the joined category list, exactly like
+    `get_paginated_transactions_for_user` presents them.
+    """
+    return {
+        "$project": {
+            "user_id": 1,
+            "date": 1,
+            "amount": {"$toDecimal": "$amount"},
+            "type": {
+                "$cond": [
+                    {"$lt": ["$amount", 0]},
+                    TransactionType.INCOME.value,
+                    TransactionType.EXPENSE.value,
+                ]
+            },
+            "category": {
+                "$cond": [
+                    {"$gt": [{"$size": {"$ifNull": ["$category", []]}}, 0]},
+                    {
+                        "$reduce": {
+                            "input": "$category",
+                            "initialValue": "",
+                            "in": {
+                                "$cond": [
+                                    {"$eq": ["$$value", ""]},
+                                    "$$this",
+                                    {"$concat": ["$$value", ", ", "$$this"]},
+                                ]
+                            },
+                        }
+                    },
+                    None,
+                ]
+            },
+            "payment_method": 1,
+            "source": {"$literal": "plaid"},
+        }
+    }
+
+
+def unified_transactions_stages(
+    user_id: PydanticObjectId,
+    transaction_type: TransactionType | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Pipeline stages (run on the `transactions` collection) that emit manual and
+    Plaid transactions of a user in one normalized shape:
+    `{user_id, date, amount, type, category, payment_method, source}`.
+    The date range (both bounds inclusive) is applied to each collection before the union.
+    """
+    match: dict[str, Any] = {"user_id": user_id}
+    date_range: dict[str, datetime] = {}
+    if date_from:
+        date_range["$gte"] = date_from
+    if date_to:
+        date_range["$lte"] = date_to
+    if date_range:
+        match["date"] = date_range
+
+    stages: list[dict[str, Any]] = [
+        {"$match": match},
+        manual_projection(),
+        {
+            "$unionWith": {
+                "coll": BankTransaction.Settings.name,
+                "pipeline": [{"$match": match}, plaid_projection()],
+            }
+        },
+    ]
+    if transaction_type:
+        stages.append({"$match": {"type": transaction_type.value}})
+    return stages
+
+
+def cents_expr(amount: str) -> dict[str, Any]:
+    """Aggregation expression converting a decimal amount to int64 cents, rounding half up"""
+    half = {"$cond": [{"$gte": [amount, 0]}, Decimal128("0.5"), Decimal128("-0.5")]}
+    return {"$toLong": {"$trunc": {"$add": [{"$multiply": [amount, 100]}, half]}}}
+
+
+def rollup_group_stage() -> dict[str, Any]:
+    """`$group` stage that folds normalized transactions into `DailyRollup` buckets"""
+    return {
+        "$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                "category": "$category",
+                "type": "$type",
+                "source": "$source",
+                "payment_method": "$payment_method",
+            },
+            "total_cents": {"$sum": cents_expr("$amount")},
+            "count": {"$sum": 1},
+        }
+    }
+
+
+# ────────────── 📅 Daily rollups ──────────────
+
+
+def _rollup_match(
+    user_id: PydanticObjectId,
+    transaction_type: TransactionType | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> dict[str, Any]:
+    match: dict[str, Any] = {"user_id": user_id, "transactions_count": {"$gt": 0}}
+    if transaction_type:
+        match["type"] = transaction_type.value
+    day_range: dict[str, datetime] = {}
+    if date_from:
+        day_range["$gte"] = start_of_day(date_from)
+    if date_to:
+        day_range["$lte"] = date_to
+    if day_range:
+        match["day"] = day_range
+    return match
+
+
+async def aggregate_rollups(
+    user_id: PydanticObjectId,
+    group_by: list[RollupField],
+    transaction_type: TransactionType | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Sums the user's daily rollups grouped by the given fields.
+    Dates are matched by whole days, both bounds inclusive.
+
+    Returns one row per group: the group fields plus `total_cents` and `count`.
+    """
+    pipeline: list[dict[str, Any]] = [
+        {"$match": _rollup_match(user_id, transaction_type, date_from, date_to)},
+        {
+            "$group": {
+                "_id": {field: f"${field}" for field in group_by},
+                "total_cents": {"$sum": "$total_cents"},
+                "count": {"$sum": "$transactions_count"},
+            }
+        },
+    ]
+    rows = await DailyRollup.aggregate(pipeline).to_list()
+    result: list[dict[str, Any]] = []
+    for row in rows:
+        group = row["_id"]
+        if "day" in group:
+            group["day"] = start_of_day(group["day"])  # MongoDB returns naive UTC datetimes
+        result.append(group | {"total_cents": row["total_cents"], "count": row["count"]})
+    return result
+
+
+def _bucket_expr(date_field: str, granularity: LineGranularity) -> dict[str, Any]:
+    trunc: dict[str, Any] = {"date": date_field, "unit": granularity}
+    if granularity == "week":
+        trunc["startOfWeek"] = "monday"  # Same weeks as `period_starts`
+    return {"$dateTrunc": trunc}
+
+
+async def aggregate_line(
+    user_id: PydanticObjectId,
+    granularity: LineGranularity,
+    bucket_from: datetime,
+    bucket_to: datetime,
+    transaction_type: TransactionType | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Line chart points bucketed by `granularity` and gap-filled with `$densify`.
+    `bucket_from` is the first bucket start, `bucket_to` the start of the bucket
+    right after the last one (exclusive).
+
+    Daily and coarser charts are summed from the daily rollups; hourly charts come
+    from the raw manual and Plaid transactions.
+
+    Returns `{"bucket", "total_cents", "count"}` rows sorted by bucket.
+    """
+    densify: list[dict[str, Any]] = [
+        {"$project": {"_id": 0, "bucket": "$_id", "total_cents": 1, "count": 1}},
+        {
+            "$densify": {
+                "field": "bucket",
+                "range": {"step": 1, "unit": granularity, "bounds": [bucket_from, bucket_to]},
+            }
+        },
+        {"$fill": {"output": {"total_cents": {"value": 0}, "count": {"value": 0}}}},
+        {"$sort": {"bucket": 1}},
+    ]
+
+    if granularity == "hour":
+        pipeline = [
+            *unified_transactions_stages(
+                user_id, transaction_type, bucket_from, bucket_to - timedelta(microseconds=1)
+            ),
+            {
+                "$group": {
+                    "_id": _bucket_expr("$date", granularity),
+                    "total_cents": {"$sum": cents_expr("$amount")},
+                    "count": {"$sum": 1},
+                }
+            },
+            *densify,
+        ]
+        rows = await Transaction.aggregate(pipeline).to_list()
+    else:
+        pipeline = [
+            {
+                "$match": _rollup_match(
+                    user_id, transaction_type, bucket_from, bucket_to - timedelta(days=1)
+                )
+            },
+            {
+                "$group": {
+                    "_id": _bucket_expr("$day", granularity),
+                    "total_cents": {"$sum": "$total_cents"},
+                    "count": {"$sum": "$transactions_count"},
+                }
+            },
+            *densify,
+        ]
+        rows = await DailyRollup.aggregate(pipeline).to_list()
+
+    for row in rows:
+        row["bucket"] = row["bucket"].replace(tzinfo=UTC)  # MongoDB returns naive UTC datetimes
+    return rows
+
+
+def _total_facet(start: datetime) -> list[dict[str, Any]]:
+    return [
+        {"$match": {"day": {"$gte": start}}},
+        {"$group": {"_id": None, "total_cents": {"$sum": "$total_cents"}}},
+    ]
+
+
+def _first_total(rows: list[dict[str, Any]]) -> Cents:
+    if not rows:
+        return 0
+    return rows[0]["total_cents"]
+
+
+async def aggregate_summary(
+    user_id: PydanticObjectId,
+    transaction_type: TransactionType | None = None,
+    now: datetime | None = None,
+) -> dict[str, Any]:
+    """
+    Computes the `/analytics/transactions/summary` numbers in a single server-side
+    `$facet` pipeline over the user's daily rollups.
+
+    Returns week/month/year totals, the top categories with the overall category
+    total and the manual payment-method breakdown, all in cents.
+    """
+    starts = period_starts(now or datetime.now(UTC))
+    pipeline = [
+        {"$match": _rollup_match(user_id, transaction_type)},
+        {
+            "$facet": {
+                "week": _total_facet(starts["week"]),
+                "month": _total_facet(starts["month"]),
+                "year": _total_facet(starts["year"]),
+                "top_categories": [
+                    {"$match": {"category": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$category", "amount": {"$sum": "$total_cents"}}},
+                    {"$sort": {"amount": -1}},
+                    {"$limit": TOP_CATEGORIES_LIMIT},
+                ],
+                "category_total": [
+                    {"$match": {"category": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": None, "total_cents": {"$sum": "$total_cents"}}},
+                ],
+                "payment_methods": [
+                    {"$match": {"source": "manual", "payment_method": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$payment_method", "amount": {"$sum": "$total_cents"}}},
+                    {"$sort": {"amount": -1}},
+                ],
+            }
+        },
+    ]
+
+    result = await DailyRollup.aggregate(pipeline).to_list()
+    facets: dict[str, list[dict[str, Any]]] = result[0] if result else {}
+
+    payment_methods = [(row["_id"], row["amount"]) for row in facets.get("payment_methods", [])]
+    return {
+        "week": _first_total(facets.get("week", [])),
+        "month": _first_total(facets.get("month", [])),
+        "year": _first_total(facets.get("year", [])),
+        "top_categories": [(row["_id"], row["amount"]) for row in facets.get("top_categories", [])],
+        "category_total": _first_total(facets.get("category_total", [])),
+        "payment_methods": payment_methods,
+        "payment_total": sum(amount for _, amount in payment_methods),
+    }
@@ -0,0 +1,300 @@
+import asyncio
+from datetime import UTC, date, datetime, timedelta
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+from cachetools import LRUCache
+
+from src.config import config
+from src.models import BankTransaction, Transaction, TransactionType, User
+from src.utils.analytics_pipeline import (
+    RollupField,
+    aggregate_rollups,
+    aggregate_summary,
+    cents_expr,
+    manual_projection,
+    plaid_projection,
+)
+from src.utils.analytics_widgets import summarize_rows
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency: pip install ".[analytics]"
+    np = None
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+# Per-user columnar snapshots of transactions for the "numpy" analytics backend.
+# A snapshot is loaded once and then only extended with rows inserted since the
+# last refresh; it is reloaded when the user's `ledger_epoch` says existing rows
+# were changed or deleted.
+
+EPOCH = datetime(1970, 1, 1)  # MongoDB returns naive UTC datetimes
+SOURCES = ("manual", "plaid")
+TYPES = (TransactionType.EXPENSE, TransactionType.INCOME)
+
+
+@cache
+def snapshots_enabled() -> bool:
+    """Whether the numpy backend is selected and usable; the first call reports a missing NumPy"""
+    if config.ANALYTICS_BACKEND != "numpy":
+        return False
+    if np is None:
+        print("⚠️ ANALYTICS_BACKEND=numpy but NumPy is not installed, using rollups")
+        return False
+    return True
+
+
+def _epoch_day(d: date | datetime) -> int:
+    if isinstance(d, datetime):
+        d = d.astimezone(UTC).date() if d.tzinfo else d.date()
+    return (d - EPOCH.date()).days
+
+
+class _Codes:
+    """Dictionary encoding of a string column (None is a value too)"""
+
+    def __init__(self) -> None:
+        self.values: list[str | None] = []
+        self._index: dict[str | None, int] = {}
+
+    def encode(self, value: str | None) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        return code
+
+
+class TransactionSnapshot:
+    """
+    All transactions (manual and bank) of one user as NumPy columns sorted by day:
+    epoch day (int32), amount in cents (int64), category and payment method codes
+    (int32), type and source flags (int8, indexes into `TYPES` / `SOURCES`).
+    """
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        assert np is not None
+        self.data_version = -1
+        self.ledger_epoch = -1
+        self.last_ids: dict[str, ObjectId | None] = dict.fromkeys(SOURCES)
+        self.categories = _Codes()
+        self.payment_methods = _Codes()
+        self.day: NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        self.cents: NDArray[np.int64] = np.empty(0, dtype=np.int64)
+        self.category: NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        self.payment_method: NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        self.type: NDArray[np.int8] = np.empty(0, dtype=np.int8)
+        self.source: NDArray[np.int8] = np.empty(0, dtype=np.int8)
+
+    async def refresh(self, user: User) -> None:
+        """Brings the snapshot up to the user's current `data_version`"""
+        user_id = PydanticObjectId(user.id)
+        if user.ledger_epoch > self.ledger_epoch:
+            self._reset()
+        elif user.data_version <= self.data_version:
+            return
+
+        await self._load_new_rows(user_id)
+        if len(self.day) != await _count_transactions(user_id):
+            # A concurrent insert landed below the ObjectId watermark: start over
+            self._reset()
+            await self._load_new_rows(user_id)
+
+        self.data_version = user.data_version
+        self.ledger_epoch = user.ledger_epoch
+
+    async def _load_new_rows(self, user_id: PydanticObjectId) -> None:
+        assert np is not None
+        columns: dict[str, list[int]] = {
+            "day": [],
+            "cents": [],
+            "category": [],
+            "payment_method": [],
+            "type": [],
+            "source": [],
+        }
+        for source_flag, source in enumerate(SOURCES):
+            match: dict[str, Any] = {"user_id": user_id}
+            if self.last_ids[source] is not None:
+                match["_id"] = {"$gt": self.last_ids[source]}
+            pipeline: list[dict[str, Any]] = [
+                {"$match": match},
+                manual_projection() if source == "manual" else plaid_projection(),
+                {
+                    "$project": {
+                        "date": 1,
+                        "cents": cents_expr("$amount"),
+                        "category": 1,
+                        "payment_method": 1,
+                        "type": 1,
+                    }
+                },
+            ]
+            model = Transaction if source == "manual" else BankTransaction
+            async for row in model.aggregate(pipeline):
+                columns["day"].append((row["date"] - EPOCH).days)
+                columns["cents"].append(row["cents"])
+                columns["category"].append(self.categories.encode(row["category"]))
+                columns["payment_method"].append(self.payment_methods.encode(row["payment_method"]))
+                columns["type"].append(TYPES.index(TransactionType(row["type"])))
+                columns["source"].append(source_flag)
+                last_id = self.last_ids[source]
+                if last_id is None or row["_id"] > last_id:
+                    self.last_ids[source] = row["_id"]
+
+        if not columns["day"]:
+            return
+
+        self.day = np.concatenate([self.day, np.array(columns["day"], dtype=np.int32)])
+        self.cents = np.concatenate([self.cents, np.array(columns["cents"], dtype=np.int64)])
+        self.category = np.concatenate(
+            [self.category, np.array(columns["category"], dtype=np.int32)]
+        )
+        self.payment_method = np.concatenate(
+            [self.payment_method, np.array(columns["payment_method"], dtype=np.int32)]
+        )
+        self.type = np.concatenate([self.type, np.array(columns["type"], dtype=np.int8)])
+        self.source = np.concatenate([self.source, np.array(columns["source"], dtype=np.int8)])
+
+        # Keep rows sorted by day so date windows are `searchsorted` slices
+        if not bool(np.all(self.day[:-1] <= self.day[1:])):
+            order = np.argsort(self.day, kind="stable")
+            self.day = self.day[order]
+            self.cents = self.cents[order]
+            self.category = self.category[order]
+            self.payment_method = self.payment_method[order]
+            self.type = self.type[order]
+            self.source = self.source[order]
+
+    def rows(
+        self,
+        group_by: list[RollupField],
+        transaction_type: TransactionType | None = None,
+        date_from: datetime | None = None,
+        date_to: datetime | None = None,
+    ) -> list[dict[str, Any]]:
+        """Same rows as `aggregate_rollups`, computed with vectorized group-bys"""
+        assert np is not None
+        lo = 0 if date_from is None else int(np.searchsorted(self.day, _epoch_day(date_from)))
+        hi = (
+            len(self.day)
+            if date_to is None
+            else int(np.searchsorted(self.day, _epoch_day(date_to), side="right"))
+        )
+        columns: dict[str, NDArray[Any]] = {
+            "day": self.day[lo:hi],
+            "category": self.category[lo:hi],
+            "type": self.type[lo:hi],
+            "source": self.source[lo:hi],
+            "payment_method": self.payment_method[lo:hi],
+        }
+        cents = self.cents[lo:hi]
+        if transaction_type:
+            mask = columns["type"] == TYPES.index(transaction_type)
+            columns = {field: column[mask] for field, column in columns.items()}
+            cents = cents[mask]
+        if not cents.size:
+            return []
+
+        # Pack the group fields into one int64 key (mixed radix), then group by it
+        key = np.zeros(cents.size, dtype=np.int64)
+        offsets: dict[str, int] = {}
+        bases: dict[str, int] = {}
+        for field in group_by:
+            column = columns[field].astype(np.int64)
+            offsets[field] = int(column.min())
+            bases[field] = int(column.max()) - offsets[field] + 1
+            key = key * bases[field] + (column - offsets[field])
+        keys, inverse = np.unique(key, return_inverse=True)
+        # float64 sums of whole cents are exact below 2**53 cents
+        totals = np.rint(np.bincount(inverse, weights=cents)).astype(np.int64)
+        counts = np.bincount(inverse)
+
+        decoded: dict[str, list[Any]] = {}
+        for field in reversed(group_by):
+            keys, codes = np.divmod(keys, bases[field])
+            values = (codes + offsets[field]).tolist()
+            match field:
+                case "day":
+                    decoded[field] = [EPOCH.replace(tzinfo=UTC) + timedelta(days=v) for v in values]
+                case "category":
+                    decoded[field] = [self.categories.values[v] for v in values]
+                case "payment_method":
+                    decoded[field] = [self.payment_methods.values[v] for v in values]
+                case "type":
+                    decoded[field] = [TYPES[v] for v in values]
+                case "source":
+                    decoded[field] = [SOURCES[v] for v in values]
+
+        return [
+            {field: decoded[field][i] for field in group_by}
+            | {"total_cents": total, "count": count}
+            for i, (total, count) in enumerate(zip(totals.tolist(), counts.tolist(), strict=True))
+        ]
+
+
+async def _count_transactions(user_id: PydanticObjectId) -> int:
+    manual = await Transaction.find(Transaction.user_id == user_id).count()
+    bank = await BankTransaction.find(BankTransaction.user_id == user_id).count()
+    return manual + bank
+
+
+class SnapshotStore:
+    """LRU of per-user snapshots, each refreshed under its own lock"""
+
+    def __init__(self, maxsize: int) -> None:
+        self._snapshots: LRUCache[PydanticObjectId, TransactionSnapshot] = LRUCache(maxsize)
+
+    async def get(self, user: User) -> TransactionSnapshot:
+        user_id = PydanticObjectId(user.id)
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            snapshot = TransactionSnapshot()
+            self._snapshots[user_id] = snapshot
+        async with snapshot.lock:
+            await snapshot.refresh(user)
+        return snapshot
+
+
+snapshot_store = SnapshotStore(config.ANALYTICS_SNAPSHOT_MAX_USERS)
+
+
+# ────────────── 🔀 Backend selection ──────────────
+
+
+async def load_rows(
+    user: User,
+    group_by: list[RollupField],
+    transaction_type: TransactionType | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Rows shaped like `aggregate_rollups` output, from the configured backend"""
+    if snapshots_enabled():
+        snapshot = await snapshot_store.get(user)
+        return snapshot.rows(group_by, transaction_type, date_from, date_to)
+    return await aggregate_rollups(
+        PydanticObjectId(user.id), group_by, transaction_type, date_from, date_to
+    )
+
+
+async def load_summary(
+    user: User, transaction_type: TransactionType | None = None
+) -> dict[str, Any]:
+    """Summary numbers shaped like `aggregate_summary` output, from the configured backend"""
+    now = datetime.now(UTC)
+    if snapshots_enabled():
+        rows = await load_rows(
+            user, ["day", "category", "source", "payment_method"], transaction_type
+        )
+        return summarize_rows(rows, now)
+    return await aggregate_summary(PydanticObjectId(user.id), transaction_type, now)
@@ -0,0 +1,325 @@
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Literal
+
+from src.auth.exceptions import raise_bad_request_error, raise_not_found_error
+from src.config import MAX_LINE_POINTS, TIME_FRAMES
+from src.models import Budget, TransactionType
+from src.schemas.analytics_schemas import (
+    BudgetCategoryStat,
+    BudgetOverview,
+    CategoryStat,
+    IncomeExpenseComparison,
+    LineChartResponse,
+    LineGranularity,
+    LinePoint,
+    MonthComparison,
+    PaymentStat,
+    PieChartResponse,
+    SummaryResponse,
+    TotalSpent,
+)
+from src.utils.analytics_helper import round_decimal, start_of_day
+from src.utils.analytics_pipeline import TOP_CATEGORIES_LIMIT, period_starts
+from src.utils.money import Cents, from_cents, percent_of, to_cents
+
+# Builders turn aggregated rollup rows (dicts with `total_cents` and any of the rollup
+# key fields) into analytics responses. Rows may be grouped finer than a widget needs,
+# so every builder sums them up by its own key. All arithmetic is done on integer
+# cents; amounts become Decimal only when the response models are filled in.
+
+
+# ────────────── 🗓️ Windows ──────────────
+
+
+def month_starts(now: datetime) -> tuple[datetime, datetime]:
+    """Returns the start of the current and of the previous month"""
+    start_of_month = datetime(now.year, now.month, 1, tzinfo=UTC)
+    if now.month == 1:
+        start_of_prev_month = datetime(now.year - 1, 12, 1, tzinfo=UTC)
+    else:
+        start_of_prev_month = datetime(now.year, now.month - 1, 1, tzinfo=UTC)
+    return start_of_month, start_of_prev_month
+
+
+def timeframe_start(timeframe: str, now: datetime) -> datetime:
+    """Returns the start of a `TIME_FRAMES` window ending now"""
+    return now - timedelta(days=TIME_FRAMES[timeframe])
+
+
+def bucket_start(dt: datetime, granularity: LineGranularity) -> datetime:
+    """Start of the chart bucket containing `dt` (same rules as `$dateTrunc` in UTC)"""
+    day = start_of_day(dt)
+    match granularity:
+        case "hour":
+            return dt.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+        case "day":
+            return day
+        case "week":
+            return day - timedelta(days=day.weekday())
+        case "month":
+            return day.replace(day=1)
+        case "quarter":
+            return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def next_bucket(start: datetime, granularity: LineGranularity) -> datetime:
+    """Start of the bucket following the one starting at `start`"""
+    match granularity:
+        case "hour":
+            return start + timedelta(hours=1)
+        case "day":
+            return start + timedelta(days=1)
+        case "week":
+            return start + timedelta(days=7)
+        case "month" | "quarter":
+            months = start.month - 1 + (1 if granularity == "month" else 3)
+            return start.replace(year=start.year + months // 12, month=months % 12 + 1)
+
+
+def line_buckets(
+    start: datetime, end: datetime, granularity: LineGranularity
+) -> tuple[datetime, datetime]:
+    """
+    Widens [start, end] to whole buckets: returns the first bucket start and the
+    (exclusive) start of the bucket after the last one. Rejects ranges that would
+    produce more than `MAX_LINE_POINTS` points.
+    """
+    start, end = (d if d.tzinfo else d.replace(tzinfo=UTC) for d in (start, end))
+    if start > end:
+        raise_bad_request_error("start must be before end")
+
+    first = bucket_start(start, granularity)
+    last = bucket_start(end, granularity)
+    current, points = first, 1
+    while current < last:
+        current = next_bucket(current, granularity)
+        points += 1
+        if points > MAX_LINE_POINTS:
+            raise_bad_request_error(
+                f"Too many points (max {MAX_LINE_POINTS}), use a coarser granularity"
+            )
+    return first, next_bucket(last, granularity)
+
+
+def select_rows(
+    rows: list[dict[str, Any]],
+    transaction_type: TransactionType | None = None,
+    date_from: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Filters rows grouped by (at least) day and type"""
+    day_from = date_from.date() if date_from else None
+    return [
+        row
+        for row in rows
+        if (transaction_type is None or row["type"] == transaction_type)
+        and (day_from is None or row["day"].date() >= day_from)
+    ]
+
+
+def _sum_by(rows: list[dict[str, Any]], field: str) -> dict[str, Cents]:
+    """Sums totals by a key field, skipping rows without a value for it"""
+    sums: dict[str, Cents] = defaultdict(int)
+    for row in rows:
+        if row[field]:
+            sums[row[field]] += row["total_cents"]
+    return sums
+
+
+def sum_totals(rows: list[dict[str, Any]]) -> Cents:
+    """Sums the totals of aggregated rollup rows"""
+    return sum(row["total_cents"] for row in rows)
+
+
+# ────────────── 📊 Summary ──────────────
+
+
+def summarize_rows(rows: list[dict[str, Any]], now: datetime) -> dict[str, Any]:
+    """Python counterpart of `aggregate_summary` for rows grouped by the full rollup key"""
+    starts = period_starts(now)
+    categories = _sum_by(rows, "category")
+    top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
+    payment_methods = sorted(
+        _sum_by([row for row in rows if row["source"] == "manual"], "payment_method").items(),
+        key=lambda x: x[1],
+        reverse=True,
+    )
+    return {
+        "week": sum_totals([row for row in rows if row["day"] >= starts["week"]]),
+        "month": sum_totals([row for row in rows if row["day"] >= starts["month"]]),
+        "year": sum_totals([row for row in rows if row["day"] >= starts["year"]]),
+        "top_categories": top_categories[:TOP_CATEGORIES_LIMIT],
+        "category_total": sum(categories.values()),
+        "payment_methods": payment_methods,
+        "payment_total": sum(amount for _, amount in payment_methods),
+    }
+
+
+def build_summary(summary: dict[str, Any]) -> SummaryResponse:
+    total_amount: Cents = summary["category_total"]
+    total_payments: Cents = summary["payment_total"]
+
+    return SummaryResponse(
+        total_spent=TotalSpent(
+            week=from_cents(summary["week"]),
+            month=from_cents(summary["month"]),
+            year=from_cents(summary["year"]),
+        ),
+        top_categories=[
+            CategoryStat(
+                category=cat,
+                amount=from_cents(amount),
+                percent=percent_of(amount, total_amount) if total_amount > 0 else Decimal("0"),
+            )
+            for cat, amount in summary["top_categories"]
+        ],
+        payment_methods=[
+            PaymentStat(
+                method=method,
+                amount=from_cents(amount),
+                percent=percent_of(amount, total_payments) if total_payments > 0 else Decimal("0"),
+            )
+            for method, amount in summary["payment_methods"]
+        ],
+    )
+
+
+# ────────────── 🥧 Pie / 📈 Line ──────────────
+
+
+def build_pie(rows: list[dict[str, Any]]) -> PieChartResponse:
+    """Rows: this month's rollups of the requested type"""
+    if not rows:
+        raise_not_found_error("No transactions found for this month")
+
+    categories = _sum_by(rows, "category")
+    total = sum_totals(rows)
+
+    return PieChartResponse(
+        data=[
+            CategoryStat(
+                category=cat,
+                amount=from_cents(amount),
+                percent=percent_of(amount, total),
+            )
+            for cat, amount in categories.items()
+        ]
+    )
+
+
+def build_bucketed_line(
+    rows: list[dict[str, Any]],
+    timeframe: Literal["day", "week", "month", "year"] | None,
+    granularity: LineGranularity,
+) -> LineChartResponse:
+    """Rows: output of `aggregate_line`, already gap-filled"""
+    if not any(row["count"] for row in rows):
+        if timeframe:
+            raise_not_found_error(
+                f"No transactions found for the last {TIME_FRAMES[timeframe]} days"
+            )
+        raise_not_found_error("No transactions found for this period")
+
+    return LineChartResponse(
+        timeframe=timeframe,
+        granularity=granularity,
+        data=[
+            LinePoint(
+                date=row["bucket"] if granularity == "hour" else row["bucket"].date(),
+                amount=from_cents(row["total_cents"]),
+            )
+            for row in rows
+        ],
+    )
+
+
+# ────────────── 🔄 Comparisons ──────────────
+
+
+def build_compare(rows: list[dict[str, Any]], now: datetime) -> MonthComparison:
+    """Rows: rollups of the previous and current month, grouped by (at least) day"""
+    start_of_month, _ = month_starts(now)
+
+    current_total = sum_totals([row for row in rows if row["day"] >= start_of_month])
+    prev_total = sum_totals([row for row in rows if row["day"] < start_of_month])
+
+    return MonthComparison(
+        previous_month_total=from_cents(prev_total),
+        current_month_total=from_cents(current_total),
+        change_percent=percent_of(current_total - prev_total, prev_total)
+        if prev_total > 0
+        else Decimal("0"),
+    )
+
+
+def build_compare_types(
+    rows: list[dict[str, Any]], timeframe: Literal["week", "month", "year"]
+) -> IncomeExpenseComparison:
+    """Rows: rollups inside the timeframe, grouped by (at least) type and category"""
+    if not rows:
+        raise_not_found_error(f"No transactions found for the last {TIME_FRAMES[timeframe]} days")
+
+    # Separate into expenses and incomes
+    expenses = [row for row in rows if row["type"] == TransactionType.EXPENSE]
+    incomes = [row for row in rows if row["type"] == TransactionType.INCOME]
+
+    total_incomes = sum_totals(incomes)
+    total_expenses = sum_totals(expenses)
+
+    # Group by categories
+    expense_categories = _sum_by(expenses, "category")
+    income_categories = _sum_by(incomes, "category")
+
+    return IncomeExpenseComparison(
+        timeframe=timeframe,
+        total_income=from_cents(total_incomes),
+        total_expense=from_cents(total_expenses),
+        difference=from_cents(total_incomes - total_expenses),
+        income_percent=percent_of(total_incomes, total_incomes + total_expenses),
+        expense_percent=percent_of(total_expenses, total_incomes + total_expenses),
+        top_income_categories=[
+            CategoryStat(
+                category=cat,
+                amount=from_cents(amount),
+                percent=percent_of(amount, total_incomes),
+            )
+            for cat, amount in income_categories.items()
+        ],
+        top_expense_categories=[
+            CategoryStat(
+                category=cat,
+                amount=from_cents(amount),
+                percent=percent_of(amount, total_expenses),
+            )
+            for cat, amount in expense_categories.items()
+        ],
+    )
+
+
+# ────────────── 💰 Budgets ──────────────
+
+
+def build_budget_overview(rows: list[dict[str, Any]], budgets: list[Budget]) -> BudgetOverview:
+    """Rows: this month's expense rollups, grouped by (at least) category"""
+    if not budgets:
+        raise_not_found_error("No budgets found")
+
+    expenses_by_category = _sum_by(rows, "category")
+
+    stats: list[BudgetCategoryStat] = []
+    for budget in budgets:
+        spent = expenses_by_category.get(budget.category, 0)
+        limit = to_cents(budget.limit)
+        percent = percent_of(spent, limit) if limit > 0 else Decimal("0")
+
+        stats.append(
+            BudgetCategoryStat(
+                category=budget.category,
+                budget=round_decimal(budget.limit),
+                spent=from_cents(spent),
+                percent=percent,
+            )
+        )
+
+    return BudgetOverview(categories=stats)
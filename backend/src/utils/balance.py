@@ -0,0 +1,85 @@
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+
+from src.models import BankTransaction, Transaction, TransactionType, User
+from src.utils.analytics_cache import data_version_inc
+from src.utils.analytics_helper import start_of_day
+from src.utils.analytics_pipeline import cents_expr
+from src.utils.balance_history import apply_checkpoint_deltas
+from src.utils.money import to_cents
+from src.utils.mongo_types import convert_decimal128
+
+
+def balance_effect(transaction_type: TransactionType | str, amount: Decimal) -> Decimal:
+    """How a manual transaction changes the balance: income adds, expense subtracts"""
+    return amount if transaction_type == TransactionType.INCOME else -amount
+
+
+def bank_balance_effect(amount: float) -> Decimal:
+    """How a bank transaction changes the balance (Plaid income is negative by amount)"""
+    return -Decimal(str(amount))
+
+
+class BalanceChange:
+    """
+    Net balance change of a batch of writes: the total for `User.balance` and its
+    split by day (in cents) for the balance checkpoints.
+    """
+
+    def __init__(self) -> None:
+        self.total = Decimal("0")
+        self.days: Counter[datetime] = Counter()
+
+    def add(self, when: date | datetime, effect: Decimal) -> None:
+        self.total += effect
+        self.days[start_of_day(when)] += to_cents(effect)
+
+    def add_manual(self, txn: Transaction, sign: int = 1) -> None:
+        """Adds a manual transaction; use sign=-1 to take it back out"""
+        self.add(txn.date, balance_effect(txn.type, txn.amount) * sign)
+
+    def add_bank(self, txn: BankTransaction, sign: int = 1) -> None:
+        """Adds a bank transaction; use sign=-1 to take it back out"""
+        self.add(txn.date, bank_balance_effect(txn.amount) * sign)
+
+
+async def bank_transactions_change(match: dict[str, Any], sign: int = 1) -> BalanceChange:
+    """Balance change of the bank transactions matching `match`, summed per day server-side"""
+    signed = {"$multiply": [{"$toDecimal": "$amount"}, -sign]}
+    rows = BankTransaction.aggregate(
+        [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                    "total": {"$sum": signed},
+                    "cents": {"$sum": cents_expr(signed)},
+                }
+            },
+        ]
+    )
+    change = BalanceChange()
+    async for row in rows:
+        change.total += convert_decimal128(row["total"])
+        change.days[start_of_day(row["_id"])] += row["cents"]
+    return change
+
+
+async def apply_balance_change(
+    user_id: PydanticObjectId, change: BalanceChange, rewritten: bool = False
+) -> None:
+    """
+    Adds the change to the balance checkpoints, then to the user's balance with one
+    atomic `$inc` (safe under concurrent writers) that also invalidates cached
+    analytics. The version bump comes last, so rebuilds can detect writes in flight.
+    """
+    await apply_checkpoint_deltas(user_id, change.days)
+    _ = await User.get_motor_collection().update_one(
+        {"_id": user_id},
+        {"$inc": {"balance": Decimal128(change.total), **data_version_inc(rewritten)}},
+    )
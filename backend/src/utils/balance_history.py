@@ -0,0 +1,225 @@
+import asyncio
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any
+
+from beanie import PydanticObjectId
+from bson import Int64
+from dateutil.relativedelta import relativedelta
+from pymongo import UpdateOne
+
+from src.auth.exceptions import raise_bad_request_error
+from src.config import MAX_BALANCE_HISTORY_POINTS
+from src.models import BalanceCheckpoint, Transaction, User
+from src.schemas.base import BalanceHistoryStep
+from src.utils.analytics_cache import read_data_version
+from src.utils.analytics_helper import start_of_day
+from src.utils.analytics_pipeline import cents_expr
+from src.utils.money import Cents, from_cents, to_cents
+from src.utils.recalculate_user_balance import signed_ledger_stages
+from src.utils.rollups import REBUILD_ATTEMPTS, REBUILD_SETTLE_SECONDS
+
+# Balance checkpoints: per-day and per-month balance changes kept next to
+# `User.balance`. A balance history reads one sum of month totals plus the day
+# totals of the requested range, so its cost does not grow with the number of
+# transactions.
+
+CHECKPOINT_BATCH_SIZE = 1000
+
+
+def month_start(day: datetime) -> datetime:
+    return day.replace(day=1)
+
+
+def _checkpoint_update(
+    user_id: PydanticObjectId, period: str, start: datetime, cents: Cents
+) -> UpdateOne:
+    return UpdateOne(
+        {"user_id": user_id, "period": period, "start": start},
+        {"$inc": {"delta_cents": Int64(cents)}},
+        upsert=True,
+    )
+
+
+async def apply_checkpoint_deltas(
+    user_id: PydanticObjectId, days: Mapping[datetime, Cents]
+) -> None:
+    """$inc the day and month checkpoints with per-day balance changes (keys are UTC midnights)"""
+    months: Counter[datetime] = Counter()
+    updates: list[UpdateOne] = []
+    for day, cents in days.items():
+        if cents:
+            updates.append(_checkpoint_update(user_id, "day", day, cents))
+            months[month_start(day)] += cents
+    updates += [
+        _checkpoint_update(user_id, "month", month, cents)
+        for month, cents in months.items()
+        if cents
+    ]
+
+    collection = BalanceCheckpoint.get_motor_collection()
+    for i in range(0, len(updates), CHECKPOINT_BATCH_SIZE):
+        _ = await collection.bulk_write(updates[i : i + CHECKPOINT_BATCH_SIZE], ordered=False)
+
+
+def _checkpoint_diff_pipeline(user_id: PydanticObjectId) -> list[dict[str, Any]]:
+    """Checkpoints recomputed from the raw transactions minus the stored ones, where they differ"""
+    stored = [
+        {"$match": {"user_id": user_id}},
+        {
+            "$project": {
+                "_id": {"period": "$period", "start": "$start"},
+                "cents": {"$multiply": ["$delta_cents", -1]},
+            }
+        },
+    ]
+    return [
+        *signed_ledger_stages(user_id),
+        {
+            "$group": {
+                "_id": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                # Rounded per transaction, like the incremental updates
+                "cents": {"$sum": cents_expr("$signed")},
+            }
+        },
+        # Each day counts towards its day and its month checkpoint
+        {
+            "$project": {
+                "cents": 1,
+                "keys": [
+                    {"period": "day", "start": "$_id"},
+                    {"period": "month", "start": {"$dateTrunc": {"date": "$_id", "unit": "month"}}},
+                ],
+            }
+        },
+        {"$unwind": "$keys"},
+        {"$project": {"_id": "$keys", "cents": 1}},
+        {"$unionWith": {"coll": BalanceCheckpoint.Settings.name, "pipeline": stored}},
+        {"$group": {"_id": "$_id", "cents": {"$sum": "$cents"}}},
+        {"$match": {"cents": {"$ne": 0}}},
+    ]
+
+
+async def rebuild_user_checkpoints(
+    user_id: PydanticObjectId, settle: float = REBUILD_SETTLE_SECONDS
+) -> bool:
+    """
+    Recomputes the balance checkpoints of a user from the raw transactions and corrects
+    the stored ones in place, like `rebuild_user_rollups`: the difference is applied
+    only if the user's `data_version` did not move meanwhile. Returns False if writes
+    never paused.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        version = await read_data_version(user_id)
+        corrections = [
+            _checkpoint_update(user_id, row["_id"]["period"], row["_id"]["start"], row["cents"])
+            async for row in Transaction.aggregate(
+                _checkpoint_diff_pipeline(user_id), allowDiskUse=True
+            )
+        ]
+        if not corrections:
+            return True
+        # Writes bump data_version right after their checkpoint update
+        await asyncio.sleep(settle)
+        if await read_data_version(user_id) != version:
+            continue
+        collection = BalanceCheckpoint.get_motor_collection()
+        for i in range(0, len(corrections), CHECKPOINT_BATCH_SIZE):
+            _ = await collection.bulk_write(
+                corrections[i : i + CHECKPOINT_BATCH_SIZE], ordered=False
+            )
+        _ = await collection.delete_many({"user_id": user_id, "delta_cents": 0})
+        return True
+    print(f"⚠️ Balance checkpoints of user {user_id} not rebuilt: their data kept changing")
+    return False
+
+
+async def rebuild_all_checkpoints() -> int:
+    """Recomputes balance checkpoints for every user; returns the number of users rebuilt"""
+    processed = 0
+    async for user in User.find_all():
+        if user.id:
+            processed += await rebuild_user_checkpoints(user.id)
+    return processed
+
+
+def history_dates(start: datetime, end: datetime, step: BalanceHistoryStep) -> list[datetime]:
+    """Days of a balance history: every `step` from `start`, plus `end` itself"""
+    start, end = start_of_day(start), start_of_day(end)
+    if start > end:
+        raise_bad_request_error("'from' must not be after 'to'")
+
+    delta = (
+        relativedelta(months=1) if step == "month" else timedelta(days=7 if step == "week" else 1)
+    )
+    dates: list[datetime] = []
+    current = start
+    while current <= end:
+        if len(dates) >= MAX_BALANCE_HISTORY_POINTS:
+            raise_bad_request_error(
+                f"Too many points (max {MAX_BALANCE_HISTORY_POINTS}): use a larger step"
+            )
+        dates.append(current)
+        # Months are counted from `start` so day 31 does not drift to day 28
+        current = start + delta * len(dates)
+    if dates[-1] != end:
+        dates.append(end)
+    return dates
+
+
+async def _opening_cents(user: User) -> Cents:
+    """
+    The opening balance; until `backfill-opening-balances` has stored it for a user
+    registered before it was kept, the balance minus every checkpoint delta
+    """
+    if user.opening_balance is not None:
+        return to_cents(user.opening_balance)
+    total = await BalanceCheckpoint.aggregate(
+        [
+            {"$match": {"user_id": user.id, "period": "month"}},
+            {"$group": {"_id": None, "cents": {"$sum": "$delta_cents"}}},
+        ]
+    ).to_list()
+    return to_cents(user.balance) - (total[0]["cents"] if total else 0)
+
+
+async def balance_history(
+    user: User, start: datetime, end: datetime, step: BalanceHistoryStep
+) -> list[tuple[datetime, Decimal]]:
+    """Balance at the end of each day of the history, from the checkpoints"""
+    user_id = PydanticObjectId(user.id)
+    dates = history_dates(start, end, step)
+    first_month = month_start(dates[0])
+
+    # Everything before the first month collapses into one sum of month totals
+    before = await BalanceCheckpoint.aggregate(
+        [
+            {"$match": {"user_id": user_id, "period": "month", "start": {"$lt": first_month}}},
+            {"$group": {"_id": None, "cents": {"$sum": "$delta_cents"}}},
+        ]
+    ).to_list()
+    running = await _opening_cents(user) + (before[0]["cents"] if before else 0)
+
+    days = BalanceCheckpoint.find(
+        {
+            "user_id": user_id,
+            "period": "day",
+            "start": {"$gte": first_month, "$lte": dates[-1]},
+        }
+    ).sort("start")
+
+    points: list[tuple[datetime, Decimal]] = []
+    pending = iter(dates)
+    current = next(pending, None)
+    async for checkpoint in days:
+        day = start_of_day(checkpoint.start)
+        while current is not None and current < day:
+            points.append((current, from_cents(running)))
+            current = next(pending, None)
+        running += checkpoint.delta_cents
+    while current is not None:
+        points.append((current, from_cents(running)))
+        current = next(pending, None)
+    return points
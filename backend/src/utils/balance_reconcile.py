@@ -0,0 +1,233 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from decimal import Decimal
+from typing import Any
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+from pymongo.errors import PyMongoError
+
+from src.config import (
+    RECONCILE_BATCH_SIZE,
+    RECONCILE_CONCURRENCY,
+    RECONCILE_CONFIRM_DELAY,
+    RECONCILE_RATE,
+)
+from src.models import User
+from src.utils.mongo_types import convert_decimal128
+from src.utils.recalculate_user_balance import ledger_total, trim_balance
+
+# Background sweep that compares every stored `User.balance` with the balance
+# recomputed from the transactions and repairs drift. Users are read in `_id`
+# batches (never all at once), checked by a few workers at a capped rate, and a
+# fix is applied only if nothing was written to the user since the check.
+# Users registered before `opening_balance` was stored get it from the one-off
+# `backfill_opening_balances` migration, which uses the same batches and checks.
+
+
+class ReconcileStats:
+    """Counters of one sweep"""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.checked = 0
+        self.drifted = 0
+        self.fixed = 0
+        self.skipped = 0  # Drift not confirmed or user written to during the check
+        self.no_opening = 0  # Not checked: opening balance not backfilled yet
+        self.failed = 0
+        self.total_drift = Decimal("0")  # Sum of absolute drift that was fixed
+        self.max_drift = Decimal("0")
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.checked / elapsed if elapsed else 0.0
+        return (
+            f"checked={self.checked} drifted={self.drifted} fixed={self.fixed} "
+            f"skipped={self.skipped} no_opening={self.no_opening} failed={self.failed} "
+            f"total_drift={self.total_drift} max_drift={self.max_drift} "
+            f"elapsed={elapsed:.1f}s rate={rate:.1f}/s"
+        )
+
+
+class _RateLimiter:
+    """Spaces calls at least `1 / rate` seconds apart, across all workers"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _user_id_batches(
+    batch_size: int, match: dict[str, Any] | None = None
+) -> AsyncIterator[list[PydanticObjectId]]:
+    """IDs of users matching `match` in `_id` order, one batch at a time (keyset pagination)"""
+    collection = User.get_motor_collection()
+    last_id: PydanticObjectId | None = None
+    while True:
+        query = {**(match or {})}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = (
+            await collection.find(query, {"_id": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(batch_size)
+        )
+        if not docs:
+            return
+        yield [doc["_id"] for doc in docs]
+        last_id = docs[-1]["_id"]
+
+
+def _unchanged_version(doc: dict[str, Any]) -> dict[str, Any]:
+    """Filter matching the user only if it was not written to since `doc` was read"""
+    if "data_version" in doc:
+        return {"data_version": doc["data_version"]}
+    return {"data_version": {"$exists": False}}
+
+
+async def reconcile_user_balance(
+    user_id: PydanticObjectId,
+    stats: ReconcileStats,
+    confirm_delay: float = RECONCILE_CONFIRM_DELAY,
+) -> None:
+    """Checks one user's stored balance against the ledger and repairs confirmed drift"""
+    collection = User.get_motor_collection()
+    doc = await collection.find_one(
+        {"_id": user_id}, {"balance": 1, "opening_balance": 1, "data_version": 1}
+    )
+    if doc is None:
+        return  # Deleted since the batch was read
+
+    if doc.get("opening_balance") is None:
+        # The stored balance includes an initial balance the ledger cannot know:
+        # "fixing" it would drop that, so leave it for backfill-opening-balances
+        stats.no_opening += 1
+        return
+
+    stored = convert_decimal128(doc.get("balance", 0))
+    opening = convert_decimal128(doc["opening_balance"])
+    expected = trim_balance(opening + await ledger_total(user_id))
+    stats.checked += 1
+    if expected == stored:
+        return
+
+    stats.drifted += 1
+    # A live write may have stored a transaction and not applied its $inc yet:
+    # re-check after a pause, and only fix if the user was not written to meanwhile
+    await asyncio.sleep(confirm_delay)
+    if trim_balance(opening + await ledger_total(user_id)) != expected:
+        stats.skipped += 1
+        return
+
+    result = await collection.update_one(
+        {"_id": user_id, "balance": Decimal128(stored), **_unchanged_version(doc)},
+        {"$set": {"balance": Decimal128(expected)}},
+    )
+    if not result.modified_count:
+        stats.skipped += 1
+        return
+
+    drift = abs(expected - stored)
+    stats.fixed += 1
+    stats.total_drift += drift
+    stats.max_drift = max(stats.max_drift, drift)
+    print(f"🔧 User {user_id}: balance {stored} → {expected}")
+
+
+async def reconcile_all_balances(
+    batch_size: int = RECONCILE_BATCH_SIZE,
+    concurrency: int = RECONCILE_CONCURRENCY,
+    rate: float = RECONCILE_RATE,
+    confirm_delay: float = RECONCILE_CONFIRM_DELAY,
+) -> ReconcileStats:
+    """
+    Sweeps all users. At most `concurrency` users are checked at once and at most
+    `rate` per second, so the sweep stays a light, steady load on the database.
+    """
+    stats = ReconcileStats()
+    limiter = _RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(user_id: PydanticObjectId) -> None:
+        async with semaphore:
+            await limiter.wait()
+            try:
+                await reconcile_user_balance(user_id, stats, confirm_delay)
+            except PyMongoError as e:
+                stats.failed += 1
+                print(f"❌ User {user_id}: {e!s}")
+
+    async for batch in _user_id_batches(batch_size):
+        _ = await asyncio.gather(*(check(user_id) for user_id in batch))
+        print(f"📊 {stats.summary()}")
+    return stats
+
+
+async def backfill_opening_balance(
+    user_id: PydanticObjectId, confirm_delay: float = RECONCILE_CONFIRM_DELAY
+) -> bool:
+    """
+    Stores `balance - ledger` as the opening balance of a user registered before it
+    was kept. False if the user was written to during the check (run again later).
+    """
+    collection = User.get_motor_collection()
+    doc = await collection.find_one(
+        {"_id": user_id, "opening_balance": None}, {"balance": 1, "data_version": 1}
+    )
+    if doc is None:
+        return False  # Set since the batch was read
+
+    stored = convert_decimal128(doc.get("balance", 0))
+    ledger = await ledger_total(user_id)
+    # Same confirmation as the sweep: a live write may not have applied its $inc yet
+    await asyncio.sleep(confirm_delay)
+    if await ledger_total(user_id) != ledger:
+        return False
+
+    result = await collection.update_one(
+        {
+            "_id": user_id,
+            "opening_balance": None,
+            "balance": Decimal128(stored),
+            **_unchanged_version(doc),
+        },
+        {"$set": {"opening_balance": Decimal128(trim_balance(stored - ledger))}},
+    )
+    return bool(result.modified_count)
+
+
+async def backfill_opening_balances(
+    batch_size: int = RECONCILE_BATCH_SIZE,
+    concurrency: int = RECONCILE_CONCURRENCY,
+    confirm_delay: float = RECONCILE_CONFIRM_DELAY,
+) -> tuple[int, int]:
+    """
+    Backfills the opening balance of every user without one, reading `batch_size`
+    users at a time; returns how many were set and how many were skipped
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    stored = skipped = 0
+
+    async def backfill(user_id: PydanticObjectId) -> bool:
+        async with semaphore:
+            return await backfill_opening_balance(user_id, confirm_delay)
+
+    async for batch in _user_id_batches(batch_size, {"opening_balance": None}):
+        results = await asyncio.gather(*(backfill(user_id) for user_id in batch))
+        stored += sum(results)
+        skipped += len(results) - sum(results)
+    return stored, skipped
@@ -7,7 +7,14 @@ OPENAI_KEY_MISSING = "❌ OPENAI_API_KEY is not set in environment variables"
 # User errors
 USER_ID_REQUIRED = "User ID is required"
 
+# Database errors
+BANK_TRANSACTION_DUPLICATES = (
+    "❌ Duplicate Plaid transactions block the unique transaction_id index: "
+    "run `python -m src.cli dedupe-bank-transactions` before starting the app"
+)
+
 __all__ = [
+    "BANK_TRANSACTION_DUPLICATES",
     "OPENAI_ERROR_MESSAGE",
     "OPENAI_KEY_MISSING",
     "USER_ID_REQUIRED",
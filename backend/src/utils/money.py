@@ -0,0 +1,89 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any
+
+from beanie import Document, PydanticObjectId
+from bson import Decimal128
+from pymongo import UpdateOne
+
+from src.utils.mongo_types import convert_decimal128
+
+# Fixed-point money: amounts are whole cents in a plain (int64-sized) int.
+# Analytics sums and percentages are computed on cents and only turned into
+# `Decimal` when a response is built. Amounts are stored in whole cents too
+# (rounded on validation), so summing cents gives exactly `round_decimal` of
+# the Decimal sum.
+type Cents = int
+
+CENT = Decimal("0.01")
+AMOUNT_BATCH_SIZE = 1000
+
+
+def quantize_cents(value: Any) -> Decimal:
+    """Rounds an amount (Decimal, Decimal128, float, int or str) to whole cents, half up"""
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    elif not isinstance(value, Decimal):
+        value = Decimal(str(value))  # str() keeps floats at their shortest repr
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value: Any) -> Cents:
+    """Converts an amount to cents, rounding half up"""
+    return int(quantize_cents(value).scaleb(2))
+
+
+def from_cents(cents: Cents) -> Decimal:
+    """Cents to a Decimal with 2 decimal places (same shape as `round_decimal`)"""
+    return Decimal(cents).scaleb(-2)
+
+
+def percent_of(amount: Cents, total: Cents) -> Decimal:
+    """Same result as `calculate_percent`, computed exactly on integers"""
+    if total == 0:
+        return Decimal("0")
+    # |amount / total * 100| in hundredths of a percent, rounded half up
+    quotient, remainder = divmod(abs(amount) * 10_000, abs(total))
+    if remainder * 2 >= abs(total):
+        quotient += 1
+    percent = from_cents(quotient)
+    # copy_negate keeps the sign of a zero result, as Decimal division does
+    return percent.copy_negate() if (amount < 0) != (total < 0) else percent
+
+
+async def backfill_cent_amounts(model: type[Document]) -> set[PydanticObjectId]:
+    """
+    Rounds stored amounts with sub-cent digits to whole cents, in `_id` batches, keeping
+    the stored type (Decimal128 or float). Returns the users whose amounts changed.
+    """
+    collection = model.get_motor_collection()
+    users: set[PydanticObjectId] = set()
+    last_id: Any = None
+    while True:
+        query: dict[str, Any] = {} if last_id is None else {"_id": {"$gt": last_id}}
+        docs = (
+            await collection.find(query, {"amount": 1, "user_id": 1})
+            .sort("_id", 1)
+            .limit(AMOUNT_BATCH_SIZE)
+            .to_list(AMOUNT_BATCH_SIZE)
+        )
+        if not docs:
+            return users
+        last_id = docs[-1]["_id"]
+
+        updates: list[UpdateOne] = []
+        for doc in docs:
+            stored = doc.get("amount")
+            if stored is None:
+                continue
+            cents = quantize_cents(stored)
+            if isinstance(stored, float):
+                rounded: Any = float(cents)
+                changed = rounded != stored
+            else:
+                rounded = Decimal128(cents)
+                changed = cents != convert_decimal128(stored)  # 1.5 and 1.50 are equal
+            if changed:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"amount": rounded}}))
+                users.add(doc["user_id"])
+        if updates:
+            _ = await collection.bulk_write(updates, ordered=False)
@@ -0,0 +1,63 @@
+from typing import Any
+
+from beanie import Document
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Normalized names for case-insensitive uniqueness of categories and payment
+# methods: duplicates are found with an index point lookup on `name_key`.
+
+NAME_KEY_BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000  # MongoDB error code
+
+
+def normalize_name(name: str) -> str:
+    """Casefolds a name and collapses whitespace: " Food  & Drinks" → "food & drinks" """
+    return " ".join(name.split()).casefold()
+
+
+def duplicate_key_indexes(error: BulkWriteError) -> set[int]:
+    """Indexes of the operations rejected by a unique index; re-raises any other error"""
+    errors: list[dict[str, Any]] = error.details.get("writeErrors", [])
+    if any(item["code"] != DUPLICATE_KEY for item in errors):
+        raise error
+    return {item["index"] for item in errors}
+
+
+async def backfill_name_keys(model: type[Document]) -> tuple[int, int]:
+    """
+    Sets `name_key` on documents stored without it, in `_id` batches. A document whose
+    key is already taken (a case/space duplicate of another name of the same user) is
+    left without one. Returns (updated, duplicates).
+    """
+    collection = model.get_motor_collection()
+    updated = duplicates = 0
+    last_id: Any = None
+    while True:
+        query: dict[str, Any] = {"name_key": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = (
+            await collection.find(query, {"name": 1})
+            .sort("_id", 1)
+            .limit(NAME_KEY_BATCH_SIZE)
+            .to_list(NAME_KEY_BATCH_SIZE)
+        )
+        if not docs:
+            return updated, duplicates
+        last_id = docs[-1]["_id"]
+
+        updates = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": normalize_name(doc["name"])}})
+            for doc in docs
+        ]
+        try:
+            _ = await collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+        except BulkWriteError as e:
+            rejected = duplicate_key_indexes(e)
+            for index in rejected:
+                doc = docs[index]
+                print(f"⚠️ {model.__name__} {doc['_id']}: duplicate name {doc['name']!r}")
+            updated += len(updates) - len(rejected)
+            duplicates += len(rejected)
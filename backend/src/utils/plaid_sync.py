@@ -0,0 +1,417 @@
+import asyncio
+import json
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import date
+from typing import Any, cast
+
+from beanie import PydanticObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from plaid.api_client import ApiException
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.config import SYNC_PAGE_WAIT_SECONDS, config
+from src.integrations.plaid import plaid_client
+from src.models import BankAccount, BankConnection, BankTransaction, Category
+from src.utils.analytics_cache import bump_data_version
+from src.utils.analytics_helper import start_of_day
+from src.utils.balance import BalanceChange, apply_balance_change
+from src.utils.balance_history import rebuild_user_checkpoints
+from src.utils.balance_reconcile import ReconcileStats, reconcile_user_balance
+from src.utils.names import duplicate_key_indexes, normalize_name
+from src.utils.rollups import apply_rollup_updates, plaid_rollup_update, rebuild_user_rollups
+
+# Incremental Plaid ingestion with /transactions/sync. Each connection keeps the
+# cursor returned by its last sync, so a sync only transfers what changed since:
+# added rows are inserted, modified rows updated and removed rows deleted, with
+# rollups and the balance adjusted by the difference. A pending transaction that
+# posts arrives as "removed" (pending ID) plus "added" (posted ID).
+# A page's row writes and its rollup / balance updates are separate writes. If a
+# sync stops between them, replaying the page would find its rows already stored
+# and count nothing, so the connection is flagged while a page is written and the
+# next sync first recounts the user's derived data from the stored rows.
+# Setting that flag also checks that the connection still exists: a deleted
+# connection stops its sync before the next page, and deletion waits for the page
+# being written (see `delete_idle_connection`).
+
+SYNC_PAGE_SIZE = 500  # Max transactions per /transactions/sync page
+MUTATION_DURING_PAGINATION = "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION"
+MAX_SYNC_RESTARTS = 3
+# Plaid transactions_update_status once the full requested history is available
+HISTORICAL_UPDATE_COMPLETE = "HISTORICAL_UPDATE_COMPLETE"
+
+# Plaid payment channels shown as payment methods
+PAYMENT_CHANNELS = {
+    "online": "Plaid - Online",
+    "in store": "Plaid - Card",
+    "other": "Plaid - Other",
+}
+
+
+class SyncRecountPending(Exception):
+    """The derived data of an interrupted page could not be recounted yet (retry later)"""
+
+
+class SyncResult:
+    """
+    Counters of one sync. Rows are not kept: each page is written and dropped, so
+    memory stays bounded by the page size however much history is pulled.
+    """
+
+    def __init__(self) -> None:
+        self.added = 0
+        self.modified = 0
+        self.removed = 0
+        self.pages = 0
+
+
+def bank_account_from_plaid(
+    account: Any, user_id: PydanticObjectId, connection_id: PydanticObjectId
+) -> BankAccount:
+    """Builds a BankAccount from a Plaid account object"""
+    return BankAccount(
+        user_id=user_id,
+        bank_connection_id=connection_id,
+        account_id=cast("str", account.account_id),
+        name=cast("str", account.name),
+        official_name=cast("str | None", account.official_name),
+        type=cast("str", account.type.value),
+        subtype=cast("str | None", account.subtype.value if account.subtype else None),
+        mask=cast("str | None", account.mask),
+        current_balance=cast("float | None", account.balances.current),
+        available_balance=cast("float | None", account.balances.available),
+        iso_currency_code=cast("str | None", account.balances.iso_currency_code),
+    )
+
+
+class CategoryResolver:
+    """
+    Per-sync map of a user's category names, loaded with one query. Plaid category
+    names are matched by normalized name; missing categories are created in one batch.
+    """
+
+    def __init__(self, user_id: PydanticObjectId) -> None:
+        self.user_id = user_id
+        self._names: dict[str, str] | None = None  # name_key → stored name
+
+    async def _load(self) -> dict[str, str]:
+        if self._names is None:
+            self._names = {}
+            async for category in Category.find(Category.user_id == self.user_id):
+                key = category.name_key or normalize_name(category.name)
+                _ = self._names.setdefault(key, category.name)
+        return self._names
+
+    async def resolve(self, names: Iterable[str]) -> dict[str, str]:
+        """Maps each name to the user's category name, creating the missing categories"""
+        known = await self._load()
+        missing: dict[str, Category] = {}
+        for name in names:
+            key = normalize_name(name)
+            if key not in known and key not in missing:
+                # insert_many skips document events: name_key is set here
+                missing[key] = Category(
+                    name=name.strip(),
+                    name_key=key,
+                    user_id=self.user_id,
+                    icon="📦",
+                    color="#9CA3AF",
+                    is_default=False,
+                )
+        if missing:
+            try:
+                _ = await Category.insert_many(list(missing.values()), ordered=False)
+            except BulkWriteError as e:
+                _ = duplicate_key_indexes(e)  # Created by a concurrent sync: read them back
+                async for category in Category.find(
+                    {"user_id": self.user_id, "name_key": {"$in": list(missing)}}
+                ):
+                    missing[str(category.name_key)] = category
+            known.update({key: category.name for key, category in missing.items()})
+        return {name: known[normalize_name(name)] for name in names}
+
+
+def _plaid_category(txn: Any) -> str:
+    return cast("str", txn.category[0] if txn.category else "Uncategorized")
+
+
+def _bank_transaction(txn: Any, account: BankAccount, category: str) -> BankTransaction:
+    """Builds a BankTransaction from a Plaid transaction object"""
+    payment_channel = cast("str | None", txn.payment_channel)
+    return BankTransaction(
+        user_id=account.user_id,
+        bank_account_id=cast("PydanticObjectId", account.id),
+        transaction_id=cast("str", txn.transaction_id),
+        name=cast("str", txn.name),
+        amount=cast("float", txn.amount),
+        date=cast("date", txn.date),
+        category=[category],
+        payment_channel=payment_channel,
+        payment_method=PAYMENT_CHANNELS.get(payment_channel or "", "Plaid - Unknown"),
+        iso_currency_code=cast("str | None", txn.iso_currency_code),
+        pending=cast("bool", txn.pending),
+        source="plaid",
+    )
+
+
+def _changed_fields(txn: BankTransaction) -> dict[str, Any]:
+    """Fields Plaid can change on an existing transaction, as stored in MongoDB"""
+    return {
+        "bank_account_id": txn.bank_account_id,
+        "name": txn.name,
+        "amount": txn.amount,
+        "date": start_of_day(txn.date),
+        "category": txn.category,
+        "payment_channel": txn.payment_channel,
+        "payment_method": txn.payment_method,
+        "iso_currency_code": txn.iso_currency_code,
+        "pending": txn.pending,
+    }
+
+
+async def _apply_page(
+    connection: BankConnection,
+    accounts: dict[str, BankAccount],
+    categories: CategoryResolver,
+    response: Any,
+    result: SyncResult,
+) -> None:
+    """
+    Writes one /transactions/sync page. Rows are keyed by Plaid ID, so replaying a page
+    stores nothing twice; its deltas are right unless a previous attempt was cut off
+    between rows and deltas, which `sync_page_pending` catches.
+    """
+    user_id = connection.user_id
+    rollup_updates: list[UpdateOne] = []
+    balance_change = BalanceChange()
+
+    # Accounts opened after the connection was made
+    for plaid_account in response.accounts:
+        if plaid_account.account_id not in accounts:
+            account = bank_account_from_plaid(
+                plaid_account, user_id, PydanticObjectId(connection.id)
+            )
+            _ = await account.insert()
+            accounts[account.account_id] = account
+
+    # Removed (including pending rows that were replaced by their posted version)
+    removed_ids = [cast("str", txn.transaction_id) for txn in response.removed]
+    removed = await BankTransaction.find(
+        {"user_id": user_id, "transaction_id": {"$in": removed_ids}}
+    ).to_list()
+    if removed:
+        for txn in removed:
+            rollup_updates.append(plaid_rollup_update(txn, sign=-1))
+            balance_change.add_bank(txn, sign=-1)
+        _ = await BankTransaction.find({"_id": {"$in": [txn.id for txn in removed]}}).delete()
+        result.removed += len(removed)
+
+    # Added and modified (last version of each Plaid ID): insert new rows, update stored ones
+    incoming = {
+        cast("str", txn.transaction_id): txn for txn in [*response.added, *response.modified]
+    }
+    stored = {
+        txn.transaction_id: txn
+        async for txn in BankTransaction.find(
+            {"user_id": user_id, "transaction_id": {"$in": list(incoming)}}
+        )
+    }
+    category_names = await categories.resolve({_plaid_category(t) for t in incoming.values()})
+    new_rows: list[BankTransaction] = []
+    updates: list[UpdateOne] = []
+    for plaid_txn in incoming.values():
+        account = accounts.get(cast("str", plaid_txn.account_id))
+        if account is None:
+            continue
+        txn = _bank_transaction(plaid_txn, account, category_names[_plaid_category(plaid_txn)])
+        old = stored.get(txn.transaction_id)
+        if old is None:
+            txn.id = PydanticObjectId()
+            new_rows.append(txn)
+            continue
+        txn.id = old.id
+        txn.created_at = old.created_at
+        updates.append(UpdateOne({"_id": old.id}, {"$set": _changed_fields(txn)}))
+        rollup_updates += [plaid_rollup_update(old, sign=-1), plaid_rollup_update(txn)]
+        balance_change.add_bank(old, sign=-1)
+        balance_change.add_bank(txn)
+        result.modified += 1
+
+    if updates:
+        _ = await BankTransaction.get_motor_collection().bulk_write(updates, ordered=False)
+    for txn in await _insert_new(new_rows):
+        rollup_updates.append(plaid_rollup_update(txn))
+        balance_change.add_bank(txn)
+        result.added += 1
+
+    if rollup_updates:
+        await apply_rollup_updates(rollup_updates)
+        await apply_balance_change(user_id, balance_change, rewritten=bool(removed or updates))
+
+
+async def _insert_new(rows: list[BankTransaction]) -> list[BankTransaction]:
+    """
+    Inserts rows with one unordered insert_many and returns the ones actually inserted.
+    Rows that a concurrent sync stored first are rejected by the unique `transaction_id`
+    index and dropped, so they are never counted twice.
+    """
+    if not rows:
+        return []
+    try:
+        _ = await BankTransaction.insert_many(rows, ordered=False)
+    except BulkWriteError as e:
+        rejected = duplicate_key_indexes(e)
+        return [row for index, row in enumerate(rows) if index not in rejected]
+    return rows
+
+
+async def _recount_interrupted_page(connection: BankConnection) -> None:
+    """
+    Recounts the user's rollups, checkpoints and balance from the stored rows after a
+    page was cut off between its row writes and its deltas, then clears the flag
+    """
+    user_id = connection.user_id
+    stats = ReconcileStats()
+    rebuilt = await rebuild_user_rollups(user_id) and await rebuild_user_checkpoints(user_id)
+    await reconcile_user_balance(user_id, stats)
+    await bump_data_version(user_id, rewritten=True)
+    if not rebuilt or stats.skipped:
+        raise SyncRecountPending(f"Derived data of user {user_id} kept changing during recount")
+    _ = await connection.set({BankConnection.sync_page_pending: False})
+    print(f"🔧 Recounted derived data of user {user_id} after an interrupted sync page")
+
+
+async def _start_page(connection: BankConnection) -> bool:
+    """Flags a page as being written; False if the connection was deleted meanwhile"""
+    result = await BankConnection.get_motor_collection().update_one(
+        {"_id": connection.id}, {"$set": {"sync_page_pending": True}}
+    )
+    return result.matched_count == 1
+
+
+async def delete_idle_connection(connection: BankConnection) -> None:
+    """
+    Deletes the connection once none of its sync pages is being written, so no rows
+    are stored for it afterwards. A flag left by a crashed sync is only waited out
+    for SYNC_PAGE_WAIT_SECONDS.
+    """
+    collection = BankConnection.get_motor_collection()
+    deadline = asyncio.get_running_loop().time() + SYNC_PAGE_WAIT_SECONDS
+    while asyncio.get_running_loop().time() < deadline:
+        idle = {"_id": connection.id, "sync_page_pending": {"$ne": True}}
+        if (await collection.delete_one(idle)).deleted_count:
+            return
+        if not await collection.count_documents({"_id": connection.id}, limit=1):
+            return  # Deleted by a concurrent request
+        await asyncio.sleep(0.25)
+    _ = await collection.delete_one({"_id": connection.id})
+
+
+def _plaid_error_code(error: ApiException) -> str | None:
+    try:
+        return json.loads(error.body or "{}").get("error_code")
+    except (TypeError, ValueError):
+        return None
+
+
+async def sync_connection(
+    connection: BankConnection,
+    on_page: Callable[[SyncResult], Awaitable[None]] | None = None,
+) -> SyncResult:
+    """
+    Pulls every change since the connection's stored cursor, page by page; without a
+    cursor this is the backfill of the whole history Plaid holds. The cursor is saved
+    after each page, so an interrupted sync resumes where it stopped. `on_page` is
+    called after each page to report progress. Stops early if the connection is deleted.
+    """
+    if connection.sync_page_pending:
+        await _recount_interrupted_page(connection)
+
+    accounts = {
+        account.account_id: account
+        async for account in BankAccount.find(BankAccount.bank_connection_id == connection.id)
+    }
+    categories = CategoryResolver(connection.user_id)
+    result = SyncResult()
+    start_cursor = connection.sync_cursor
+    cursor = start_cursor
+    restarts = 0
+    has_more = True
+    while has_more:
+        request = TransactionsSyncRequest(
+            access_token=connection.access_token, count=SYNC_PAGE_SIZE
+        )
+        if cursor:
+            request.cursor = cursor
+        try:
+            response = await plaid_client.transactions_sync(request)
+        except ApiException as e:
+            if _plaid_error_code(e) != MUTATION_DURING_PAGINATION or restarts >= MAX_SYNC_RESTARTS:
+                raise
+            restarts += 1
+            # Plaid data changed mid-loop: restart from the first cursor of this sync
+            cursor = start_cursor
+            continue
+
+        if not await _start_page(connection):
+            print(f"🗑️ Bank connection {connection.id} was deleted, sync stopped")
+            break
+        await _apply_page(connection, accounts, categories, response, result)
+        result.pages += 1
+        cursor = cast("str", response.next_cursor)
+        has_more = cast("bool", response.has_more)
+        # The flag is cleared with the cursor: the page is done once both are stored
+        _ = await connection.set(
+            {
+                BankConnection.sync_cursor: cursor,
+                BankConnection.history_status: str(response.transactions_update_status),
+                BankConnection.sync_page_pending: False,
+            }
+        )
+        if on_page is not None:
+            await on_page(result)
+    return result
+
+
+# Process-wide limits on concurrent syncs, in total and per institution
+_sync_slots = asyncio.Semaphore(config.PLAID_SYNC_CONCURRENCY)
+_institution_slots: defaultdict[str | None, asyncio.Semaphore] = defaultdict(
+    lambda: asyncio.Semaphore(config.PLAID_INSTITUTION_CONCURRENCY)
+)
+
+
+async def sync_connection_limited(
+    connection: BankConnection,
+    on_page: Callable[[SyncResult], Awaitable[None]] | None = None,
+) -> SyncResult:
+    """`sync_connection` within the process-wide limits"""
+    # Institution slot first, so a task waiting on its institution holds no global slot
+    async with _institution_slots[connection.institution_id], _sync_slots:
+        return await sync_connection(connection, on_page)
+
+
+async def remove_duplicate_bank_transactions(db: AsyncIOMotorDatabase) -> set[PydanticObjectId]:
+    """
+    Deletes all but the first stored row of each Plaid `transaction_id` (left by syncs
+    that ran before the unique index existed). Works on the raw collection, so it can
+    run before `init_db` builds the indexes. Returns the users whose rows were deleted.
+    """
+    collection = db[BankTransaction.Settings.name]
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {
+            "$group": {
+                "_id": "$transaction_id",
+                "ids": {"$push": "$_id"},
+                "user_id": {"$first": "$user_id"},
+            }
+        },
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    users: set[PydanticObjectId] = set()
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        _ = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        users.add(group["user_id"])
+    return users
@@ -0,0 +1,88 @@
+import hashlib
+import hmac
+import time
+from typing import Any
+
+import jwt
+from plaid.api_client import ApiException
+from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
+
+from src.config import config
+from src.integrations.plaid import plaid_client
+from src.models import BankConnection
+from src.utils.sync_queue import PRIORITY_WEBHOOK, enqueue_sync
+
+# Plaid webhooks: a signed notice that an item has new data. It only queues a
+# debounced sync job, so a burst of webhooks for one item costs one sync.
+
+# Transactions webhooks that mean new data is ready to sync
+SYNC_WEBHOOK_CODES = {"SYNC_UPDATES_AVAILABLE", "DEFAULT_UPDATE"}
+WEBHOOK_MAX_AGE_SECONDS = 5 * 60  # Older signed webhooks are rejected (replay)
+
+# Plaid verification keys by key ID; a key is fetched once, then until it expires
+_verification_keys: dict[str, dict[str, Any]] = {}
+
+
+class WebhookVerificationError(Exception):
+    """A webhook whose Plaid-Verification signature does not check out"""
+
+
+async def _verification_key(key_id: str) -> dict[str, Any]:
+    key = _verification_keys.get(key_id)
+    if key is None or key.get("expired_at"):
+        try:
+            response = await plaid_client.webhook_verification_key_get(
+                WebhookVerificationKeyGetRequest(key_id=key_id)
+            )
+        except ApiException as e:
+            raise WebhookVerificationError(f"Unknown verification key: {e.reason}") from e
+        key = response.key.to_dict()
+        _verification_keys[key_id] = key
+    if key.get("expired_at"):
+        raise WebhookVerificationError("Verification key has expired")
+    return key
+
+
+async def verify_webhook(body: bytes, token: str | None) -> None:
+    """
+    Checks the Plaid-Verification header: an ES256 JWT signed with a Plaid key,
+    issued in the last few minutes, that carries the SHA-256 of the body.
+    """
+    if not token:
+        raise WebhookVerificationError("Missing Plaid-Verification header")
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "ES256":
+            raise WebhookVerificationError("Unexpected signature algorithm")
+        key = jwt.PyJWK(await _verification_key(header["kid"]))
+        claims = jwt.decode(token, key, algorithms=["ES256"], options={"verify_aud": False})
+    except (jwt.PyJWTError, KeyError) as e:
+        raise WebhookVerificationError(f"Invalid signature: {e!s}") from e
+
+    if time.time() - claims.get("iat", 0) > WEBHOOK_MAX_AGE_SECONDS:
+        raise WebhookVerificationError("Webhook is too old")
+    body_hash = hashlib.sha256(body).hexdigest()
+    if not hmac.compare_digest(body_hash, str(claims.get("request_body_sha256", ""))):
+        raise WebhookVerificationError("Body does not match the signature")
+
+
+async def handle_webhook(payload: dict[str, Any]) -> int:
+    """Queues a debounced sync of the webhook's item; returns the number of jobs queued"""
+    if payload.get("webhook_type") != "TRANSACTIONS":
+        return 0
+    if payload.get("webhook_code") not in SYNC_WEBHOOK_CODES:
+        return 0
+    item_id = payload.get("item_id")
+    if not item_id:
+        return 0
+
+    queued = 0
+    async for connection in BankConnection.find(BankConnection.item_id == item_id):
+        _ = await enqueue_sync(
+            connection,
+            "webhook",
+            PRIORITY_WEBHOOK,
+            delay=config.PLAID_WEBHOOK_DEBOUNCE_SECONDS,
+        )
+        queued += 1
+    return queued
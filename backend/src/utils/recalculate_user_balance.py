@@ -1,34 +1,99 @@
 from decimal import Decimal
+from typing import Any
 
 from beanie import PydanticObjectId
+from bson import Decimal128
 
-from src.models import BankTransaction, Transaction, User
+from src.models import BankTransaction, Transaction, TransactionType, User
+from src.utils.mongo_types import convert_decimal128
 
 
-async def recalculate_user_balance(user_id: PydanticObjectId) -> None:
+def signed_ledger_stages(user_id: PydanticObjectId) -> list[dict[str, Any]]:
+    """
+    Stages (run on `transactions`) producing one `{date, signed}` row per manual and bank
+    transaction of a user, where `signed` is the balance effect: manual income adds,
+    manual expense subtracts, Plaid amounts are subtracted (Plaid income is negative).
+    """
+    return [
+        {"$match": {"user_id": user_id}},
+        {
+            "$project": {
+                "_id": 0,
+                "date": 1,
+                "signed": {
+                    "$cond": [
+                        {"$eq": ["$type", TransactionType.INCOME.value]},
+                        "$amount",
+                        {"$multiply": ["$amount", -1]},
+                    ]
+                },
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": BankTransaction.Settings.name,
+                "pipeline": [
+                    {"$match": {"user_id": user_id}},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "date": 1,
+                            "signed": {"$multiply": [{"$toDecimal": "$amount"}, -1]},
+                        }
+                    },
+                ],
+            }
+        },
+    ]
+
+
+def ledger_total_pipeline(user_id: PydanticObjectId) -> list[dict[str, Any]]:
+    """Pipeline (run on `transactions`) returning the signed total of all transactions of a user"""
+    return [
+        *signed_ledger_stages(user_id),
+        {"$group": {"_id": None, "total": {"$sum": "$signed"}}},
+    ]
+
+
+def trim_balance(value: Decimal) -> Decimal:
+    """Drops trailing zeros left by $toDecimal on doubles, keeping at least 2 decimal places"""
+    normalized = value.normalize()
+    if normalized.as_tuple().exponent > -2:  # pyright: ignore[reportOperatorIssue]
+        return value.quantize(Decimal("0.01"))
+    return normalized
+
+
+async def ledger_total(user_id: PydanticObjectId) -> Decimal:
+    """Signed total of all manual and bank transactions of a user, summed server-side"""
+    rows = await Transaction.aggregate(ledger_total_pipeline(user_id)).to_list()
+    return convert_decimal128(rows[0]["total"]) if rows else Decimal("0")
+
+
+async def calculate_user_balance(user: User) -> Decimal | None:
+    """
+    True balance of a user: opening balance plus the signed total of all transactions.
+    None while the opening balance of a user registered before it was stored is unknown.
+    """
+    if user.opening_balance is None:
+        return None
+    return trim_balance(user.opening_balance + await ledger_total(PydanticObjectId(user.id)))
+
+
+async def recalculate_user_balance(user_id: PydanticObjectId) -> Decimal | None:
+    """
+    Recomputes the balance server-side and stores it; returns the new balance, or None
+    if the user is gone or has no opening balance yet (the stored balance is kept)
+    """
     user = await User.get(user_id)
     if not user:
-        return
-
-    balance = Decimal("0")
-
-    # Manual transactions
-    manual_txns = await Transaction.find(Transaction.user_id == user_id).to_list()
-    for txn in manual_txns:
-        if txn.type == "income":
-            balance += txn.amount
-        else:
-            balance -= txn.amount
-
-    # Bank transactions
-    bank_txns = await BankTransaction.find(BankTransaction.user_id == user_id).to_list()
-    for txn in bank_txns:
-        # Plaid income is negative by amount
-        amount = Decimal(str(txn.amount))
-        if txn.amount < 0:
-            balance += abs(amount)
-        else:
-            balance -= amount
-
-    user.balance = balance
-    _ = await user.save()
+        return None
+
+    balance = await calculate_user_balance(user)
+    if balance is None:
+        return None
+
+    # $set only the balance: saving the whole user would overwrite concurrent $inc updates
+    _ = await User.get_motor_collection().update_one(
+        {"_id": user_id}, {"$set": {"balance": Decimal128(balance)}}
+    )
+    return balance
@@ -0,0 +1,198 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+from beanie import PydanticObjectId
+from bson import Int64
+from pymongo import UpdateOne
+
+from src.models import BankTransaction, DailyRollup, Transaction, TransactionType, User
+from src.utils.analytics_cache import read_data_version
+from src.utils.analytics_helper import start_of_day
+from src.utils.analytics_pipeline import (
+    manual_projection,
+    plaid_projection,
+    rollup_group_stage,
+    unified_transactions_stages,
+)
+from src.utils.money import Cents, to_cents
+
+# Number of bucket updates sent to MongoDB in one bulk_write
+ROLLUP_BATCH_SIZE = 1000
+# Rebuild: wait for writes in flight to finish, and give up after this many retries
+REBUILD_SETTLE_SECONDS = 1.0
+REBUILD_ATTEMPTS = 5
+
+_BUCKET_FIELDS = ("user_id", "day", "category", "type", "source", "payment_method")
+
+
+def _bucket_update(key: dict[str, Any], total_cents: Cents, count: int) -> UpdateOne:
+    return UpdateOne(
+        key,
+        {"$inc": {"total_cents": Int64(total_cents), "transactions_count": count}},
+        upsert=True,
+    )
+
+
+def manual_rollup_update(txn: Transaction, sign: int = 1) -> UpdateOne:
+    """$inc for the bucket of a manual transaction; use sign=-1 to take it back out"""
+    return _bucket_update(
+        {
+            "user_id": txn.user_id,
+            "day": start_of_day(txn.date),
+            "category": txn.category,
+            "type": TransactionType(txn.type).value,
+            "source": "manual",
+            "payment_method": txn.payment_method,
+        },
+        to_cents(txn.amount) * sign,
+        sign,
+    )
+
+
+def plaid_rollup_update(txn: BankTransaction, sign: int = 1) -> UpdateOne:
+    """$inc for the bucket of a bank transaction; use sign=-1 to take it back out"""
+    transaction_type = TransactionType.INCOME if txn.amount < 0 else TransactionType.EXPENSE
+    return _bucket_update(
+        {
+            "user_id": txn.user_id,
+            "day": start_of_day(txn.date),
+            "category": ", ".join(txn.category) if txn.category else None,
+            "type": transaction_type.value,
+            "source": "plaid",
+            "payment_method": txn.payment_method,
+        },
+        to_cents(txn.amount) * sign,
+        sign,
+    )
+
+
+async def apply_rollup_updates(updates: list[UpdateOne]) -> None:
+    """Sends bucket updates to MongoDB, in batches"""
+    collection = DailyRollup.get_motor_collection()
+    for i in range(0, len(updates), ROLLUP_BATCH_SIZE):
+        _ = await collection.bulk_write(updates[i : i + ROLLUP_BATCH_SIZE], ordered=False)
+
+
+async def _apply_grouped(
+    rows: AsyncIterator[dict[str, Any]],
+    sign: int,
+    rename: dict[str, str] | None = None,
+) -> None:
+    """
+    Streams grouped rows (output of `rollup_group_stage`) into bucket updates.
+    With `rename`, each group is moved out of its bucket into the renamed one.
+    Only one batch of updates is kept in memory.
+    """
+    batch: list[UpdateOne] = []
+    async for row in rows:
+        total = row["total_cents"]
+        batch.append(_bucket_update(row["_id"], total * sign, row["count"] * sign))
+        if rename:
+            batch.append(_bucket_update(row["_id"] | rename, total, row["count"]))
+        if len(batch) >= ROLLUP_BATCH_SIZE:
+            await apply_rollup_updates(batch)
+            batch = []
+    await apply_rollup_updates(batch)
+
+
+async def remove_bank_rollups(match: dict[str, Any]) -> None:
+    """Takes the bank transactions matching `match` out of the rollups (call before deleting)"""
+    pipeline = [{"$match": match}, plaid_projection(), rollup_group_stage()]
+    await _apply_grouped(aiter(BankTransaction.aggregate(pipeline)), sign=-1)
+
+
+async def move_manual_rollups(
+    user_id: PydanticObjectId, field: str, old_value: str, new_value: str
+) -> None:
+    """
+    Moves manual transactions whose `field` equals `old_value` into the buckets for
+    `new_value` (call before renaming the transactions themselves)
+    """
+    pipeline = [
+        {"$match": {"user_id": user_id, field: old_value}},
+        manual_projection(),
+        rollup_group_stage(),
+    ]
+    rows = aiter(Transaction.aggregate(pipeline))
+    await _apply_grouped(rows, sign=-1, rename={field: new_value})
+
+
+def _bucket_key(prefix: str) -> dict[str, Any]:
+    # Same field order and explicit nulls on both sides, so equal buckets group together
+    return {field: {"$ifNull": [f"{prefix}{field}", None]} for field in _BUCKET_FIELDS}
+
+
+def _rollup_diff_pipeline(user_id: PydanticObjectId) -> list[dict[str, Any]]:
+    """Buckets recomputed from the raw transactions minus the stored ones, where they differ"""
+    stored = [
+        {"$match": {"user_id": user_id}},
+        {
+            "$project": {
+                "_id": _bucket_key("$"),
+                "total_cents": {"$multiply": ["$total_cents", -1]},
+                "count": {"$multiply": ["$transactions_count", -1]},
+            }
+        },
+    ]
+    return [
+        *unified_transactions_stages(user_id),
+        rollup_group_stage(),
+        {"$project": {"_id": _bucket_key("$_id."), "total_cents": 1, "count": 1}},
+        {"$unionWith": {"coll": DailyRollup.Settings.name, "pipeline": stored}},
+        {
+            "$group": {
+                "_id": "$_id",
+                "total_cents": {"$sum": "$total_cents"},
+                "count": {"$sum": "$count"},
+            }
+        },
+        {"$match": {"$or": [{"total_cents": {"$ne": 0}}, {"count": {"$ne": 0}}]}},
+    ]
+
+
+async def rebuild_user_rollups(
+    user_id: PydanticObjectId, settle: float = REBUILD_SETTLE_SECONDS
+) -> bool:
+    """
+    Recomputes the rollups of a user from the raw transactions and corrects the stored
+    buckets in place by $inc of the difference. Buckets are never emptied, so analytics
+    read during a rebuild stay complete and concurrent $inc writes are kept.
+
+    A write in flight while the difference is computed (transaction stored, bucket not
+    yet updated) would be counted twice, so the difference is only applied if the
+    user's `data_version` did not move meanwhile; otherwise it is computed again.
+    Only differing buckets are held in memory. Returns False if writes never paused.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        version = await read_data_version(user_id)
+        pipeline = _rollup_diff_pipeline(user_id)
+        corrections = [
+            _bucket_update(row["_id"], row["total_cents"], row["count"])
+            async for row in Transaction.aggregate(pipeline, allowDiskUse=True)
+        ]
+        if not corrections:
+            return True
+        # Writes bump data_version right after their bucket update
+        await asyncio.sleep(settle)
+        if await read_data_version(user_id) != version:
+            continue
+        await apply_rollup_updates(corrections)
+        _ = await DailyRollup.get_motor_collection().delete_many(
+            {"user_id": user_id, "transactions_count": 0, "total_cents": 0}
+        )
+        return True
+    print(f"⚠️ Rollups of user {user_id} not rebuilt: their data kept changing")
+    return False
+
+
+async def rebuild_all_rollups() -> int:
+    """
+    Recomputes rollups for every user, one user at a time, so memory stays bounded
+    by the differing buckets of one user. Returns the number of users rebuilt.
+    """
+    processed = 0
+    async for user in User.find_all():
+        if user.id:
+            processed += await rebuild_user_rollups(user.id)
+    return processed
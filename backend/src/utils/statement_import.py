@@ -0,0 +1,328 @@
+import asyncio
+import codecs
+import csv
+import hashlib
+import re
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import batched
+from pathlib import Path
+from typing import Any, BinaryIO, Literal
+
+from beanie import PydanticObjectId
+from dateutil import parser as date_parser
+from pydantic import ValidationError
+from pymongo.errors import PyMongoError
+
+from src.config import IMPORT_CHUNK_SIZE, MAX_IMPORT_ERRORS
+from src.models import ImportJob, Transaction, TransactionType
+from src.schemas.base import TransactionCreate
+from src.utils.analytics_helper import start_of_day
+from src.utils.money import to_cents
+from src.utils.transaction_writes import insert_transactions
+
+# Statement import pipeline, one generator stage per step:
+#   read bytes → parse rows (CSV / OFX / QFX) → normalize to TransactionCreate
+#   → chunks → dedupe against stored rows → insert_many
+# Only one chunk of rows is held in memory, whatever the size of the file.
+
+READ_SIZE = 64 * 1024
+MAX_OFX_TEXT = 1024 * 1024  # Longest text allowed between two OFX tags
+
+type StatementFormat = Literal["csv", "ofx", "qfx"]
+
+
+class StatementError(ValueError):
+    """A row (or the whole file) that cannot be imported"""
+
+
+class _Progress:
+    """Byte position of the reader, shared with the job for progress reporting"""
+
+    def __init__(self) -> None:
+        self.bytes_read = 0
+
+
+# ────────────── 📄 Parsing ──────────────
+
+
+def _lines(file: BinaryIO, progress: _Progress) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    for raw in file:
+        progress.bytes_read = file.tell()
+        yield decoder.decode(raw)
+
+
+_CSV_COLUMNS: dict[str, tuple[str, ...]] = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "withdrawal", "withdrawals", "money out"),
+    "credit": ("credit", "deposit", "deposits", "money in"),
+    "description": ("description", "name", "payee", "details", "narrative", "memo"),
+    "category": ("category",),
+}
+
+
+def _csv_rows(file: BinaryIO, progress: _Progress) -> Iterator[list[str]]:
+    """Rows of a CSV file; syntax errors (e.g. a field over the size limit) fail the import"""
+    reader = csv.reader(_lines(file, progress))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            raise StatementError(f"Malformed CSV at line {reader.line_num}: {e!s}") from e
+        yield row
+
+
+def parse_csv(file: BinaryIO, progress: _Progress) -> Iterator[dict[str, Any]]:
+    """
+    Yields raw rows of a CSV statement. The header must have a date column and either
+    a signed amount column (negative = money out) or debit / credit columns.
+    """
+    reader = _csv_rows(file, progress)
+    header = next(reader, None)
+    if header is None:
+        raise StatementError("The file is empty")
+
+    names = [name.strip().casefold() for name in header]
+    columns = {
+        field: next((names.index(alias) for alias in aliases if alias in names), None)
+        for field, aliases in _CSV_COLUMNS.items()
+    }
+    if columns["date"] is None or (
+        columns["amount"] is None and columns["debit"] is None and columns["credit"] is None
+    ):
+        raise StatementError(
+            "CSV header must contain a date and an amount (or debit/credit) column"
+        )
+
+    def cell(row: list[str], field: str) -> str:
+        index = columns[field]
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for line, row in enumerate(reader, start=2):
+        if not any(value.strip() for value in row):
+            continue
+        debit, credit = cell(row, "debit"), cell(row, "credit")
+        yield {
+            "line": line,
+            "date": cell(row, "date"),
+            "amount": cell(row, "amount") or (f"-{debit}" if debit else credit),
+            "description": cell(row, "description"),
+            "category": cell(row, "category") or None,
+        }
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _ofx_tags(file: BinaryIO, progress: _Progress) -> Iterator[tuple[bool, str, str]]:
+    """
+    Yields (closing, tag, text) for every tag of an OFX 1.x (SGML) or 2.x (XML) file,
+    reading fixed-size blocks. Text is cut at the last "<" of each block so no tag
+    is split.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    while block := file.read(READ_SIZE):
+        progress.bytes_read = file.tell()
+        buffer += decoder.decode(block)
+        cut = buffer.rfind("<")
+        if cut == -1:
+            buffer = ""  # Header lines before the first tag
+            continue
+        if cut == 0:
+            if len(buffer) > MAX_OFX_TEXT:
+                raise StatementError("Malformed OFX file")
+            continue
+        for match in _OFX_TAG.finditer(buffer, 0, cut):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[cut:]
+    buffer += decoder.decode(b"", final=True)
+    for match in _OFX_TAG.finditer(buffer):
+        yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+
+
+def parse_ofx(file: BinaryIO, progress: _Progress) -> Iterator[dict[str, Any]]:
+    """Yields raw rows from the <STMTTRN> blocks of an OFX / QFX statement"""
+    current: dict[str, str] | None = None
+    number = 0
+    for closing, tag, text in _ofx_tags(file, progress):
+        if tag == "STMTTRN":
+            if not closing:
+                current = {}
+                continue
+            if current is not None:
+                number += 1
+                yield {
+                    "line": number,
+                    "date": current.get("DTPOSTED", ""),
+                    "amount": current.get("TRNAMT", ""),
+                    "description": " ".join(
+                        part for part in (current.get("NAME"), current.get("MEMO")) if part
+                    ),
+                    "category": None,
+                }
+            current = None
+        elif current is not None and not closing and text:
+            current[tag] = text
+
+
+# ────────────── 🧹 Normalization ──────────────
+
+
+def _parse_amount(value: str) -> Decimal:
+    negative = value.startswith("-") or (value.startswith("(") and value.endswith(")"))
+    digits = re.sub(r"[^\d.]", "", value)
+    try:
+        amount = Decimal(digits)
+    except InvalidOperation as e:
+        raise StatementError(f"Invalid amount: {value!r}") from e
+    return -amount if negative else amount
+
+
+def _parse_date(value: str, file_format: StatementFormat) -> datetime:
+    try:
+        if file_format == "csv":
+            parsed = date_parser.parse(value)
+        else:
+            # OFX dates: YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]], only the day matters
+            parsed = datetime.strptime(value[:8], "%Y%m%d")
+    except (ValueError, OverflowError) as e:
+        raise StatementError(f"Invalid date: {value!r}") from e
+    return start_of_day(parsed.date())
+
+
+def normalize(row: dict[str, Any], file_format: StatementFormat) -> TransactionCreate:
+    """Turns a raw statement row into a transaction: money out is an expense, money in income"""
+    amount = _parse_amount(row["amount"])
+    try:
+        return TransactionCreate(
+            amount=abs(amount),
+            type=TransactionType.EXPENSE if amount < 0 else TransactionType.INCOME,
+            source="manual",
+            category=row["category"],
+            date=_parse_date(row["date"], file_format),
+            description=row["description"] or None,
+        )
+    except ValidationError as e:
+        raise StatementError(str(e)) from e
+
+
+def _normalized_rows(
+    rows: Iterable[dict[str, Any]], file_format: StatementFormat
+) -> Iterator[tuple[int, TransactionCreate | str]]:
+    """Yields (line, transaction) or (line, error message) so bad rows do not stop the import"""
+    for row in rows:
+        try:
+            yield row["line"], normalize(row, file_format)
+        except StatementError as e:
+            yield row["line"], str(e)
+
+
+# ────────────── 🔁 Deduplication ──────────────
+
+
+def row_hash(d: datetime, transaction_type: str, amount: Decimal, description: str | None) -> str:
+    """Identity of a statement row: day, signed amount in cents and normalized description"""
+    cents = to_cents(amount)
+    signed = cents if transaction_type == TransactionType.INCOME else -cents
+    text = " ".join((description or "").casefold().split())
+    key = f"{start_of_day(d).date().isoformat()}|{signed}|{text}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+async def _stored_hashes(
+    user_id: PydanticObjectId,
+    rows: list[TransactionCreate],
+    before: PydanticObjectId,
+) -> Counter[str]:
+    """
+    Hashes of the user's stored transactions on the days of `rows`. Only rows created
+    before the job (`_id < before`) count, so the import never dedupes against itself.
+    """
+    days = [start_of_day(row.date) for row in rows if row.date]
+    if not days:
+        return Counter()
+    stored = Transaction.find(
+        {
+            "user_id": user_id,
+            "_id": {"$lt": before},
+            "date": {"$gte": min(days), "$lt": max(days) + timedelta(days=1)},
+        }
+    )
+    return Counter([row_hash(t.date, t.type, t.amount, t.description) async for t in stored])
+
+
+# ────────────── 🚚 Job ──────────────
+
+
+async def run_import(job: ImportJob, path: Path) -> None:
+    """Runs the pipeline over an uploaded file, saving progress on the job after every chunk"""
+    assert job.id is not None
+    progress = _Progress()
+    job.status = "running"
+    _ = await job.save()
+
+    try:
+        with path.open("rb") as file:
+            parse = parse_csv if job.file_format == "csv" else parse_ofx
+            chunks = batched(
+                _normalized_rows(parse(file, progress), job.file_format), IMPORT_CHUNK_SIZE
+            )
+            # Parsing is blocking file I/O: pull each chunk in a worker thread
+            while chunk := await asyncio.to_thread(next, chunks, None):
+                await _import_chunk(job, chunk)
+                job.bytes_processed = progress.bytes_read
+                _ = await job.save()
+        job.status = "completed"
+        job.bytes_processed = job.bytes_total
+    except StatementError as e:
+        job.status = "failed"
+        job.errors.append(str(e))
+    except (OSError, PyMongoError) as e:  # Upload unreadable or database unavailable
+        job.status = "failed"
+        job.errors.append(f"Import failed: {e!s}")
+    except Exception as e:
+        # A bug: fail the job so that clients stop polling it, then let it be logged
+        job.status = "failed"
+        job.errors.append(f"Import failed: {type(e).__name__}: {e!s}")
+        job.finished_at = datetime.now(UTC)
+        _ = await job.save()
+        raise
+    finally:
+        path.unlink(missing_ok=True)
+
+    job.finished_at = datetime.now(UTC)
+    _ = await job.save()
+
+
+async def _import_chunk(
+    job: ImportJob, chunk: tuple[tuple[int, TransactionCreate | str], ...]
+) -> None:
+    valid: list[TransactionCreate] = []
+    for line, row in chunk:
+        if isinstance(row, str):
+            job.rows_invalid += 1
+            if len(job.errors) < MAX_IMPORT_ERRORS:
+                job.errors.append(f"Row {line}: {row}")
+        else:
+            valid.append(row)
+    job.rows_parsed += len(chunk)
+
+    stored = await _stored_hashes(job.user_id, valid, PydanticObjectId(job.id))
+    new: list[Transaction] = []
+    for row in valid:
+        key = row_hash(row.date or datetime.now(UTC), row.type, row.amount, row.description)
+        if stored[key] > 0:
+            stored[key] -= 1  # Each stored row absorbs one identical row of the file
+            job.rows_duplicate += 1
+            continue
+        new.append(Transaction(**row.model_dump(), user_id=job.user_id))
+
+    _ = await insert_transactions(job.user_id, new)
+    job.rows_imported += len(new)
@@ -0,0 +1,326 @@
+import asyncio
+import os
+import socket
+from datetime import UTC, datetime, timedelta
+from typing import Any, Literal
+
+from beanie import PydanticObjectId
+from plaid.api_client import ApiException
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from src.config import (
+    SYNC_HISTORY_POLL_SECONDS,
+    SYNC_JOB_LEASE_SECONDS,
+    SYNC_JOB_MAX_ATTEMPTS,
+    SYNC_POLL_SECONDS,
+    SYNC_RETRY_BASE_SECONDS,
+    SYNC_RETRY_MAX_SECONDS,
+    SYNC_SCHEDULER_TICK_SECONDS,
+    config,
+)
+from src.models import BankConnection, SyncJob
+from src.utils.plaid_sync import (
+    HISTORICAL_UPDATE_COMPLETE,
+    SyncRecountPending,
+    SyncResult,
+    sync_connection_limited,
+)
+
+# Persistent queue of Plaid syncs. HTTP handlers only enqueue jobs; a worker
+# process (`python -m src.cli sync-worker`) claims them by priority, runs one
+# connection sync per job and retries failures with backoff. A unique index keeps
+# at most one queued job per connection, and a job is not started while another
+# job of the same connection is running. Running jobs hold a lease that the
+# worker renews; jobs of a crashed worker are requeued when the lease expires.
+# Deleting a connection cancels its running job: the status stays `cancelled`
+# and the sync stops before its next page.
+
+type SyncTrigger = Literal["manual", "webhook", "schedule"]
+
+PRIORITY_MANUAL = 10  # A user is waiting
+PRIORITY_WEBHOOK = 5  # Plaid has new data
+PRIORITY_SCHEDULED = 0
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now() -> datetime:
+    return datetime.now(UTC)
+
+
+def _lease() -> datetime:
+    return _now() + timedelta(seconds=SYNC_JOB_LEASE_SECONDS)
+
+
+async def enqueue_sync(
+    connection: BankConnection, trigger: SyncTrigger, priority: int, delay: float = 0
+) -> SyncJob:
+    """
+    Queues a sync of the connection to run after `delay` seconds. If one is already
+    queued, that job is returned instead, raised to `priority` and, unless scheduled,
+    moved up to the requested time (out of a retry backoff). Enqueueing with a delay
+    therefore debounces: every request within the delay joins the same job.
+    """
+    run_at = _now() + timedelta(seconds=delay)
+    if not connection.id:
+        raise ValueError("Bank connection is not saved")
+    collection = SyncJob.get_motor_collection()
+    job = SyncJob(
+        user_id=connection.user_id,
+        connection_id=connection.id,
+        trigger=trigger,
+        priority=priority,
+        run_at=run_at,
+    )
+    while True:
+        try:
+            _ = await job.insert()
+            return job
+        except DuplicateKeyError:
+            update: dict[str, Any] = {"$max": {"priority": priority}}
+            if trigger != "schedule":
+                update["$min"] = {"run_at": run_at}
+            queued = await collection.find_one_and_update(
+                {"connection_id": connection.id, "status": "queued"},
+                update,
+                projection={"_id": 1},
+            )
+            if queued is not None:
+                existing = await SyncJob.get(queued["_id"])
+                if existing is not None:
+                    return existing
+            # The queued job was claimed meanwhile: queue a new one
+
+
+async def claim_job() -> SyncJob | None:
+    """Takes the due queued job with the highest priority, oldest first"""
+    now = _now()
+    doc = await SyncJob.get_motor_collection().find_one_and_update(
+        {"status": "queued", "run_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "running",
+                "locked_until": _lease(),
+                "started_at": now,
+                "worker": WORKER_ID,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", DESCENDING), ("run_at", ASCENDING)],
+        projection={"_id": 1},
+    )
+    if doc is None:
+        return None
+    return await SyncJob.get(doc["_id"])
+
+
+async def _requeue(job: SyncJob, run_at: datetime, attempts: int, error: str | None) -> None:
+    """Puts a job back in the queue, or supersedes it if the connection has a queued job"""
+    try:
+        result = await SyncJob.get_motor_collection().update_one(
+            {"_id": job.id, "status": "running"},
+            {
+                "$set": {
+                    "status": "queued",
+                    "run_at": run_at,
+                    "attempts": attempts,
+                    "locked_until": None,
+                    "error": error,
+                }
+            },
+        )
+    except DuplicateKeyError:
+        await _finish(job, "superseded", error="A newer sync of the connection is queued")
+        return
+    if not result.matched_count:
+        await _finish(job, "failed", error=error)  # Cancelled meanwhile: not retried
+
+
+async def _finish(
+    job: SyncJob,
+    status: Literal["completed", "failed", "superseded"],
+    error: str | None = None,
+    **progress: Any,
+) -> None:
+    """Ends a running job; a cancelled job keeps its status and error"""
+    collection = SyncJob.get_motor_collection()
+    finished = {"locked_until": None, "finished_at": _now(), **progress}
+    result = await collection.update_one(
+        {"_id": job.id, "status": "running"},
+        {"$set": {"status": status, "error": error, **finished}},
+    )
+    if not result.matched_count:
+        _ = await collection.update_one({"_id": job.id, "status": "cancelled"}, {"$set": finished})
+
+
+def _retryable(error: Exception) -> bool:
+    """
+    Plaid rejects a request the same way on retry, except for rate limits. Database
+    errors and a pending recount pass; any other error is a bug and is not retried.
+    """
+    if isinstance(error, ApiException):
+        status = int(error.status or 0)
+        return not 400 <= status < 500 or status == 429
+    return isinstance(error, PyMongoError | SyncRecountPending)
+
+
+async def _fail(job: SyncJob, error: Exception) -> None:
+    """Schedules a retry with exponential backoff, or fails the job for good"""
+    message = f"{type(error).__name__}: {error!s}"[:1000]
+    if job.attempts >= SYNC_JOB_MAX_ATTEMPTS or not _retryable(error):
+        await _finish(job, "failed", error=message)
+        print(f"❌ Sync job {job.id} failed: {message}")
+        return
+    delay = min(SYNC_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), SYNC_RETRY_MAX_SECONDS)
+    await _requeue(job, _now() + timedelta(seconds=delay), job.attempts, message)
+    print(f"⚠️ Sync job {job.id} attempt {job.attempts} failed, retry in {delay}s: {message}")
+
+
+async def _renew_lease(job: SyncJob) -> None:
+    while True:
+        await asyncio.sleep(SYNC_JOB_LEASE_SECONDS / 3)
+        _ = await SyncJob.find_one(SyncJob.id == job.id, SyncJob.status == "running").update(
+            {"$set": {"locked_until": _lease()}}
+        )
+
+
+def _progress(result: SyncResult, connection: BankConnection) -> dict[str, Any]:
+    return {
+        "pages": result.pages,
+        "added": result.added,
+        "modified": result.modified,
+        "removed": result.removed,
+        "history_status": connection.history_status,
+    }
+
+
+async def run_job(job: SyncJob) -> None:
+    """Runs one claimed job"""
+    running = await SyncJob.find_one(
+        SyncJob.connection_id == job.connection_id,
+        SyncJob.status == "running",
+        SyncJob.id != job.id,
+    )
+    if running is not None:
+        # Single flight: run after the sync already in progress, without using an attempt
+        await _requeue(job, _now() + timedelta(seconds=SYNC_POLL_SECONDS), job.attempts - 1, None)
+        return
+
+    connection = await BankConnection.get(job.connection_id)
+    if connection is None:
+        await _finish(job, "failed", error="Bank connection was deleted")
+        return
+
+    async def report(result: SyncResult) -> None:
+        _ = await SyncJob.find_one(SyncJob.id == job.id).update(
+            {"$set": _progress(result, connection)}
+        )
+
+    heartbeat = asyncio.create_task(_renew_lease(job))
+    try:
+        result = await sync_connection_limited(connection, report)
+    except Exception as e:  # noqa: BLE001 - one failing job must not stop the worker
+        # Recorded on the job: Plaid, database and recount errors are retried, any other
+        # error fails it for good (see _retryable)
+        await _fail(job, e)
+        return
+    finally:
+        _ = heartbeat.cancel()
+
+    synced: dict[Any, Any] = {BankConnection.last_synced_at: _now()}
+    if connection.history_status != HISTORICAL_UPDATE_COMPLETE:
+        # Plaid is still pulling the history: check back soon (a webhook may come first)
+        synced[BankConnection.next_sync_at] = _now() + timedelta(seconds=SYNC_HISTORY_POLL_SECONDS)
+    # A query update, since the connection may have been deleted during the sync
+    _ = await BankConnection.find_one(BankConnection.id == connection.id).update({"$set": synced})
+    await _finish(job, "completed", **_progress(result, connection))
+
+
+async def requeue_expired_jobs() -> int:
+    """Requeues running jobs whose worker stopped renewing the lease; returns how many"""
+    collection = SyncJob.get_motor_collection()
+    expired = {"status": "running", "locked_until": {"$lt": _now()}}
+    requeued = 0
+    async for doc in collection.find(expired, {"_id": 1}):
+        # Conditional, in case the worker renewed the lease since the find
+        query = {"_id": doc["_id"], **expired}
+        try:
+            result = await collection.update_one(
+                query,
+                {
+                    "$set": {
+                        "status": "queued",
+                        "run_at": _now(),
+                        "locked_until": None,
+                        "error": "Worker lease expired",
+                    }
+                },
+            )
+        except DuplicateKeyError:
+            result = await collection.update_one(
+                query,
+                {
+                    "$set": {
+                        "status": "superseded",
+                        "locked_until": None,
+                        "finished_at": _now(),
+                        "error": "Worker lease expired",
+                    }
+                },
+            )
+        requeued += result.modified_count
+    return requeued
+
+
+async def schedule_due_syncs(interval: int = config.PLAID_SYNC_INTERVAL_SECONDS) -> int:
+    """Queues a scheduled sync of every connection that is due; returns how many"""
+    now = _now()
+    scheduled = 0
+    due = {"$or": [{"next_sync_at": {"$lte": now}}, {"next_sync_at": None}]}
+    async for connection in BankConnection.find(due):
+        _ = await enqueue_sync(connection, "schedule", PRIORITY_SCHEDULED)
+        _ = await connection.set({BankConnection.next_sync_at: now + timedelta(seconds=interval)})
+        scheduled += 1
+    return scheduled
+
+
+async def _work() -> None:
+    while True:
+        try:
+            job = await claim_job()
+            if job is None:
+                await asyncio.sleep(SYNC_POLL_SECONDS)
+                continue
+            await run_job(job)
+        except PyMongoError as e:
+            print(f"❌ Sync worker database error: {e!s}")
+            await asyncio.sleep(SYNC_POLL_SECONDS)
+
+
+async def _maintain(schedule: bool) -> None:
+    while True:
+        try:
+            if requeued := await requeue_expired_jobs():
+                print(f"🔁 Requeued {requeued} sync jobs with an expired lease")
+            if schedule and (scheduled := await schedule_due_syncs()):
+                print(f"🕒 Scheduled {scheduled} connection syncs")
+        except PyMongoError as e:
+            print(f"❌ Sync scheduler database error: {e!s}")
+        await asyncio.sleep(SYNC_SCHEDULER_TICK_SECONDS)
+
+
+async def run_worker(workers: int = config.PLAID_SYNC_WORKERS, schedule: bool = True) -> None:
+    """Runs `workers` job loops plus the scheduler until cancelled"""
+    print(f"🔄 Sync worker {WORKER_ID} started with {workers} workers")
+    _ = await asyncio.gather(_maintain(schedule), *(_work() for _ in range(workers)))
+
+
+async def cancel_connection_jobs(connection_id: PydanticObjectId) -> None:
+    """Drops the queued jobs of a connection that is being deleted and cancels the running one"""
+    _ = await SyncJob.find(
+        SyncJob.connection_id == connection_id, SyncJob.status == "queued"
+    ).delete()
+    _ = await SyncJob.find(
+        SyncJob.connection_id == connection_id, SyncJob.status == "running"
+    ).update({"$set": {"status": "cancelled", "error": "Bank connection was deleted"}})
@@ -0,0 +1,151 @@
+import asyncio
+from typing import Any
+
+from beanie import PydanticObjectId
+from bson import Decimal128
+from pymongo import ReturnDocument
+
+from src.models import Transaction
+from src.schemas.base import TransactionCreate
+from src.utils.balance import BalanceChange, apply_balance_change
+from src.utils.rollups import apply_rollup_updates, manual_rollup_update
+
+# Batch writes of manual transactions. Inserts are one insert_many. Updates and
+# deletes are one find-and-modify per transaction, sent concurrently, so every
+# delta comes from the document as that write replaced it and a document changed
+# by someone else in between is never counted twice. Rollups, balance checkpoints
+# and the user's balance then get batched updates and one $inc per call.
+
+
+def _net_change(
+    added: list[Transaction], removed: list[Transaction] | None = None
+) -> BalanceChange:
+    change = BalanceChange()
+    for transaction in added:
+        change.add_manual(transaction)
+    for transaction in removed or []:
+        change.add_manual(transaction, sign=-1)
+    return change
+
+
+async def _apply_changes(
+    user_id: PydanticObjectId, added: list[Transaction], removed: list[Transaction]
+) -> None:
+    """Moves the rollups and the balance by what was actually written"""
+    await apply_rollup_updates(
+        [manual_rollup_update(t, sign=-1) for t in removed]
+        + [manual_rollup_update(t) for t in added]
+    )
+    await apply_balance_change(user_id, _net_change(added, removed), rewritten=True)
+
+
+async def _update_one(
+    user_id: PydanticObjectId, transaction_id: PydanticObjectId, values: TransactionCreate
+) -> tuple[Transaction, Transaction] | None:
+    """
+    Sets new values on one of the user's transactions in one find-and-modify; returns
+    (old, new) from the document as it was just before this write, None if no match
+    """
+    update: dict[str, Any] = {
+        "type": values.type.value,
+        "amount": Decimal128(values.amount),
+        "category": values.category,
+        "payment_method": values.payment_method,
+        "description": values.description,
+    }
+    if values.date:
+        update["date"] = values.date
+    doc = await Transaction.get_motor_collection().find_one_and_update(
+        {"_id": transaction_id, "user_id": user_id},
+        {"$set": update},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if doc is None:
+        return None
+    old = Transaction.model_validate(doc)
+    new = Transaction(
+        id=old.id,
+        user_id=old.user_id,
+        source=old.source,
+        type=values.type,
+        amount=values.amount,
+        category=values.category,
+        payment_method=values.payment_method,
+        description=values.description,
+        date=values.date or old.date,
+    )
+    return old, new
+
+
+async def _delete_one(
+    user_id: PydanticObjectId, transaction_id: PydanticObjectId
+) -> Transaction | None:
+    """Deletes one of the user's transactions; returns it as deleted, None if no match"""
+    doc = await Transaction.get_motor_collection().find_one_and_delete(
+        {"_id": transaction_id, "user_id": user_id}
+    )
+    return None if doc is None else Transaction.model_validate(doc)
+
+
+async def update_owned_transaction(
+    user_id: PydanticObjectId, transaction_id: PydanticObjectId, values: TransactionCreate
+) -> Transaction | None:
+    """Updates one of the user's transactions; returns it updated, None if nothing matched"""
+    updated = await update_transactions(user_id, [(transaction_id, values)])
+    return updated[0] if updated else None
+
+
+async def delete_owned_transaction(
+    user_id: PydanticObjectId, transaction_id: PydanticObjectId
+) -> Transaction | None:
+    """Deletes one of the user's transactions; returns it, None if nothing matched"""
+    deleted = await delete_transactions(user_id, [transaction_id])
+    return deleted[0] if deleted else None
+
+
+async def insert_transactions(
+    user_id: PydanticObjectId, transactions: list[Transaction]
+) -> list[Transaction]:
+    """Inserts validated transactions with one insert_many and applies the net balance change"""
+    if not transactions:
+        return []
+
+    for transaction in transactions:
+        transaction.id = PydanticObjectId()  # IDs are known up front for the response
+    _ = await Transaction.insert_many(transactions)
+
+    await apply_rollup_updates([manual_rollup_update(t) for t in transactions])
+    await apply_balance_change(user_id, _net_change(transactions))
+    return transactions
+
+
+async def update_transactions(
+    user_id: PydanticObjectId, updates: list[tuple[PydanticObjectId, TransactionCreate]]
+) -> list[Transaction]:
+    """
+    Applies (id, new values) pairs to the user's transactions; returns the updated ones.
+    Transactions deleted meanwhile are skipped and move nothing.
+    """
+    changes = await asyncio.gather(
+        *(_update_one(user_id, transaction_id, values) for transaction_id, values in updates)
+    )
+    applied = [change for change in changes if change is not None]
+    if applied:
+        await _apply_changes(user_id, [new for _, new in applied], [old for old, _ in applied])
+    return [new for _, new in applied]
+
+
+async def delete_transactions(
+    user_id: PydanticObjectId, transaction_ids: list[PydanticObjectId]
+) -> list[Transaction]:
+    """Deletes the user's transactions by ID; returns the ones this call deleted"""
+    deleted = [
+        transaction
+        for transaction in await asyncio.gather(
+            *(_delete_one(user_id, transaction_id) for transaction_id in transaction_ids)
+        )
+        if transaction is not None
+    ]
+    if deleted:
+        await _apply_changes(user_id, [], deleted)
+    return deleted
@@ -0,0 +1,13 @@
+import os
+
+# Settings are read when `src` is imported, so the test environment is set up
+# here, before conftest and the test modules import the app.
+# The tests need a MongoDB of their own (replica set not required), e.g.
+#   MONGODB_TEST_URI=mongodb://localhost:27017/expense_tracker_test uv run pytest
+# ⚠️ Every test drops all collections of that database.
+MONGODB_TEST_URI = os.environ.get("MONGODB_TEST_URI")
+
+os.environ["MONGODB_URI"] = MONGODB_TEST_URI or "mongodb://localhost:27017/expense_tracker_test"
+for name in ("SECRET_KEY", "PLAID_CLIENT_ID", "PLAID_SECRET", "OPENAI_API_KEY"):
+    _ = os.environ.setdefault(name, "test")
+_ = os.environ.setdefault("PLAID_ENV", "sandbox")
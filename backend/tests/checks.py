@@ -0,0 +1,18 @@
+from src.models import BankTransaction, DailyRollup, Transaction, User
+from src.utils.money import to_cents
+from src.utils.recalculate_user_balance import calculate_user_balance
+
+
+async def assert_consistent(user: User) -> None:
+    """The stored balance and rollups agree with the user's transactions"""
+    stored = await User.get(user.id)
+    assert stored is not None
+    assert stored.balance == await calculate_user_balance(stored)
+
+    manual = await Transaction.find(Transaction.user_id == user.id).to_list()
+    bank = await BankTransaction.find(BankTransaction.user_id == user.id).to_list()
+    rollups = await DailyRollup.find(DailyRollup.user_id == user.id).to_list()
+    assert sum(r.total_cents for r in rollups) == sum(to_cents(t.amount) for t in manual) + sum(
+        to_cents(t.amount) for t in bank
+    )
+    assert sum(r.transactions_count for r in rollups) == len(manual) + len(bank)
@@ -0,0 +1,48 @@
+from collections.abc import AsyncIterator
+from decimal import Decimal
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from src.app import app
+from src.auth.dependencies import get_current_user
+from src.database import get_database, init_db
+from src.models import User
+from tests import MONGODB_TEST_URI
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def db() -> None:
+    """An empty test database with the app's collections and indexes"""
+    if not MONGODB_TEST_URI:
+        pytest.skip("MONGODB_TEST_URI is not set")
+    database = get_database()
+    for name in await database.list_collection_names():
+        await database.drop_collection(name)
+    await init_db()
+
+
+@pytest.fixture
+async def user(db: None) -> User:
+    user = User(
+        email="test@example.com",
+        first_name="Test",
+        last_name="User",
+        opening_balance=Decimal("0.00"),
+    )
+    _ = await user.insert()
+    return user
+
+
+@pytest.fixture
+async def client(user: User) -> AsyncIterator[AsyncClient]:
+    """API client logged in as `user`"""
+    app.dependency_overrides[get_current_user] = lambda: user
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
@@ -0,0 +1,41 @@
+import pytest
+from httpx import AsyncClient
+
+from src.config import config
+from src.models import User
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cache_stats_are_for_admins_only(
+    client: AsyncClient, user: User, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(config, "ADMIN_EMAILS", ["ops@example.com"])
+    assert (await client.get("/analytics/cache/stats")).status_code == 403
+
+    monkeypatch.setattr(config, "ADMIN_EMAILS", [user.email.upper()])
+    response = await client.get("/analytics/cache/stats")
+    assert response.status_code == 200
+    assert "hits" in response.json()
+
+
+async def test_dashboard_widgets_match_their_endpoints(client: AsyncClient) -> None:
+    for amount, type_ in (("12.50", "expense"), ("40.00", "income"), ("7.25", "expense")):
+        response = await client.post(
+            "/transactions/", json={"amount": amount, "type": type_, "category": "Food"}
+        )
+        assert response.status_code == 201
+
+    line = {"timeframe": "month", "granularity": "week", "transaction_type": "expense"}
+    response = await client.post(
+        "/analytics/dashboard",
+        json={"widgets": [{"name": "summary"}, {"name": "line", **line}]},
+    )
+    assert response.status_code == 200
+    summary_widget, line_widget = response.json()["widgets"]
+
+    summary = await client.get("/analytics/transactions/summary")
+    assert summary_widget["data"] == summary.json()
+    line_chart = await client.get("/analytics/transactions/line", params=line)
+    assert line_widget["data"] == line_chart.json()
+    assert line_widget["data"]["granularity"] == "week"
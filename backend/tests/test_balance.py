@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128
+from httpx import AsyncClient
+
+from src.app import app
+from src.auth.dependencies import get_current_user
+from src.models import User
+from src.utils.balance_reconcile import backfill_opening_balances, reconcile_all_balances
+from src.utils.recalculate_user_balance import calculate_user_balance
+
+pytestmark = pytest.mark.anyio
+
+
+async def _legacy_user(client: AsyncClient, user: User, balance: str) -> None:
+    """Turns `user` into one registered before the opening balance was stored"""
+    response = await client.post(
+        "/transactions/", json={"amount": "50.00", "type": "expense", "category": "Food"}
+    )
+    assert response.status_code == 201
+    _ = await User.get_motor_collection().update_one(
+        {"_id": user.id},
+        {"$set": {"balance": Decimal128(balance)}, "$unset": {"opening_balance": ""}},
+    )
+    # As loaded for the requests of the test client
+    user.balance = Decimal(balance)
+    user.opening_balance = None
+
+
+async def test_backfill_keeps_the_balance_of_legacy_users(client: AsyncClient, user: User) -> None:
+    await _legacy_user(client, user, "150.00")  # Registered with 200.00, then spent 50.00
+
+    stored = await User.get(user.id)
+    assert stored is not None
+    assert stored.opening_balance is None
+    assert await calculate_user_balance(stored) is None
+    assert (await client.post("/account/balance/reconcile")).status_code == 409
+
+    assert await backfill_opening_balances(confirm_delay=0) == (1, 0)
+
+    stored = await User.get(user.id)
+    assert stored is not None
+    assert stored.opening_balance == Decimal("200.00")
+    assert await calculate_user_balance(stored) == Decimal("150.00")
+    assert await backfill_opening_balances(confirm_delay=0) == (0, 0)  # Nothing left to do
+
+
+async def _last_history_balance(client: AsyncClient) -> Decimal:
+    response = await client.get("/account/balance/history")
+    assert response.status_code == 200
+    return Decimal(str(response.json()["points"][-1]["balance"]))
+
+
+async def test_history_ends_at_the_balance_of_a_registered_user(client: AsyncClient) -> None:
+    response = await client.post(
+        "/auth/register",
+        json={
+            "email": "registered@example.com",
+            "password": "secret-password",
+            "first_name": "Registered",
+            "last_name": "User",
+            "initial_balance": "250.00",
+        },
+    )
+    assert response.status_code == 200
+    registered = await User.find_one(User.email == "registered@example.com")
+    assert registered is not None
+    app.dependency_overrides[get_current_user] = lambda: registered
+
+    for amount, type_ in (("30.25", "expense"), ("100.00", "income")):
+        response = await client.post("/transactions/", json={"amount": amount, "type": type_})
+        assert response.status_code == 201
+
+    stored = await User.get(registered.id)
+    assert stored is not None
+    assert stored.balance == Decimal("319.75")
+    assert await _last_history_balance(client) == stored.balance
+
+
+async def test_history_of_a_legacy_user_ends_at_the_balance(
+    client: AsyncClient, user: User
+) -> None:
+    await _legacy_user(client, user, "150.00")
+
+    assert await _last_history_balance(client) == Decimal("150.00")
+
+
+async def test_sweep_leaves_legacy_users_to_the_backfill(client: AsyncClient, user: User) -> None:
+    await _legacy_user(client, user, "150.00")
+
+    stats = await reconcile_all_balances(rate=0, confirm_delay=0)
+
+    assert (stats.no_opening, stats.drifted, stats.fixed) == (1, 0, 0)
+    stored = await User.get(user.id)
+    assert stored is not None
+    assert stored.balance == Decimal("150.00")  # The initial balance is kept
+
+    _ = await backfill_opening_balances(confirm_delay=0)
+    stats = await reconcile_all_balances(rate=0, confirm_delay=0)
+    assert (stats.checked, stats.no_opening, stats.drifted) == (1, 0, 0)
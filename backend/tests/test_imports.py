@@ -0,0 +1,89 @@
+import pytest
+from httpx import AsyncClient
+
+from src.models import Transaction, TransactionType, User
+from tests.checks import assert_consistent
+
+pytestmark = pytest.mark.anyio
+
+CSV = b"""Date,Description,Amount,Category
+2024-04-01,Coffee Shop,-4.50,Food
+2024-04-02,Salary,2500.00,Income
+2024-04-02,Coffee Shop,-4.50,Food
+not a date,Broken row,-1.00,
+"""
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240403120000[-5:EST]
+<TRNAMT>-12.34
+<NAME>Book Store
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240404
+<TRNAMT>100.00
+<NAME>Refund
+<MEMO>Order 42
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+async def _import(client: AsyncClient, body: bytes, file_format: str) -> dict[str, object]:
+    response = await client.post(f"/transactions/import?file_format={file_format}", content=body)
+    assert response.status_code == 202
+    # The import runs as a background task, finished once the response is complete
+    job = await client.get(f"/transactions/import/{response.json()['id']}")
+    assert job.status_code == 200
+    return job.json()
+
+
+async def test_import_csv(client: AsyncClient, user: User) -> None:
+    job = await _import(client, CSV, "csv")
+
+    assert job["status"] == "completed"
+    assert (job["rows_parsed"], job["rows_imported"], job["rows_invalid"]) == (4, 3, 1)
+    transactions = await Transaction.find(Transaction.user_id == user.id).to_list()
+    assert sorted((t.type, str(t.amount)) for t in transactions) == [
+        (TransactionType.EXPENSE, "4.50"),
+        (TransactionType.EXPENSE, "4.50"),
+        (TransactionType.INCOME, "2500.00"),
+    ]
+    assert all(t.source == "manual" for t in transactions)
+    await assert_consistent(user)
+
+    again = await _import(client, CSV, "csv")
+    assert (again["rows_imported"], again["rows_duplicate"]) == (0, 3)
+    await assert_consistent(user)
+
+
+async def test_import_ofx(client: AsyncClient, user: User) -> None:
+    job = await _import(client, OFX, "ofx")
+
+    assert job["status"] == "completed"
+    assert (job["rows_parsed"], job["rows_imported"], job["rows_invalid"]) == (2, 2, 0)
+    transactions = await Transaction.find(Transaction.user_id == user.id).sort("date").to_list()
+    assert [(t.type, str(t.amount), t.description) for t in transactions] == [
+        (TransactionType.EXPENSE, "12.34", "Book Store"),
+        (TransactionType.INCOME, "100.00", "Refund Order 42"),
+    ]
+    await assert_consistent(user)
+
+
+async def test_import_of_malformed_csv_fails_the_job(client: AsyncClient) -> None:
+    field = b"x" * 200_000  # Longer than the csv module's field size limit
+    job = await _import(
+        client, b'Date,Description,Amount\n2024-04-01,"' + field + b'",-1.00\n', "csv"
+    )
+
+    assert job["status"] == "failed"
+    assert job["finished_at"] is not None
+    assert "Malformed CSV" in job["errors"][0]
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from plaid.api.plaid_api import PlaidApi
+from plaid.api_client import ApiClient, ApiException
+from plaid.configuration import Configuration
+from plaid.model.accounts_get_request import AccountsGetRequest
+
+from src.integrations.plaid import AsyncPlaidClient
+
+pytestmark = pytest.mark.anyio
+
+PLAID_DELAY = 0.5  # Seconds the stub Plaid takes to answer
+WORKERS = 8
+CALLS = 32
+MAX_LOOP_STALL = 0.05  # A blocked event loop would stall for a whole PLAID_DELAY
+
+ACCOUNTS_RESPONSE = json.dumps(
+    {
+        "accounts": [],
+        "item": {
+            "item_id": "item",
+            "webhook": None,
+            "error": None,
+            "available_products": [],
+            "billed_products": [],
+            "consent_expiration_time": None,
+            "update_type": "background",
+        },
+        "request_id": "request",
+    }
+).encode()
+
+
+class _SlowPlaid(BaseHTTPRequestHandler):
+    """Answers every request like Plaid, after `server.delay` seconds"""
+
+    def do_POST(self) -> None:
+        _ = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)  # pyright: ignore[reportAttributeAccessIssue]
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(ACCOUNTS_RESPONSE)))
+            self.end_headers()
+            _ = self.wfile.write(ACCOUNTS_RESPONSE)
+        except ConnectionError:
+            pass  # The client timed out and went away
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def slow_plaid() -> Iterator[ThreadingHTTPServer]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowPlaid)
+    server.delay = PLAID_DELAY  # pyright: ignore[reportAttributeAccessIssue]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server: ThreadingHTTPServer, timeout: float) -> AsyncPlaidClient:
+    configuration = Configuration(
+        host=f"http://127.0.0.1:{server.server_port}",
+        api_key={"clientId": "client", "secret": "secret"},
+    )
+    return AsyncPlaidClient(PlaidApi(ApiClient(configuration)), WORKERS, timeout)
+
+
+async def _max_stall(until: asyncio.Future[object]) -> float:
+    """Longest extra delay of a 10 ms sleep on the event loop while `until` runs"""
+    stall = 0.0
+    while not until.done():
+        start = time.monotonic()
+        await asyncio.sleep(0.01)
+        stall = max(stall, time.monotonic() - start - 0.01)
+    return stall
+
+
+async def test_event_loop_stays_responsive_during_slow_plaid_calls(
+    slow_plaid: ThreadingHTTPServer,
+) -> None:
+    client = _client(slow_plaid, timeout=5)
+    try:
+        start = time.monotonic()
+        calls = asyncio.gather(
+            *(client.accounts_get(AccountsGetRequest(access_token="token")) for _ in range(CALLS))
+        )
+        stall = await _max_stall(calls)
+        responses = await calls
+        elapsed = time.monotonic() - start
+    finally:
+        client.close()
+
+    assert len(responses) == CALLS
+    assert stall < MAX_LOOP_STALL
+    # Calls run WORKERS at a time, instead of one after another
+    assert elapsed < PLAID_DELAY * CALLS / WORKERS * 2
+
+
+async def test_slow_plaid_call_times_out(slow_plaid: ThreadingHTTPServer) -> None:
+    client = _client(slow_plaid, timeout=PLAID_DELAY / 5)
+    try:
+        with pytest.raises(ApiException, match="timed out|Timeout"):
+            _ = await client.accounts_get(AccountsGetRequest(access_token="token"))
+    finally:
+        client.close()
@@ -0,0 +1,157 @@
+from datetime import date
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+
+from src.database import get_database, init_db
+from src.models import BankAccount, BankConnection, BankTransaction, SyncJob, User
+from src.utils import plaid_sync
+from src.utils.plaid_sync import (
+    HISTORICAL_UPDATE_COMPLETE,
+    remove_duplicate_bank_transactions,
+    sync_connection,
+)
+from src.utils.sync_queue import PRIORITY_MANUAL, claim_job, enqueue_sync, run_job
+from tests.checks import assert_consistent
+
+pytestmark = pytest.mark.anyio
+
+
+def _plaid_transaction(transaction_id: str, amount: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        transaction_id=transaction_id,
+        account_id="account",
+        name=f"Transaction {transaction_id}",
+        amount=amount,
+        date=date(2024, 4, 1),
+        category=["Food"],
+        payment_channel="in store",
+        iso_currency_code="USD",
+        pending=False,
+    )
+
+
+class FakePlaid:
+    """/transactions/sync serving fixed pages by request cursor"""
+
+    def __init__(self, pages: dict[str | None, SimpleNamespace]) -> None:
+        self.pages = pages
+
+    async def transactions_sync(self, request: Any) -> SimpleNamespace:
+        return self.pages[getattr(request, "cursor", None)]
+
+
+def _page(
+    added: list[SimpleNamespace], next_cursor: str, has_more: bool = False
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        accounts=[],
+        added=added,
+        modified=[],
+        removed=[],
+        next_cursor=next_cursor,
+        has_more=has_more,
+        transactions_update_status=HISTORICAL_UPDATE_COMPLETE,
+    )
+
+
+@pytest.fixture
+async def connection(user: User, monkeypatch: pytest.MonkeyPatch) -> BankConnection:
+    connection = BankConnection(user_id=user.id, access_token="token", item_id="item")
+    _ = await connection.insert()
+    account = BankAccount(
+        user_id=user.id,
+        bank_connection_id=connection.id,
+        account_id="account",
+        name="Checking",
+        type="depository",
+    )
+    _ = await account.insert()
+    page = _page([_plaid_transaction("t1", 10.25), _plaid_transaction("t2", -99.5)], "c1")
+    monkeypatch.setattr(plaid_sync, "plaid_client", FakePlaid({None: page}))
+    return connection
+
+
+async def test_page_cut_off_before_its_deltas_is_counted_on_replay(
+    connection: BankConnection, user: User, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def crash(*args: object, **kwargs: object) -> None:
+        raise ConnectionError("Worker died after storing the rows")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(plaid_sync, "apply_balance_change", crash)
+        with pytest.raises(ConnectionError):
+            _ = await sync_connection(connection)
+
+    stored = await BankConnection.get(connection.id)
+    assert stored is not None
+    assert stored.sync_page_pending
+    assert stored.sync_cursor is None  # The page is replayed
+
+    result = await sync_connection(stored)
+
+    assert result.modified == 2  # Replayed rows were already stored...
+    stored = await BankConnection.get(connection.id)
+    assert stored is not None
+    assert not stored.sync_page_pending
+    assert stored.sync_cursor == "c1"
+    assert await BankTransaction.find(BankTransaction.user_id == user.id).count() == 2
+    await assert_consistent(user)  # ...and are counted in the balance and rollups all the same
+
+
+async def test_replayed_page_is_counted_once(connection: BankConnection, user: User) -> None:
+    _ = await sync_connection(connection)
+    _ = await connection.set({BankConnection.sync_cursor: None})  # Plaid sends the page again
+
+    result = await sync_connection(connection)
+
+    assert (result.added, result.modified) == (0, 2)
+    await assert_consistent(user)
+
+
+async def test_deleting_the_connection_cancels_its_running_sync(
+    connection: BankConnection, user: User, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first = _page([_plaid_transaction("t1", 10.25)], "c1", has_more=True)
+    second = _page([_plaid_transaction("t2", -99.5)], "c2")
+
+    class DeletedDuringSync(FakePlaid):
+        async def transactions_sync(self, request: Any) -> SimpleNamespace:
+            if getattr(request, "cursor", None) == "c1":
+                # The user deletes the connection while the second page is requested
+                response = await client.delete(f"/plaid/connection/{connection.id}")
+                assert response.status_code == 200
+            return await super().transactions_sync(request)
+
+    monkeypatch.setattr(plaid_sync, "plaid_client", DeletedDuringSync({None: first, "c1": second}))
+    _ = await enqueue_sync(connection, "manual", PRIORITY_MANUAL)
+    job = await claim_job()
+    assert job is not None
+
+    await run_job(job)
+
+    stored = await SyncJob.get(job.id)
+    assert stored is not None
+    assert stored.status == "cancelled"
+    assert stored.finished_at is not None
+    assert await BankConnection.get(connection.id) is None
+    # The page after the deletion was not stored
+    assert await BankTransaction.find(BankTransaction.user_id == user.id).count() == 0
+    await assert_consistent(user)
+
+
+async def test_startup_asks_to_dedupe_before_the_unique_index(user: User) -> None:
+    collection = get_database()[BankTransaction.Settings.name]
+    _ = await collection.drop()  # As before the unique index existed
+    row = {"user_id": user.id, "transaction_id": "t1", "name": "Coffee", "amount": 4.5}
+    _ = await collection.insert_many([dict(row), dict(row)])
+
+    with pytest.raises(RuntimeError, match="dedupe-bank-transactions"):
+        await init_db()
+
+    assert await remove_duplicate_bank_transactions(get_database()) == {user.id}
+    await init_db()
+    assert "plaid_transaction_id" in await collection.index_information()
+    assert await collection.count_documents({}) == 1
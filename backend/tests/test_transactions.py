@@ -0,0 +1,185 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from src.models import Transaction, User
+from tests.checks import assert_consistent
+
+pytestmark = pytest.mark.anyio
+
+CONCURRENCY = 20
+STRESS_WRITES = 300  # Parallel requests of the stress tests
+
+
+async def _create(client: AsyncClient, amount: str = "10.00", type_: str = "expense") -> str:
+    response = await client.post(
+        "/transactions/", json={"amount": amount, "type": type_, "category": "Food"}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+async def test_concurrent_deletes_return_the_amount_once(client: AsyncClient, user: User) -> None:
+    transaction_id = await _create(client)
+
+    responses = await asyncio.gather(
+        *(client.delete(f"/transactions/{transaction_id}") for _ in range(CONCURRENCY))
+    )
+
+    assert sorted(r.status_code for r in responses) == [200] + [404] * (CONCURRENCY - 1)
+    await assert_consistent(user)
+
+
+async def test_concurrent_updates_keep_balance_and_rollups(client: AsyncClient, user: User) -> None:
+    transaction_id = await _create(client)
+
+    responses = await asyncio.gather(
+        *(
+            client.put(
+                f"/transactions/{transaction_id}",
+                json={
+                    "amount": f"{i + 1}.25",
+                    "type": "income" if i % 2 else "expense",
+                    "category": f"Category {i % 3}",
+                },
+            )
+            for i in range(CONCURRENCY)
+        )
+    )
+
+    assert all(r.status_code == 200 for r in responses)
+    await assert_consistent(user)
+
+
+async def test_concurrent_updates_and_deletes(client: AsyncClient, user: User) -> None:
+    ids = [await _create(client, f"{i}.10") for i in range(1, 6)]
+
+    requests = [
+        client.put(f"/transactions/{transaction_id}", json={"amount": "3.33", "type": "income"})
+        for transaction_id in ids
+        for _ in range(CONCURRENCY // 4)
+    ] + [
+        client.delete(f"/transactions/{transaction_id}")
+        for transaction_id in ids
+        for _ in range(CONCURRENCY // 4)
+    ]
+    responses = await asyncio.gather(*requests)
+
+    assert all(r.status_code in (200, 404) for r in responses)
+    assert await Transaction.find(Transaction.user_id == user.id).count() == 0
+    await assert_consistent(user)
+
+
+async def test_hundreds_of_concurrent_creates(client: AsyncClient, user: User) -> None:
+    expected = Decimal("0")
+    requests = []
+    for i in range(STRESS_WRITES):
+        amount = Decimal(f"{i % 97 + 1}.{i % 100:02d}")
+        income = i % 3 == 0
+        expected += amount if income else -amount
+        body = {
+            "amount": str(amount),
+            "type": "income" if income else "expense",
+            "category": f"Category {i % 7}",
+            "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00Z",
+        }
+        requests.append(client.post("/transactions/", json=body))
+
+    responses = await asyncio.gather(*requests)
+
+    assert all(r.status_code == 201 for r in responses)
+    assert await Transaction.find(Transaction.user_id == user.id).count() == STRESS_WRITES
+    stored = await User.get(user.id)
+    assert stored is not None
+    assert stored.balance == expected  # From an opening balance of 0
+    await assert_consistent(user)
+
+
+async def test_hundreds_of_mixed_concurrent_writes(client: AsyncClient, user: User) -> None:
+    ids = [await _create(client, f"{i + 1}.40") for i in range(STRESS_WRITES // 4)]
+
+    requests = [
+        client.post(
+            "/transactions/",
+            json={"amount": f"{i % 50 + 1}.15", "type": "income" if i % 2 else "expense"},
+        )
+        for i in range(STRESS_WRITES // 2)
+    ]
+    for i, transaction_id in enumerate(ids):
+        requests += [
+            client.put(
+                f"/transactions/{transaction_id}",
+                json={"amount": f"{i + 2}.60", "type": "income", "category": "Salary"},
+            ),
+            client.put(
+                f"/transactions/{transaction_id}", json={"amount": "0.99", "type": "expense"}
+            ),
+        ]
+        if i % 2:
+            requests.append(client.delete(f"/transactions/{transaction_id}"))
+
+    responses = await asyncio.gather(*requests)
+
+    assert all(r.status_code in (200, 201, 404) for r in responses)
+    assert len(responses) >= STRESS_WRITES
+    await assert_consistent(user)
+
+
+async def test_update_of_another_users_transaction_is_forbidden(
+    client: AsyncClient, user: User
+) -> None:
+    other = User(
+        email="other@example.com",
+        first_name="Other",
+        last_name="User",
+        opening_balance=Decimal("0.00"),
+    )
+    _ = await other.insert()
+    transaction = Transaction(user_id=other.id, amount="5.00", type="expense")
+    _ = await transaction.insert()
+
+    response = await client.put(
+        f"/transactions/{transaction.id}", json={"amount": "1.00", "type": "expense"}
+    )
+    assert response.status_code == 403
+    response = await client.delete(f"/transactions/{transaction.id}")
+    assert response.status_code == 403
+    await assert_consistent(user)
+
+
+async def _create_bulk(client: AsyncClient, count: int) -> list[str]:
+    response = await client.post(
+        "/transactions/bulk",
+        json={"items": [{"amount": f"{i + 1}.05", "type": "expense"} for i in range(count)]},
+    )
+    assert response.status_code == 200
+    assert response.json()["failed"] == 0  # Items without a source are manual
+    return [result["id"] for result in response.json()["results"]]
+
+
+async def test_concurrent_bulk_deletes_return_each_amount_once(
+    client: AsyncClient, user: User
+) -> None:
+    ids = await _create_bulk(client, 10)
+
+    responses = await asyncio.gather(
+        *(client.post("/transactions/bulk/delete", json={"ids": ids}) for _ in range(5))
+    )
+
+    assert sum(r.json()["succeeded"] for r in responses) == len(ids)
+    await assert_consistent(user)
+
+
+async def test_concurrent_bulk_updates_and_deletes(client: AsyncClient, user: User) -> None:
+    ids = await _create_bulk(client, 10)
+    items = [{"id": transaction_id, "amount": "7.77", "type": "income"} for transaction_id in ids]
+
+    _ = await asyncio.gather(
+        *(client.put("/transactions/bulk", json={"items": items}) for _ in range(3)),
+        client.post("/transactions/bulk/delete", json={"ids": ids[::2]}),
+    )
+
+    assert await Transaction.find(Transaction.user_id == user.id).count() == len(ids) // 2
+    await assert_consistent(user)